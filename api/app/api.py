@@ -1,36 +1,116 @@
-from fastapi import APIRouter, Query
-from typing import Optional
+import json
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 from app.services.stock_data import get_stock_data
-from app.services.fetcher import fetch_and_save_s3
-from app.services.preditict import pipe_to_predict
+from app.services.ingestion import ensure_fresh_async
+from app.services.preditict import pipe_to_forecast_async, pipe_to_predict_async
+from app.services.batch_predict import predict_many
+from app.services.batcher import get_batcher
+from app.services.s3_utils import cache as s3_cache
+from app.services.prediction_cache import prediction_cache
+from app.services.yahoo_client import yahoo
+from app.services.startup import startup_report
+from app.services import metrics
 from app.config.logger import setup_logger
+from app.config.settings import BATCH_MAX_SYMBOLS, FORECAST_MAX_HORIZON, INGESTION_MAX_STALENESS_SECONDS, MODEL_PATH
 
 logger = setup_logger("stock_data_api")
 router = APIRouter()
 
+class BatchPredictionRequest(BaseModel):
+    symbols: List[str]
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    interval: str = "1m"
+    period: Optional[str] = None
+    auto_adjust: bool = True
+    max_staleness: Optional[float] = Field(None, ge=0)
+    horizon: int = Field(1, ge=1, le=FORECAST_MAX_HORIZON)
+
 @router.get("/")
 def root():
     return {"message": "API ativa"}
-    
+
+@router.get("/inference-stats")
+def inference_stats():
+    return get_batcher(MODEL_PATH).stats()
+
+@router.get("/startup-report")
+def startup_stats():
+    return startup_report()
+
+@router.get("/metrics")
+def metrics_endpoint():
+    # Formato texto do Prometheus (durações por etapa, S3, lotes do modelo, HTTP)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/cache-stats")
+def cache_stats():
+    return {"s3": s3_cache.stats(), "predictions": prediction_cache.stats(), "yahoo": yahoo.stats()}
+
 @router.get("/stock-data-prediction")
-def stock_data_endpoint(
+async def stock_data_endpoint(
+    response: Response,
     symbol: str = Query(...),
     start_date: str = Query(None),
     end_date: Optional[str] = Query(None),
     interval: str = Query("1m"),
     period: Optional[str] = Query(None),
     auto_adjust: bool = Query(True),
+    max_staleness: Optional[float] = Query(None, ge=0),
+    horizon: int = Query(1, ge=1, le=FORECAST_MAX_HORIZON),
 ):
     try:
         end_date_str = end_date or datetime.today().strftime('%Y-%m-%d')
         try:
-            msg = fetch_and_save_s3(symbol, start_date, end_date_str, interval, period, auto_adjust)
+            # Usa os dados já ingeridos; só busca no Yahoo se estiverem mais velhos que max_staleness (s)
+            limit = INGESTION_MAX_STALENESS_SECONDS if max_staleness is None else max_staleness
+            msg, refreshed, age = await ensure_fresh_async(
+                symbol, limit,
+                start_date=start_date, end_date=end_date_str, interval=interval,
+                period=period, auto_adjust=auto_adjust,
+            )
+            response.headers["X-Data-Refreshed"] = "1" if refreshed else "0"
+            response.headers["X-Data-Age"] = f"{age:.0f}"
+            if 200 in msg and horizon > 1:
+                # Caminho previsto dos próximos `horizon` passos, numa única requisição
+                return await pipe_to_forecast_async(symbol, horizon)
             if 200 in msg:
-                return pipe_to_predict(symbol, start_date, end_date_str)
+                value, cache_hit = await pipe_to_predict_async(symbol, start_date, end_date_str)
+                response.headers["X-Prediction-Cache"] = "HIT" if cache_hit else "MISS"
+                return value
         except  Exception as e:
             logger.error(f"Erro ao buscar dados do Yahoo Finance: {e}")
             raise {"error": str(e)}
     except Exception as e:
         logger.error(f"Erro: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+@router.post("/stock-data-prediction/batch")
+async def stock_data_batch_endpoint(request: BatchPredictionRequest):
+    """
+    Predição para vários símbolos. A resposta é NDJSON (uma linha por símbolo), enviada
+    à medida que cada resultado ou erro fica pronto.
+    """
+    if not request.symbols:
+        raise HTTPException(status_code=400, detail="Informe ao menos um símbolo.")
+    if len(request.symbols) > BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_SYMBOLS} símbolos por requisição.")
+
+    end_date_str = request.end_date or datetime.today().strftime('%Y-%m-%d')
+    limit = INGESTION_MAX_STALENESS_SECONDS if request.max_staleness is None else request.max_staleness
+
+    # Gerador async: cada linha é enviada assim que o símbolo (ou o micro-lote) fica pronto
+    async def stream():
+        async for item in predict_many(
+            request.symbols, limit,
+            horizon=request.horizon,
+            start_date=request.start_date, end_date=end_date_str, interval=request.interval,
+            period=request.period, auto_adjust=request.auto_adjust,
+        ):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
\ No newline at end of file
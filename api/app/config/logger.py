@@ -1,16 +1,49 @@
+import json
 import logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config.settings import LOG_FORMAT
+
+# ID da requisição HTTP corrente (definido pelo middleware de app.services.metrics)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com o request ID e os campos passados em extra={"fields": {...}}."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": request_id_var.get(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
 
 def setup_logger(name: str) -> logging.Logger:
     """
     Configura um logger com o nome especificado.
     Se o logger já existir, retorna o logger existente.
     Se não existir, cria um novo logger com um handler padrão que envia logs para stdout.
+    Com LOG_FORMAT=json, cada registro é uma linha JSON (ver JsonFormatter).
     """
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
     if not logger.hasHandlers():
         handler = logging.StreamHandler()  # envia para stdout (console)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        if LOG_FORMAT == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         handler.setFormatter(formatter)
         logger.addHandler(handler)
     return logger
@@ -0,0 +1,162 @@
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Lê uma variável de ambiente booleana ("1", "true", "yes", "on")."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Modelo ---
+# Caminho do modelo (Keras .h5/.keras, ou um artefato .tflite/.onnx exportado)
+MODEL_SOURCE_PATH = os.getenv("MODEL_PATH", "api/app/model/modelo_v1.h5")
+# Backend de inferência: "auto" (pela extensão do arquivo), "keras", "tflite" ou "onnx".
+# Com "tflite"/"onnx" e o caminho apontando para o .h5, é usado o artefato exportado ao lado
+# (mesmo nome, outra extensão; ver run_convert_model.py) e a imagem pode dispensar o TensorFlow
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "auto").strip().lower()
+_ARTIFACT_EXTENSIONS = {"tflite": ".tflite", "onnx": ".onnx"}
+
+
+def _serving_path(path: str, backend: str) -> str:
+    extension = _ARTIFACT_EXTENSIONS.get(backend)
+    if extension is None or path.endswith(extension):
+        return path
+    return os.path.splitext(path)[0] + extension
+
+
+# Caminho efetivamente carregado pelo serviço
+MODEL_PATH = _serving_path(MODEL_SOURCE_PATH, INFERENCE_BACKEND)
+# Carrega e aquece o modelo na subida da aplicação (senão, carrega no primeiro uso)
+MODEL_PRELOAD = _env_bool("MODEL_PRELOAD", True)
+# Intervalo mínimo (segundos) entre verificações de alteração do arquivo do modelo
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "30"))
+
+# Tamanho da janela usada pelo LSTM
+SEQ_LENGTH = 24
+
+# --- Micro-batching de inferência ---
+# Desligado, cada requisição chama model.predict isoladamente
+BATCHING_ENABLED = _env_bool("BATCHING_ENABLED", True)
+# Tamanho máximo do lote e espera máxima (ms) a partir do primeiro item enfileirado
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Ordem das features esperada pelo modelo
+FEATURE_COLUMNS = [
+    'Open', 'High', 'Low', 'Close', 'Volume',
+    'RSI', 'Stoch_K', 'Stoch_D', 'Awesome_Oscillator',
+    'MACD', 'MACD_signal', 'MACD_diff',
+    'CCI', 'ADX', 'ADX_pos', 'ADX_neg',
+    'BB_upper', 'BB_middle', 'BB_lower',
+    'EMA_20', 'ATR', 'VWAP', 'OBV', 'AccDistIndex',
+    'Candle_Body', 'Candle_Range', 'Upper_Shadow', 'Lower_Shadow'
+]
+
+# --- Estado incremental dos indicadores técnicos ---
+# Mantém por símbolo o estado dos indicadores, atualizado a cada ingestão
+INDICATOR_STATE_ENABLED = _env_bool("INDICATOR_STATE_ENABLED", True)
+# Quantidade de linhas completas de features guardadas no estado (>= SEQ_LENGTH: a
+# predição e o forecast usam apenas a janela das últimas SEQ_LENGTH linhas)
+INDICATOR_TAIL_ROWS = max(int(os.getenv("INDICATOR_TAIL_ROWS", "64")), SEQ_LENGTH)
+# Backend do cálculo completo de features: "ta" (biblioteca ta/pandas) ou "numpy" (kernel vetorizado)
+FEATURE_BACKEND = os.getenv("FEATURE_BACKEND", "ta").strip().lower()
+
+# --- Armazenamento do histórico ---
+# "csv" (arquivo único fetch/{symbol}_evolution.csv) ou "parquet" (partições por símbolo/data)
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv").strip().lower()
+# Parquet: as partes de um dia já encerrado são compactadas num único arquivo (date=.../data.parquet)
+PARQUET_COMPACTION_ENABLED = _env_bool("PARQUET_COMPACTION_ENABLED", True)
+# Barras finais lidas no cálculo completo (sem estado incremental); 0 = histórico inteiro.
+# OBV/AccDist são acumulados e as médias exponenciais dependem de todo o histórico, então
+# valores > 0 trocam exatidão por latência constante (o estado incremental é exato).
+PREDICT_HISTORY_BARS = int(os.getenv("PREDICT_HISTORY_BARS", "0"))
+
+# --- Cache de leitura do S3 ---
+S3_CACHE_ENABLED = _env_bool("S3_CACHE_ENABLED", True)
+# Limite do cache em memória (MB, pelo tamanho dos objetos no S3)
+S3_CACHE_MAX_MB = float(os.getenv("S3_CACHE_MAX_MB", "256"))
+# Dentro do TTL não há chamada ao S3; depois dele a entrada é revalidada por ETag (0 = sempre revalida)
+S3_CACHE_TTL_SECONDS = float(os.getenv("S3_CACHE_TTL_SECONDS", "0"))
+# TTL das partes Parquet (nunca alteradas depois de gravadas) e da listagem e do arquivo
+# compactado dos dias já encerrados (só mudam por backfill ou compactação)
+S3_CACHE_IMMUTABLE_TTL_SECONDS = float(os.getenv("S3_CACHE_IMMUTABLE_TTL_SECONDS", "3600"))
+# Diretório da camada em disco (ex.: /tmp/s3cache); vazio desativa
+S3_CACHE_DISK_DIR = os.getenv("S3_CACHE_DISK_DIR", "")
+
+# --- Escritas concorrentes no S3 ---
+# Checkpoint, histórico CSV e metadados são gravados com escrita condicional (If-Match/ETag);
+# em conflito com outro processo, a leitura-alteração-escrita é refeita até este limite
+S3_CAS_MAX_RETRIES = int(os.getenv("S3_CAS_MAX_RETRIES", "8"))
+S3_CAS_BACKOFF_BASE_SECONDS = float(os.getenv("S3_CAS_BACKOFF_BASE_SECONDS", "0.05"))
+S3_CAS_BACKOFF_MAX_SECONDS = float(os.getenv("S3_CAS_BACKOFF_MAX_SECONDS", "2"))
+
+# --- Cache de predições ---
+# Chave: (símbolo, last_timestamp do checkpoint, versão do modelo)
+PREDICTION_CACHE_ENABLED = _env_bool("PREDICTION_CACHE_ENABLED", True)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "4096"))
+
+# --- Ingestão em segundo plano ---
+# Agendador dentro do processo da API (lifespan); em Lambda use run_fetcher.py agendado
+INGESTION_ENABLED = _env_bool("INGESTION_ENABLED", False)
+# Símbolos mantidos atualizados, com intervalo opcional por símbolo: "TSLA,AAPL:5m"
+INGESTION_SYMBOLS = os.getenv("INGESTION_SYMBOLS", "TSLA")
+INGESTION_INTERVAL = os.getenv("INGESTION_INTERVAL", "1m")
+INGESTION_PERIOD = os.getenv("INGESTION_PERIOD", "1d")
+# Atraso após o fechamento da barra antes de buscar (o Yahoo publica com alguns segundos de atraso)
+INGESTION_DELAY_SECONDS = float(os.getenv("INGESTION_DELAY_SECONDS", "5"))
+# Símbolos atualizados em paralelo por rodada
+INGESTION_CONCURRENCY = int(os.getenv("INGESTION_CONCURRENCY", "4"))
+# Idade máxima dos dados ingeridos para o endpoint não buscar no Yahoo (max_staleness padrão)
+INGESTION_MAX_STALENESS_SECONDS = float(os.getenv("INGESTION_MAX_STALENESS_SECONDS", "120"))
+
+# --- Predição em lote ---
+# Máximo de símbolos por requisição em /stock-data-prediction/batch
+BATCH_MAX_SYMBOLS = int(os.getenv("BATCH_MAX_SYMBOLS", "500"))
+# Símbolos buscados/preparados em paralelo (limita chamadas simultâneas ao Yahoo e ao S3)
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "8"))
+
+# --- Forecast multi-passo ---
+# Maior `horizon` aceito em /stock-data-prediction (passos autorregressivos por requisição)
+FORECAST_MAX_HORIZON = int(os.getenv("FORECAST_MAX_HORIZON", "60"))
+
+# --- Execução assíncrona ---
+# Threads para I/O bloqueante (Yahoo Finance, S3) chamado a partir dos handlers async
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "64"))
+# Threads para trabalho de CPU (features, TensorFlow); limita a concorrência e a memória
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(os.cpu_count() or 2)))
+# Conexões HTTP reutilizadas pelo cliente S3 (acompanha o pool de I/O)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", str(IO_POOL_SIZE)))
+
+# --- Yahoo Finance ---
+# Limite de requisições ao Yahoo por processo (token bucket): taxa sustentada e rajada
+YF_RATE_PER_SECOND = float(os.getenv("YF_RATE_PER_SECOND", "2"))
+YF_BURST = int(os.getenv("YF_BURST", "4"))
+# Taxa adaptativa: cada 429 multiplica a taxa por YF_RATE_DECREASE (até o mínimo) e cada
+# chamada aceita a recupera em YF_RATE_RECOVERY chamadas/s, até YF_RATE_PER_SECOND
+YF_MIN_RATE_PER_SECOND = float(os.getenv("YF_MIN_RATE_PER_SECOND", "0.2"))
+YF_RATE_DECREASE = float(os.getenv("YF_RATE_DECREASE", "0.5"))
+YF_RATE_RECOVERY = float(os.getenv("YF_RATE_RECOVERY", "0.05"))
+# Novas tentativas em 429/5xx, com backoff exponencial e jitter
+YF_MAX_RETRIES = int(os.getenv("YF_MAX_RETRIES", "4"))
+YF_BACKOFF_BASE_SECONDS = float(os.getenv("YF_BACKOFF_BASE_SECONDS", "0.5"))
+YF_BACKOFF_MAX_SECONDS = float(os.getenv("YF_BACKOFF_MAX_SECONDS", "30"))
+# Validade do cache de ticker.info (metadados mudam pouco)
+YF_INFO_TTL_SECONDS = float(os.getenv("YF_INFO_TTL_SECONDS", "3600"))
+
+# --- Backfill histórico ---
+# Blocos buscados em paralelo (sempre sujeitos ao limite de taxa do Yahoo)
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+# --- Metadados (ticker.info) ---
+# "snapshots": um objeto NDJSON por snapshot alterado + ponteiro latest.json;
+# "csv": legado, reescreve fetch/{symbol}_metadata.csv a cada ingestão
+METADATA_STORAGE = os.getenv("METADATA_STORAGE", "snapshots").strip().lower()
+
+# --- Observabilidade ---
+# Métricas por etapa (GET /metrics, formato Prometheus) e log por requisição; desligado, os
+# pontos de medição viram no-ops
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+# "text" (formato atual) ou "json" (um objeto por linha, com request_id)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()
@@ -0,0 +1,185 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import BACKFILL_CONCURRENCY
+from app.services.evolution_store import merge_evolution, read_evolution
+from app.services.fetcher import BUCKET_NAME, read_checkpoint_s3, refresh_indicator_state, write_checkpoint_s3
+from app.services.stock_data import get_stock_data
+from app.services.symbol_locks import symbol_lock
+
+logger = setup_logger("backfill")
+
+# Dias por requisição aceitos pelo Yahoo para cada intervalo
+INTERVAL_MAX_DAYS = {
+    "1m": 7, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "90m": 60,
+    "60m": 365, "1h": 365,
+}
+# Até quantos dias para trás o Yahoo fornece cada intervalo intradiário
+INTERVAL_LOOKBACK_DAYS = {
+    "1m": 30, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "90m": 60,
+    "60m": 730, "1h": 730,
+}
+# Intervalos diários ou maiores: sem limite prático, blocos de ~10 anos
+DEFAULT_MAX_DAYS = 3650
+
+Chunk = Tuple[date, date]
+
+
+@dataclass
+class BackfillReport:
+    symbol: str
+    interval: str
+    planned: int = 0
+    fetched: int = 0
+    failed: int = 0
+    rows_written: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def _as_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def split_range(start: date, end: date, interval: str) -> List[Chunk]:
+    """Divide [start, end) em blocos de no máximo INTERVAL_MAX_DAYS[interval] dias."""
+    step = timedelta(days=INTERVAL_MAX_DAYS.get(interval, DEFAULT_MAX_DAYS))
+    chunks = []
+    cursor = start
+    while cursor < end:
+        chunks.append((cursor, min(cursor + step, end)))
+        cursor += step
+    return chunks
+
+
+def plan_backfill(
+    start,
+    end,
+    interval: str,
+    have_first: Optional[datetime] = None,
+    have_last: Optional[datetime] = None,
+    today: Optional[date] = None,
+) -> List[List[Chunk]]:
+    """
+    Lacunas de [start, end) (datas, fim exclusivo) ainda não cobertas por
+    [have_first, have_last] do checkpoint, cada uma dividida em blocos legais para o
+    intervalo. Os blocos de cada lacuna vêm ordenados a partir dos dados já gravados
+    (para trás antes de have_first, para frente depois de have_last), de modo que uma
+    falha no meio deixa o trecho gravado contíguo.
+    """
+    today = today or datetime.utcnow().date()
+    start, end = _as_date(start), _as_date(end)
+    lookback = INTERVAL_LOOKBACK_DAYS.get(interval)
+    if lookback is not None and start < today - timedelta(days=lookback - 1):
+        clipped = today - timedelta(days=lookback - 1)
+        logger.warning(f"[Backfill] Yahoo só fornece {interval} dos últimos {lookback} dias: início ajustado de {start} para {clipped}.")
+        start = clipped
+    if start >= end:
+        return []
+
+    if have_first is None or have_last is None:
+        return [list(reversed(split_range(start, end, interval)))]
+
+    gaps = []
+    # Dias já parcialmente gravados são buscados de novo: as linhas repetidas são descartadas
+    before_end = min(have_first.date() + timedelta(days=1), end)
+    if start < before_end and start <= have_first.date():
+        gaps.append(list(reversed(split_range(start, before_end, interval))))
+    after_start = max(have_last.date(), start)
+    if after_start < end:
+        gaps.append(split_range(after_start, end, interval))
+    return gaps
+
+
+def _fetch_chunk(symbol: str, interval: str, chunk: Chunk, auto_adjust: bool) -> pd.DataFrame:
+    # O limite de taxa do Yahoo é aplicado pelo cliente compartilhado (yahoo_client)
+    data = get_stock_data(
+        symbol=symbol,
+        start_date=chunk[0].isoformat(),
+        end_date=chunk[1].isoformat(),
+        interval=interval,
+        auto_adjust=auto_adjust,
+        as_frame=True,
+        include_info=False,
+        raise_on_empty=False,
+    )
+    return data["data_evolution"]
+
+
+def backfill_symbol(
+    symbol: str,
+    start,
+    end=None,
+    interval: str = "1m",
+    auto_adjust: bool = True,
+    concurrency: int = BACKFILL_CONCURRENCY,
+) -> BackfillReport:
+    """
+    Preenche o histórico do símbolo em [start, end) buscando apenas as lacunas em relação
+    ao checkpoint. Os blocos são buscados em paralelo (sob o limitador de taxa do Yahoo) e
+    gravados de uma vez; reexecutar o mesmo backfill não duplica linhas.
+    """
+    end = end or (datetime.utcnow().date() + timedelta(days=1))
+    checkpoint_key = f"checkpoint/{symbol}_checkpoint.json"
+    chk = read_checkpoint_s3(BUCKET_NAME, checkpoint_key)
+    have_first = chk["start_timestamp"] if chk else None
+    have_last = chk["last_timestamp"] if chk else None
+
+    gaps = plan_backfill(start, end, interval, have_first, have_last)
+    report = BackfillReport(symbol=symbol, interval=interval, planned=sum(len(g) for g in gaps))
+    if not gaps:
+        logger.info(f"[Backfill] {symbol}: nada a buscar entre {start} e {end}.")
+        return report
+    logger.info(f"[Backfill] {symbol}: {report.planned} bloco(s) de {interval} em {len(gaps)} lacuna(s).")
+
+    with ThreadPoolExecutor(max_workers=max(int(concurrency), 1)) as pool:
+        futures = [[pool.submit(_fetch_chunk, symbol, interval, chunk, auto_adjust) for chunk in gap] for gap in gaps]
+
+        frames = []
+        for gap, gap_futures in zip(gaps, futures):
+            # Aproveita apenas os blocos contíguos aos dados existentes até a primeira falha
+            failed = False
+            for chunk, future in zip(gap, gap_futures):
+                try:
+                    frame = future.result()
+                except Exception as e:
+                    report.failed += 1
+                    report.errors.append(f"{chunk[0]}..{chunk[1]}: {e}")
+                    failed = True
+                    continue
+                if failed:
+                    continue
+                report.fetched += 1
+                frames.append(frame)
+
+    if report.failed:
+        logger.warning(f"[Backfill] {symbol}: {report.failed} bloco(s) falharam; reexecute para completar. {report.errors}")
+
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if rows.empty:
+        return report
+    window = (rows["datetime"] >= pd.Timestamp(start)) & (rows["datetime"] < pd.Timestamp(end))
+    if have_first is not None:
+        window &= (rows["datetime"] < have_first) | (rows["datetime"] > have_last)
+    rows = rows[window].drop_duplicates(subset=["datetime"]).sort_values("datetime").reset_index(drop=True)
+    if rows.empty:
+        return report
+
+    # Não intercala com uma ingestão do mesmo símbolo neste processo; a mesclagem e o
+    # checkpoint usam escrita condicional contra os demais processos
+    with symbol_lock(symbol):
+        merge_evolution(symbol, rows)
+        report.rows_written = len(rows)
+        new_first = min(rows["datetime"].min(), have_first) if have_first is not None else rows["datetime"].min()
+        new_last = max(rows["datetime"].max(), have_last) if have_last is not None else rows["datetime"].max()
+        write_checkpoint_s3(BUCKET_NAME, checkpoint_key, new_first, new_last)
+
+        # Linhas anteriores ao início gravado mudam os indicadores acumulados: o estado é reconstruído
+        prepended = have_first is None or rows["datetime"].min() < have_first
+        refresh_indicator_state(symbol, rows, lambda: read_evolution(symbol), None if prepended else have_last)
+    logger.info(f"[Backfill] {symbol}: {report.rows_written} linha(s) gravadas; checkpoint first={new_first}, last={new_last}.")
+    return report
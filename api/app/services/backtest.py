@@ -0,0 +1,166 @@
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import MODEL_PATH, SEQ_LENGTH
+from app.services.evolution_store import iter_evolution
+from app.services.indicator_state import IndicatorEngine
+from app.services.inference_backends import load_backend
+from app.services.sequences import sliding_windows
+
+logger = setup_logger("backtest")
+
+# Barras lidas e convertidas em features por bloco (limita a memória por símbolo)
+CHUNK_ROWS = 100_000
+# Janelas por chamada model.predict
+BATCH_SIZE = 4096
+# Agrupamento temporal das métricas (alias de período do pandas: "h", "D", "W", "M"...)
+BUCKET = "D"
+
+# Acumuladores por grupo: n, soma |erro|, soma erro², soma |erro|/|real|, n (real != 0),
+# acertos de direção, n (movimento real != 0)
+_FIELDS = 7
+
+
+def _summary(acc: np.ndarray) -> dict:
+    n, abs_err, sq_err, ape, ape_n, hits, dir_n = acc.tolist()
+    return {
+        "n": int(n),
+        "mae": abs_err / n if n else None,
+        "rmse": float(np.sqrt(sq_err / n)) if n else None,
+        "mape": 100.0 * ape / ape_n if ape_n else None,
+        "directional_accuracy": hits / dir_n if dir_n else None,
+    }
+
+
+class _Metrics:
+    """Métricas em streaming: somas por bucket, sem guardar predições."""
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.buckets: Dict[pd.Timestamp, np.ndarray] = {}
+
+    def add(self, stamps: np.ndarray, actual: np.ndarray, predicted: np.ndarray, previous: np.ndarray) -> None:
+        err = predicted - actual
+        nonzero = actual != 0
+        moved = actual != previous
+        parts = np.column_stack([
+            np.ones_like(err),
+            np.abs(err),
+            err * err,
+            np.where(nonzero, np.abs(err) / np.where(nonzero, np.abs(actual), 1.0), 0.0),
+            nonzero,
+            moved & (np.sign(predicted - previous) == np.sign(actual - previous)),
+            moved,
+        ]).astype(np.float64)
+        labels = pd.DatetimeIndex(stamps).to_period(self.bucket).start_time
+        sums = pd.DataFrame(parts).groupby(labels).sum()
+        for label, row in zip(sums.index, sums.to_numpy()):
+            if label in self.buckets:
+                self.buckets[label] += row
+            else:
+                self.buckets[label] = row
+
+    def report(self) -> dict:
+        total = np.sum(list(self.buckets.values()), axis=0) if self.buckets else np.zeros(_FIELDS)
+        return {
+            "overall": _summary(total),
+            "buckets": {label.strftime("%Y-%m-%d %H:%M:%S"): _summary(acc) for label, acc in sorted(self.buckets.items())},
+            "_totals": total.tolist(),
+        }
+
+
+def _chunk_features(engine: IndicatorEngine, bars: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+    """Linhas completas de features do bloco, com o estado dos indicadores vindo dos blocos anteriores."""
+    # A cauda do motor passa a guardar só o bloco atual; os acumuladores seguem intactos
+    engine.tail = deque(maxlen=len(bars))
+    engine.tail_index = deque(maxlen=len(bars))
+    engine.update(bars)
+    return engine.feature_matrix(), list(engine.tail_index)
+
+
+_models: Dict[str, object] = {}
+
+
+def _model(path: str):
+    # Um modelo por processo (os workers não compartilham o backend)
+    if path not in _models:
+        _models[path] = load_backend(path)
+    return _models[path]
+
+
+def backtest_symbol(
+    symbol: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    batch_size: int = BATCH_SIZE,
+    bucket: str = BUCKET,
+    model_path: str = MODEL_PATH,
+) -> dict:
+    """
+    Avalia o modelo sobre todo o histórico gravado do símbolo, com as mesmas janelas de
+    sliding_windows/create_sequences: X[i] = features[i:i + SEQ_LENGTH], alvo features[i + SEQ_LENGTH, 0].
+
+    O histórico é lido em blocos (iter_evolution), as features vêm do motor incremental
+    (as mesmas do serviço) e só as SEQ_LENGTH + 1 últimas linhas passam de um bloco ao
+    seguinte; as janelas são views sem cópia, convertidas para float32 lote a lote.
+    """
+    started = time.perf_counter()
+    model = _model(model_path)
+    engine = IndicatorEngine()
+    metrics = _Metrics(bucket)
+    carry = np.empty((0, 0))
+    carry_stamps: List[str] = []
+    bars = windows_total = 0
+
+    for chunk in iter_evolution(symbol, chunk_rows=chunk_rows, start=start, end=end):
+        bars += len(chunk)
+        rows, stamps = _chunk_features(engine, chunk)
+        if len(rows) == 0:
+            continue
+        data = np.concatenate([carry, rows]) if len(carry) else rows
+        stamps = carry_stamps + stamps
+        X, y = sliding_windows(data, SEQ_LENGTH)
+        target_stamps = np.asarray(pd.to_datetime(stamps[SEQ_LENGTH:SEQ_LENGTH + len(X)]))
+        for first in range(0, len(X), batch_size):
+            batch = slice(first, first + batch_size)
+            predicted = model.predict(X[batch].astype(np.float32), batch_size=batch_size, verbose=0)[:, 0]
+            metrics.add(target_stamps[batch], y[batch], predicted.astype(np.float64), X[batch, -1, 0])
+        windows_total += len(X)
+        # Linhas a partir da primeira janela ainda não avaliada
+        carry, carry_stamps = data[len(X):].copy(), stamps[len(X):]
+
+    report = metrics.report()
+    report.update({
+        "symbol": symbol,
+        "bars": bars,
+        "windows": windows_total,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    logger.info(f"[Backtest] {symbol}: {bars} barras, {windows_total} janelas em {report['seconds']}s.")
+    return report
+
+
+def run_backtest(symbols: List[str], workers: int = 1, **kwargs) -> dict:
+    """
+    Backtest de vários símbolos; com workers > 1, um processo por símbolo (até `workers`
+    em paralelo). Retorna as métricas por símbolo e as agregadas de todos eles.
+    """
+    if workers > 1 and len(symbols) > 1:
+        # spawn: o TensorFlow não é seguro após fork
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(symbols)), mp_context=context) as pool:
+            futures = [pool.submit(backtest_symbol, symbol, **kwargs) for symbol in symbols]
+            reports = [future.result() for future in futures]
+    else:
+        reports = [backtest_symbol(symbol, **kwargs) for symbol in symbols]
+
+    totals = np.sum([report.pop("_totals") for report in reports], axis=0) if reports else np.zeros(_FIELDS)
+    return {"symbols": {report["symbol"]: report for report in reports}, "overall": _summary(np.asarray(totals))}
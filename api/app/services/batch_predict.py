@@ -0,0 +1,138 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import numpy as np
+
+from app.config.logger import setup_logger
+from app.config.settings import BATCH_FETCH_CONCURRENCY, BATCH_MAX_SIZE, MODEL_PATH, PREDICTION_CACHE_ENABLED
+from app.services.executors import run_cpu, run_io
+from app.services.forecast import rollout
+from app.services.ingestion import ensure_fresh_async
+from app.services.metrics import observe_batch_size, stage
+from app.services.model_registry import registry
+from app.services.prediction_cache import prediction_cache
+from app.services.preditict import prediction_cache_key, prepare_engine_async, prepare_sequence_async
+
+logger = setup_logger("batch_predict")
+
+
+async def _prepare(symbol: str, max_staleness: float, fetch_kwargs: dict, horizon: int = 1) -> dict:
+    """
+    Etapa por símbolo: garante dados ingeridos, consulta o cache de predições e, se
+    necessário, monta a última sequência (ou, com horizon > 1, o motor de indicadores do
+    forecast). S3/Yahoo no pool de I/O, features no pool de CPU. Nunca levanta exceção.
+    """
+    try:
+        msg, refreshed, age = await ensure_fresh_async(symbol, max_staleness, **fetch_kwargs)
+        if 200 not in msg:
+            return {"symbol": symbol, "error": msg[0]}
+        item = {"symbol": symbol, "refreshed": refreshed, "data_age": age}
+
+        if horizon > 1:
+            engine = await prepare_engine_async(symbol)
+            if engine is None:
+                return {**item, "error": "Dados insuficientes para predição."}
+            return {**item, "engine": engine}
+
+        key = await run_io(prediction_cache_key, symbol) if PREDICTION_CACHE_ENABLED else None
+        if key is not None:
+            cached = prediction_cache.get(symbol, *key)
+            if cached is not None:
+                return {**item, "prediction": cached, "cache": "HIT"}
+
+        sequence = await prepare_sequence_async(symbol, fetch_kwargs.get("start_date"), fetch_kwargs.get("end_date"))
+        if sequence is None:
+            return {**item, "error": "Dados insuficientes para predição."}
+        return {**item, "sequence": sequence, "cache_key": key}
+    except Exception as e:
+        logger.exception(f"[Lote] Falha ao preparar {symbol}: {e}")
+        return {"symbol": symbol, "error": str(e)}
+
+
+def _predict_pending(pending: List[dict]) -> List[dict]:
+    """Uma única chamada model.predict para todas as sequências pendentes (roda no pool de CPU)."""
+    try:
+        model = registry.get(MODEL_PATH)
+        X = np.concatenate([item.pop("sequence") for item in pending]).astype(np.float32, copy=False)
+        logger.info(f"[Lote] Inferência única com shape {X.shape}.")
+        observe_batch_size(len(X), "batch_endpoint")
+        with stage("model_predict"):
+            predictions = model.predict(X, batch_size=len(X), verbose=0)[:, 0]
+    except Exception as e:
+        logger.exception(f"[Lote] Falha na inferência em lote: {e}")
+        for item in pending:
+            item.pop("sequence", None)
+            item.pop("cache_key", None)
+        return [{**item, "error": f"Falha na inferência: {e}"} for item in pending]
+
+    results = []
+    for item, value in zip(pending, predictions.tolist()):
+        key = item.pop("cache_key")
+        if key is not None:
+            prediction_cache.put(item["symbol"], *key, value)
+        results.append({**item, "prediction": value, "cache": "MISS"})
+    return results
+
+
+def _forecast_pending(pending: List[dict], horizon: int) -> List[dict]:
+    """Rollout conjunto: uma chamada model.predict por passo para todos os símbolos pendentes."""
+    try:
+        model = registry.get(MODEL_PATH)
+        paths = rollout(model, [item.pop("engine") for item in pending], horizon)
+    except Exception as e:
+        logger.exception(f"[Lote] Falha no forecast em lote: {e}")
+        for item in pending:
+            item.pop("engine", None)
+        return [{**item, "error": f"Falha na inferência: {e}"} for item in pending]
+
+    return [{**item, "prediction": path[0]["prediction"], "forecast": path} for item, path in zip(pending, paths)]
+
+
+async def predict_many(
+    symbols: List[str],
+    max_staleness: float,
+    concurrency: int = BATCH_FETCH_CONCURRENCY,
+    horizon: int = 1,
+    batch_size: int = BATCH_MAX_SIZE,
+    **fetch_kwargs,
+) -> AsyncIterator[dict]:
+    """
+    Predição para vários símbolos. A preparação (ingestão + features) roda nos pools
+    compartilhados com no máximo `concurrency` símbolos desta requisição por vez; erros e
+    acertos de cache são emitidos assim que ficam prontos, e as demais predições saem em
+    micro-lotes de até `batch_size` sequências, cada um inferido numa única chamada assim
+    que enche (com horizon > 1, um rollout conjunto com uma inferência por passo).
+    """
+    unique = list(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+    semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+    batch_size = max(int(batch_size), 1)
+
+    async def prepare(symbol: str) -> dict:
+        async with semaphore:
+            return await _prepare(symbol, max_staleness, fetch_kwargs, horizon)
+
+    async def flush(pending: List[dict]) -> List[dict]:
+        if horizon > 1:
+            return await run_cpu(_forecast_pending, pending, horizon)
+        return await run_cpu(_predict_pending, pending)
+
+    tasks = [asyncio.ensure_future(prepare(symbol)) for symbol in unique]
+    pending: List[dict] = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if "sequence" not in item and "engine" not in item:
+                yield item
+                continue
+            pending.append(item)
+            if len(pending) >= batch_size:
+                for result in await flush(pending):
+                    yield result
+                pending = []
+        if pending:
+            for result in await flush(pending):
+                yield result
+    finally:
+        # Cliente desconectado: não prepara os símbolos que ainda não começaram
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from app.config.logger import setup_logger
+from app.config.settings import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from app.services.metrics import observe_batch_size, stage
+from app.services.model_registry import registry
+
+logger = setup_logger("batcher")
+
+# Quantidade de amostras recentes usadas no cálculo dos percentis de espera
+_WAIT_SAMPLES = 2048
+
+
+@dataclass
+class _Request:
+    sequence: np.ndarray
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    Fila de inferência na frente do modelo.
+    Agrupa sequências concorrentes (shape (SEQ_LENGTH, n_features)) em um único lote,
+    limitado por max_batch_size e pela espera máxima max_wait_ms contada a partir do
+    primeiro item do lote, executa um único forward pass e devolve cada resultado
+    ao chamador correspondente.
+    """
+
+    def __init__(self, model_path: str, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.model_path = model_path
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._items = 0
+        self._batches = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, sequence: np.ndarray) -> Future:
+        """Enfileira uma sequência (2D, ou 3D com lote 1) e retorna um Future com o float previsto."""
+        if sequence.ndim == 3:
+            sequence = sequence[0]
+        request = _Request(sequence=sequence, future=Future())
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, sequence: np.ndarray, timeout: Optional[float] = None) -> float:
+        return self.submit(sequence).result(timeout=timeout)
+
+    def _collect(self) -> List[_Request]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # Janela esgotada: aproveita apenas o que já está na fila
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            # Sequências de shapes diferentes não podem ser empilhadas juntas
+            groups: Dict[tuple, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.sequence.shape, []).append(request)
+            for requests in groups.values():
+                self._run_group(requests, started)
+
+    def _run_group(self, requests: List[_Request], started: float) -> None:
+        waits = [started - r.enqueued_at for r in requests]
+        try:
+            model = registry.get(self.model_path)
+            inputs = np.stack([r.sequence for r in requests])
+            observe_batch_size(len(inputs), "microbatch")
+            with stage("model_predict"):
+                predictions = model.predict(inputs, verbose=0)
+            for request, value in zip(requests, predictions):
+                request.future.set_result(float(value[0]))
+        except Exception as e:
+            logger.exception(f"Erro na inferência em lote (tamanho={len(requests)}): {e}")
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        with self._stats_lock:
+            self._batch_sizes[len(requests)] += 1
+            self._waits.extend(waits)
+            self._items += len(requests)
+            self._batches += 1
+
+    def stats(self) -> dict:
+        """Métricas de tamanho de lote e espera em fila (ms) para ajuste de latência x vazão."""
+        with self._stats_lock:
+            waits_ms = np.array(self._waits, dtype=np.float64) * 1000.0
+            sizes = dict(sorted(self._batch_sizes.items()))
+            items, batches = self._items, self._batches
+        result = {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "queue_depth": self._queue.qsize(),
+        }
+        if waits_ms.size:
+            p50, p95, p99 = np.percentile(waits_ms, [50, 95, 99])
+            result["queue_wait_ms"] = {"p50": p50, "p95": p95, "p99": p99, "max": float(waits_ms.max())}
+        return result
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_path: str) -> MicroBatcher:
+    """Retorna o batcher (único por processo) associado ao caminho do modelo."""
+    batcher = _batchers.get(model_path)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.setdefault(model_path, MicroBatcher(model_path))
+    return batcher
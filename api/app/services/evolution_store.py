@@ -0,0 +1,506 @@
+import io
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import PARQUET_COMPACTION_ENABLED, S3_CACHE_IMMUTABLE_TTL_SECONDS, STORAGE_FORMAT
+from app.services.s3_utils import (
+    PreconditionFailed,
+    delete_keys_s3,
+    head_object_s3,
+    list_keys_s3,
+    list_prefixes_s3,
+    read_bytes_from_s3,
+    read_csv_from_s3,
+    read_csv_versioned,
+    read_parquet_from_s3,
+    read_parquet_versioned,
+    retry_on_conflict,
+    s3,
+    write_csv_to_s3,
+    write_parquet_to_s3,
+)
+
+logger = setup_logger("evolution_store")
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+EVOLUTION_COLUMNS = ["datetime", "open", "high", "low", "close", "volume"]
+
+_DATE_PARTITION = re.compile(r"/date=(\d{4}-\d{2}-\d{2})/")
+# Arquivo único de um dia compactado (compact_day)
+_COMPACTED_FILE = "data.parquet"
+
+# Listagem das partes por (símbolo, dia), só para dias já encerrados
+_day_keys_cache: Dict[Tuple[str, date], Tuple[float, List[str]]] = {}
+_day_keys_lock = threading.Lock()
+
+# Bytes lidos do início do CSV para obter o cabeçalho e estimar o tamanho médio de linha
+_CSV_SAMPLE_BYTES = 64 * 1024
+# Tamanho de cada GET por intervalo na leitura em blocos do CSV (iter_evolution)
+_CSV_STREAM_BYTES = 8 * 1024 * 1024
+
+Timestamp = Union[str, datetime, pd.Timestamp, None]
+
+
+def evolution_csv_key(symbol: str) -> str:
+    return f"fetch/{symbol}_evolution.csv"
+
+
+def evolution_prefix(symbol: str) -> str:
+    return f"fetch/evolution/symbol={symbol}/"
+
+
+def _partition_key(symbol: str, day: date, first: pd.Timestamp, last: pd.Timestamp) -> str:
+    # O nome da parte deriva do intervalo de timestamps: regravar o mesmo lote é idempotente
+    return f"{evolution_prefix(symbol)}date={day.isoformat()}/part-{first:%H%M%S}-{last:%H%M%S}.parquet"
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante as colunas do histórico com datetime convertido e em ordem cronológica."""
+    out = df[EVOLUTION_COLUMNS].copy()
+    out["datetime"] = pd.to_datetime(out["datetime"], errors="coerce")
+    return out.dropna(subset=["datetime"]).sort_values("datetime", kind="stable").reset_index(drop=True)
+
+
+def _day_prefix(symbol: str, day: date) -> str:
+    return f"{evolution_prefix(symbol)}date={day.isoformat()}/"
+
+
+def _compacted_key(symbol: str, day: date) -> str:
+    return _day_prefix(symbol, day) + _COMPACTED_FILE
+
+
+def _partition_days(symbol: str, start: Timestamp = None, end: Timestamp = None) -> List[Tuple[date, bool]]:
+    """
+    Dias com partições do símbolo, podados pelo intervalo de datas, e se cada um já está
+    encerrado (existe um dia posterior). Uma listagem com delimitador: um item por dia.
+    """
+    first_day = pd.Timestamp(start).date() if start is not None else None
+    last_day = pd.Timestamp(end).date() if end is not None else None
+    days = []
+    for prefix in list_prefixes_s3(BUCKET_NAME, evolution_prefix(symbol)):
+        match = _DATE_PARTITION.search(prefix)
+        if match:
+            days.append(date.fromisoformat(match.group(1)))
+    days.sort()
+    return [
+        (day, i < len(days) - 1) for i, day in enumerate(days)
+        if (first_day is None or day >= first_day) and (last_day is None or day <= last_day)
+    ]
+
+
+def _day_keys(symbol: str, day: date, closed: bool) -> List[str]:
+    """
+    Partes do dia. A listagem de um dia encerrado fica em cache por S3_CACHE_IMMUTABLE_TTL_SECONDS
+    (só muda por backfill ou compactação, que a descartam neste processo); a do dia corrente,
+    que recebe as ingestões, é sempre refeita.
+    """
+    now = time.time()
+    with _day_keys_lock:
+        cached = _day_keys_cache.get((symbol, day))
+    if closed and cached is not None and now < cached[0]:
+        return cached[1]
+    keys = [key for key in list_keys_s3(BUCKET_NAME, _day_prefix(symbol, day)) if key.endswith(".parquet")]
+    if closed:
+        with _day_keys_lock:
+            _day_keys_cache[(symbol, day)] = (now + S3_CACHE_IMMUTABLE_TTL_SECONDS, keys)
+    return keys
+
+
+def _forget_day(symbol: str, day: date) -> None:
+    with _day_keys_lock:
+        _day_keys_cache.pop((symbol, day), None)
+
+
+def _read_day(symbol: str, day: date, closed: bool, columns: List[str], filters: Optional[list] = None,
+              cache_ttl: Optional[float] = S3_CACHE_IMMUTABLE_TTL_SECONDS) -> Optional[pd.DataFrame]:
+    """
+    Partes do dia concatenadas (None se o dia não tem linhas no filtro). Se uma compactação
+    em outro processo removeu uma parte já listada, a listagem é refeita uma vez.
+    """
+    for attempt in range(2):
+        try:
+            frames = [
+                read_parquet_from_s3(BUCKET_NAME, key, columns=columns, filters=filters, cache_ttl=cache_ttl)
+                for key in _day_keys(symbol, day, closed)
+            ]
+            break
+        except s3.exceptions.NoSuchKey:
+            _forget_day(symbol, day)
+            if attempt:
+                raise
+            logger.info(f"Partição {day} de {symbol} compactada durante a leitura; listando de novo.")
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def _write_partitions(symbol: str, df: pd.DataFrame) -> int:
+    """
+    Grava uma parte nova por data presente em `df`; nunca reescreve partes existentes.
+    A escrita só cria (If-None-Match): se outro processo já gravou a mesma parte, ela é mantida.
+    Em seguida compacta os dias que já estão encerrados (_compact_closed_days).
+    """
+    written = 0
+    days = []
+    for day, rows in df.groupby(df["datetime"].dt.date, sort=True):
+        days.append(day)
+        _forget_day(symbol, day)
+        rows = rows.reset_index(drop=True)
+        key = _partition_key(symbol, day, rows["datetime"].iloc[0], rows["datetime"].iloc[-1])
+        try:
+            write_parquet_to_s3(BUCKET_NAME, key, rows, if_none_match=True)
+        except PreconditionFailed:
+            logger.info(f"Parte {key} já gravada por outra ingestão; mantida.")
+            continue
+        written += 1
+    if PARQUET_COMPACTION_ENABLED and days:
+        _compact_closed_days(symbol, days)
+    return written
+
+
+def compact_day(symbol: str, day: date) -> int:
+    """
+    Junta as partes de um dia no arquivo único do dia (date=.../data.parquet) e remove as
+    partes incorporadas. A gravação é condicionada ao ETag do arquivo compactado lido
+    (If-Match, ou If-None-Match se ele ainda não existe): se outra compactação gravar no
+    meio, tudo é refeito a partir de uma nova leitura e nenhuma linha se perde.
+    Retorna a quantidade de partes incorporadas.
+    """
+    key = _compacted_key(symbol, day)
+
+    def compact() -> List[str]:
+        parts = [k for k in list_keys_s3(BUCKET_NAME, _day_prefix(symbol, day)) if k.endswith(".parquet") and k != key]
+        if not parts:
+            return []
+        current, etag = read_parquet_versioned(BUCKET_NAME, key)
+        try:
+            frames = [read_parquet_from_s3(BUCKET_NAME, part, columns=EVOLUTION_COLUMNS,
+                                           cache_ttl=S3_CACHE_IMMUTABLE_TTL_SECONDS) for part in parts]
+        except s3.exceptions.NoSuchKey as e:
+            # Outra compactação já incorporou (e removeu) a parte: relê o arquivo compactado
+            raise PreconditionFailed(f"parte de {symbol} em {day} removida por outra compactação") from e
+        if current is not None:
+            frames.insert(0, current)
+        merged = _dedupe(_normalize(pd.concat(frames, ignore_index=True))).reset_index(drop=True)
+        write_parquet_to_s3(BUCKET_NAME, key, merged, if_match=etag, if_none_match=etag is None)
+        return parts
+
+    parts = retry_on_conflict(f"compactação de {symbol} em {day}", compact)
+    _forget_day(symbol, day)
+    if parts:
+        # O arquivo compactado já contém as linhas: leitores que ainda listam as partes
+        # veem os timestamps em dobro por um instante, e _dedupe os descarta
+        delete_keys_s3(BUCKET_NAME, parts)
+        logger.info(f"Partição {day} de {symbol}: {len(parts)} parte(s) compactada(s) em {key}.")
+    return len(parts)
+
+
+def _compact_closed_days(symbol: str, written_days: List[date]) -> None:
+    """
+    Compacta os dias encerrados afetados pela última gravação: os gravados que já têm um dia
+    posterior e o último dia anterior a eles (encerrado pela chegada do novo dia).
+    Falhas só são registradas: a compactação nunca falha uma ingestão.
+    """
+    try:
+        days = [day for day, _ in _partition_days(symbol)]
+        if not days:
+            return
+        candidates = {day for day in written_days if day < days[-1]}
+        previous = [day for day in days if day < min(written_days)]
+        if previous:
+            candidates.add(previous[-1])
+        for day in sorted(candidates):
+            keys = _day_keys(symbol, day, closed=True)
+            if keys and keys != [_compacted_key(symbol, day)]:
+                compact_day(symbol, day)
+    except Exception as e:
+        logger.warning(f"Falha ao compactar partições de {symbol}: {e}")
+
+
+def _dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ingestões concorrentes em processos diferentes podem gravar partes sobrepostas (lotes
+    com o mesmo início e fins diferentes): cada timestamp é considerado uma única vez.
+    """
+    return df.drop_duplicates(subset=["datetime"], keep="first")
+
+
+def _parse_csv(payload: bytes) -> pd.DataFrame:
+    df = pd.read_csv(io.BytesIO(payload))
+    df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    return df
+
+
+def _read_csv_tail(symbol: str, n_rows: Optional[int] = None, since: Timestamp = None) -> pd.DataFrame:
+    """
+    Lê apenas o final do CSV com GETs por intervalo (Range: bytes=-N), aumentando o
+    intervalo até cobrir `n_rows` linhas ou alcançar o timestamp `since`.
+    O custo depende do trecho pedido, não do tamanho do histórico.
+    """
+    key = evolution_csv_key(symbol)
+    size = int(head_object_s3(BUCKET_NAME, key)["ContentLength"])
+    sample = read_bytes_from_s3(BUCKET_NAME, key, f"bytes=0-{_CSV_SAMPLE_BYTES - 1}")
+    if len(sample) >= size:
+        return _parse_csv(sample)
+
+    lines = sample.split(b"\n")
+    header = lines[0] + b"\n"
+    body = [line for line in lines[1:-1] if line.strip()]
+    avg_line = max(sum(len(line) + 1 for line in body) / max(len(body), 1), 1.0)
+    since = pd.Timestamp(since) if since is not None else None
+
+    wanted = n_rows if n_rows is not None else 1024
+    span = int(wanted * avg_line * 1.25) + len(header)
+    while True:
+        if span >= size - len(header):
+            return _parse_csv(read_bytes_from_s3(BUCKET_NAME, key))
+        chunk = read_bytes_from_s3(BUCKET_NAME, key, f"bytes=-{span}")
+        # Descarta a primeira linha, possivelmente cortada no meio
+        chunk = chunk[chunk.find(b"\n") + 1:]
+        df = _parse_csv(header + chunk)
+        if n_rows is not None and len(df) >= n_rows:
+            return df
+        if since is not None and not df.empty and df["datetime"].min() <= since:
+            return df
+        span *= 2
+
+
+def read_evolution_tail(symbol: str, n_rows: int, storage: str = STORAGE_FORMAT) -> pd.DataFrame:
+    """
+    Últimas `n_rows` barras do símbolo (datetime convertido, ordem cronológica).
+    CSV: GETs por intervalo no final do arquivo. Parquet: partições da mais recente para trás.
+    """
+    if storage == "parquet":
+        frames, seen = [], set()
+        for day, closed in reversed(_partition_days(symbol)):
+            frame = _read_day(symbol, day, closed, EVOLUTION_COLUMNS)
+            if frame is None:
+                continue
+            frames.append(frame)
+            # Timestamps distintos: partes sobrepostas não contam duas vezes
+            seen.update(frame["datetime"].tolist())
+            if len(seen) >= n_rows:
+                break
+        if not frames:
+            return pd.DataFrame(columns=EVOLUTION_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        df = _dedupe(df.sort_values("datetime", kind="stable"))
+    else:
+        df = _read_csv_tail(symbol, n_rows=n_rows)
+    df = df.dropna(subset=["datetime"]).sort_values("datetime", kind="stable")
+    return df[EVOLUTION_COLUMNS].tail(n_rows).reset_index(drop=True)
+
+
+def evolution_exists(symbol: str, storage: str = STORAGE_FORMAT) -> bool:
+    if storage == "parquet":
+        return bool(list_prefixes_s3(BUCKET_NAME, evolution_prefix(symbol)))
+    key = evolution_csv_key(symbol)
+    return key in list_keys_s3(BUCKET_NAME, key)
+
+
+def read_evolution(
+    symbol: str,
+    columns: Optional[List[str]] = None,
+    start: Timestamp = None,
+    end: Timestamp = None,
+    storage: str = STORAGE_FORMAT,
+) -> pd.DataFrame:
+    """
+    Lê o histórico do símbolo com `datetime` convertido, em ordem cronológica.
+    No layout Parquet as partições fora de [start, end] nem são baixadas, e as colunas
+    e o intervalo são repassados ao leitor (pushdown). `datetime` sempre é incluída.
+    """
+    wanted = EVOLUTION_COLUMNS if columns is None else ["datetime"] + [c for c in columns if c != "datetime"]
+    if storage == "parquet":
+        filters = []
+        if start is not None:
+            filters.append(("datetime", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("datetime", "<=", pd.Timestamp(end)))
+        frames = [
+            frame for frame in (
+                _read_day(symbol, day, closed, wanted, filters or None)
+                for day, closed in _partition_days(symbol, start, end)
+            )
+            if frame is not None
+        ]
+        if not frames:
+            return pd.DataFrame(columns=wanted)
+        df = pd.concat(frames, ignore_index=True)
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        return _dedupe(df.sort_values("datetime", kind="stable")).reset_index(drop=True)
+
+    if start is not None and end is None:
+        # Só o trecho final interessa: evita baixar e converter o arquivo inteiro
+        df = _read_csv_tail(symbol, since=start)
+    else:
+        df = read_csv_from_s3(BUCKET_NAME, evolution_csv_key(symbol))
+        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    df.sort_values("datetime", inplace=True, kind="stable")
+    if start is not None:
+        df = df[df["datetime"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["datetime"] <= pd.Timestamp(end)]
+    return df[wanted].reset_index(drop=True)
+
+
+def _iter_csv_pieces(symbol: str) -> Iterator[pd.DataFrame]:
+    """CSV lido em GETs por intervalo de _CSV_STREAM_BYTES; só linhas completas são convertidas."""
+    key = evolution_csv_key(symbol)
+    size = int(head_object_s3(BUCKET_NAME, key)["ContentLength"])
+    header = b""
+    pending = b""
+    offset = 0
+    while offset < size:
+        end = min(offset + _CSV_STREAM_BYTES, size) - 1
+        pending += read_bytes_from_s3(BUCKET_NAME, key, f"bytes={offset}-{end}")
+        offset = end + 1
+        if not header:
+            newline = pending.find(b"\n")
+            if newline < 0:
+                continue
+            header, pending = pending[:newline + 1], pending[newline + 1:]
+        # A última linha pode estar cortada: fica para o próximo intervalo
+        cut = len(pending) if offset >= size else pending.rfind(b"\n") + 1
+        if cut > 0:
+            body, pending = pending[:cut], pending[cut:]
+            if body.strip():
+                yield _parse_csv(header + body)
+
+
+def iter_evolution(
+    symbol: str,
+    chunk_rows: int = 100_000,
+    start: Timestamp = None,
+    end: Timestamp = None,
+    storage: str = STORAGE_FORMAT,
+) -> Iterator[pd.DataFrame]:
+    """
+    Histórico em blocos cronológicos de ao menos `chunk_rows` linhas (o último pode ser menor),
+    sem carregar o histórico inteiro: partição a partição no Parquet e por GETs com intervalo
+    no CSV. A memória usada depende do tamanho do bloco, não do histórico.
+    """
+    if storage == "parquet":
+        filters = []
+        if start is not None:
+            filters.append(("datetime", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("datetime", "<=", pd.Timestamp(end)))
+        pieces = (
+            frame for frame in (
+                _read_day(symbol, day, closed, EVOLUTION_COLUMNS, filters or None, cache_ttl=None)
+                for day, closed in _partition_days(symbol, start, end)
+            )
+            if frame is not None
+        )
+    else:
+        pieces = _iter_csv_pieces(symbol)
+
+    buffer: List[pd.DataFrame] = []
+    buffered = 0
+    # Parquet: maior timestamp já entregue, para descartar linhas de partes sobrepostas
+    emitted = None
+    for piece in pieces:
+        piece = piece.copy()
+        piece["datetime"] = pd.to_datetime(piece["datetime"], errors="coerce")
+        if emitted is not None:
+            piece = piece[piece["datetime"] > emitted]
+        if start is not None:
+            piece = piece[piece["datetime"] >= pd.Timestamp(start)]
+        if end is not None:
+            piece = piece[piece["datetime"] <= pd.Timestamp(end)]
+        if piece.empty:
+            continue
+        buffer.append(piece[EVOLUTION_COLUMNS])
+        buffered += len(piece)
+        if buffered >= chunk_rows:
+            chunk = pd.concat(buffer, ignore_index=True).sort_values("datetime", kind="stable")
+            if storage == "parquet":
+                chunk = _dedupe(chunk)
+                emitted = chunk["datetime"].iloc[-1]
+            yield chunk
+            buffer, buffered = [], 0
+    if buffer:
+        chunk = pd.concat(buffer, ignore_index=True).sort_values("datetime", kind="stable")
+        yield _dedupe(chunk) if storage == "parquet" else chunk
+
+
+def write_evolution(symbol: str, df: pd.DataFrame, storage: str = STORAGE_FORMAT) -> None:
+    """
+    Grava o histórico inicial do símbolo. No CSV a escrita só cria o arquivo: se outro
+    processo o criou antes, levanta PreconditionFailed (o chamador relê e acrescenta).
+    """
+    if storage == "parquet":
+        _write_partitions(symbol, _normalize(df))
+    else:
+        write_csv_to_s3(BUCKET_NAME, evolution_csv_key(symbol), df, if_none_match=True)
+
+
+def append_evolution(symbol: str, new_rows: pd.DataFrame, existing: Optional[pd.DataFrame] = None,
+                     storage: str = STORAGE_FORMAT, etag: Optional[str] = None) -> None:
+    """
+    Acrescenta linhas novas (posteriores ao último timestamp gravado).
+    CSV: concatena ao histórico existente e reescreve o arquivo, condicionado ao ETag da
+    versão lida (`etag` de `existing`, ou o da leitura feita aqui): se outro processo gravou
+    no meio, levanta PreconditionFailed em vez de sobrescrever as linhas dele.
+    Parquet: grava apenas novas partes, sem ler nem reescrever o histórico.
+    """
+    if new_rows.empty:
+        return
+    if storage == "parquet":
+        _write_partitions(symbol, _normalize(new_rows))
+        return
+    if existing is None:
+        existing, etag = read_csv_versioned(BUCKET_NAME, evolution_csv_key(symbol))
+    write_csv_to_s3(BUCKET_NAME, evolution_csv_key(symbol), pd.concat([existing, new_rows], ignore_index=True),
+                    if_match=etag)
+
+
+def merge_evolution(symbol: str, rows: pd.DataFrame, storage: str = STORAGE_FORMAT) -> int:
+    """
+    Mescla linhas em qualquer posição do histórico (ex.: backfill anterior ao primeiro
+    registro). Idempotente: no CSV, timestamps já gravados são ignorados; no Parquet, o
+    mesmo lote regrava as mesmas partes. Retorna a quantidade de linhas do resultado gravado.
+    """
+    if rows.empty:
+        return 0
+    rows = _normalize(rows).drop_duplicates(subset=["datetime"], keep="last")
+    if storage == "parquet":
+        _write_partitions(symbol, rows)
+        return len(rows)
+    key = evolution_csv_key(symbol)
+
+    def merge() -> int:
+        # Leitura-alteração-escrita condicionada ao ETag lido; refeita se outro processo gravar no meio
+        existing, etag = read_csv_versioned(BUCKET_NAME, key)
+        merged = rows
+        if existing is not None:
+            merged = pd.concat([_normalize(existing), rows], ignore_index=True)
+            merged = merged.drop_duplicates(subset=["datetime"], keep="first")
+            merged = merged.sort_values("datetime", kind="stable").reset_index(drop=True)
+        write_csv_to_s3(BUCKET_NAME, key, merged, if_match=etag, if_none_match=etag is None)
+        return len(merged)
+
+    return retry_on_conflict(f"mesclagem do histórico de {symbol}", merge)
+
+
+def migrate_csv_to_parquet(symbol: str) -> int:
+    """
+    Migração única do layout CSV para o particionado em Parquet.
+    O CSV original é mantido; retorna a quantidade de linhas migradas.
+    """
+    df = _normalize(read_csv_from_s3(BUCKET_NAME, evolution_csv_key(symbol)))
+    df = df.drop_duplicates(subset=["datetime"], keep="last")
+    parts = _write_partitions(symbol, df)
+    migrated = read_evolution(symbol, columns=["datetime"], storage="parquet")
+    if len(migrated) != len(df):
+        raise RuntimeError(f"Migração de {symbol} inconsistente: {len(df)} linhas no CSV, {len(migrated)} em Parquet")
+    logger.info(f"Migração de {symbol}: {len(df)} linhas em {parts} partição(ões) Parquet.")
+    return len(df)
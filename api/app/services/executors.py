@@ -0,0 +1,32 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.config.settings import CPU_POOL_SIZE, IO_POOL_SIZE
+
+T = TypeVar("T")
+
+# Pools separados: uma rajada de chamadas lentas ao Yahoo/S3 não ocupa as threads de CPU,
+# e o trabalho de CPU (features, TensorFlow) fica limitado a CPU_POOL_SIZE por processo.
+# Threads (e não processos): o modelo carregado é compartilhado e NumPy/TensorFlow liberam o GIL.
+# Vivem o processo inteiro: no Lambda o Mangum repetiria o lifespan a cada invocação, então
+# os pools não são encerrados nele.
+io_executor = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_POOL_SIZE, thread_name_prefix="cpu")
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa I/O bloqueante no pool de I/O sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    # O contexto (request ID, medições da requisição) acompanha a chamada na thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa trabalho de CPU no pool limitado de CPU."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, functools.partial(context.run, fn, *args, **kwargs))
@@ -0,0 +1,251 @@
+from typing import Callable
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.config.settings import FEATURE_COLUMNS
+from app.services.indicator_state import (
+    ADX_WINDOW,
+    AO_FAST,
+    AO_SLOW,
+    ATR_WINDOW,
+    BB_DEV,
+    BB_WINDOW,
+    CCI_CONSTANT,
+    CCI_WINDOW,
+    EMA_WINDOW,
+    MACD_FAST,
+    MACD_SIGN,
+    MACD_SLOW,
+    RSI_WINDOW,
+    STOCH_SMOOTH,
+    STOCH_WINDOW,
+    VWAP_WINDOW,
+)
+
+# Tamanho do bloco da recorrência linear vetorizada
+_BLOCK = 64
+# Quantidade de janelas processadas por vez nas reduções que geram temporários
+_CHUNK = 1 << 16
+
+
+def _linear_recurrence(x: np.ndarray, r: float, y0: float = 0.0) -> np.ndarray:
+    """
+    y[t] = r * y[t-1] + x[t], com y[-1] = y0, sem laço por elemento.
+    Cada bloco de _BLOCK itens é resolvido com uma matriz triangular de potências de r
+    (sempre <= 1, estável) e apenas o valor de carry entre blocos é propagado em Python.
+    """
+    n = len(x)
+    if n == 0:
+        return np.empty(0)
+    if not np.isfinite(x).all():
+        # NaN/inf contaminariam o bloco inteiro no produto matricial: resolve sequencialmente
+        out = np.empty(n)
+        y = y0
+        for i, value in enumerate(x.tolist()):
+            y = r * y + value
+            out[i] = y
+        return out
+    n_blocks = -(-n // _BLOCK)
+    padded = np.zeros(n_blocks * _BLOCK)
+    padded[:n] = x
+    padded = padded.reshape(n_blocks, _BLOCK)
+    k = np.arange(_BLOCK)
+    lag = k[:, None] - k[None, :]
+    weights = np.where(lag >= 0, r ** np.maximum(lag, 0), 0.0)
+    partial = padded @ weights.T
+    r_block = r ** _BLOCK
+    carries = np.empty(n_blocks)
+    carry = y0
+    for b, end in enumerate(partial[:, -1].tolist()):
+        carries[b] = carry
+        carry = end + r_block * carry
+    partial += carries[:, None] * (r ** (k + 1))[None, :]
+    return partial.ravel()[:n]
+
+
+def _ewm(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """Equivalente a `Series.ewm(alpha=alpha, min_periods=..., adjust=False).mean()` sem NaN na entrada."""
+    out = np.full(len(x), np.nan)
+    if len(x) == 0:
+        return out
+    out[:] = _linear_recurrence(alpha * x, 1.0 - alpha, y0=x[0])
+    out[:min_periods - 1] = np.nan
+    return out
+
+
+def _rolling(x: np.ndarray, window: int, reducer: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """Aplica `reducer` (sobre o eixo 1) às janelas de `x`; as window-1 primeiras posições ficam NaN."""
+    out = np.full(len(x), np.nan)
+    if len(x) < window:
+        return out
+    windows = sliding_window_view(x, window)
+    for start in range(0, len(windows), _CHUNK):
+        chunk = windows[start:start + _CHUNK]
+        out[window - 1 + start:window - 1 + start + len(chunk)] = reducer(chunk)
+    return out
+
+
+def _mean(w: np.ndarray) -> np.ndarray:
+    return w.mean(axis=1)
+
+
+def _std(w: np.ndarray) -> np.ndarray:
+    return w.std(axis=1)
+
+
+def _mad(w: np.ndarray) -> np.ndarray:
+    return np.abs(w - w.mean(axis=1, keepdims=True)).mean(axis=1)
+
+
+def _adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, w: int = ADX_WINDOW):
+    """ADX, +DI e -DI com as mesmas somas de Wilder e preenchimento com zeros da biblioteca `ta`."""
+    n = len(close)
+    adx = np.zeros(n)
+    adx_pos = np.zeros(n)
+    adx_neg = np.zeros(n)
+    if n <= w:
+        return adx, adx_pos, adx_neg
+
+    prev_close = close[:-1]
+    ddm = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+    up = high[1:] - high[:-1]
+    down = low[:-1] - low[1:]
+    pos = np.where((up > down) & (up > 0), up, 0.0)
+    neg = np.where((down > up) & (down > 0), down, 0.0)
+
+    # Posição [j] das séries suavizadas corresponde à linha w + j
+    decay = 1.0 - 1.0 / w
+
+    def smooth(x: np.ndarray) -> np.ndarray:
+        seed = x[:w].sum()
+        return np.concatenate(([seed], _linear_recurrence(x[w:], decay, y0=seed)))
+
+    trs, dip, din = smooth(ddm), smooth(pos), smooth(neg)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dip_pct = 100 * (dip / trs)
+        din_pct = 100 * (din / trs)
+        di = 100 * np.abs((dip_pct - din_pct) / (dip_pct + din_pct))
+    adx_pos[w + 1:] = dip_pct[1:]
+    adx_neg[w + 1:] = din_pct[1:]
+
+    first = 2 * w - 1
+    if n > first:
+        seed = di[:w].mean()
+        adx[first] = seed
+        adx[first + 1:] = _linear_recurrence(di[w:] / w, (w - 1) / w, y0=seed)
+    return adx, adx_pos, adx_neg
+
+
+def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, w: int = ATR_WINDOW) -> np.ndarray:
+    n = len(close)
+    atr = np.zeros(n)
+    tr = high - low
+    tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - close[:-1]), np.abs(low[1:] - close[:-1])))
+    if n < w:
+        return atr
+    seed = tr[:w].mean()
+    atr[w - 1] = seed
+    atr[w:] = _linear_recurrence(tr[w:] / w, (w - 1) / w, y0=seed)
+    return atr
+
+
+def compute_feature_matrix(open_, high, low, close, volume) -> np.ndarray:
+    """
+    Calcula as 28 features de FEATURE_COLUMNS (na ordem do modelo) em um único array
+    float32 contíguo de shape (n, 28), pré-alocado. Linhas de aquecimento ficam com NaN,
+    como no caminho com `ta` antes do dropna().
+    """
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    l = np.asarray(low, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+    v = np.asarray(volume, dtype=np.float64)
+    n = len(c)
+    out = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+    col = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    out[:, col['Open']] = o
+    out[:, col['High']] = h
+    out[:, col['Low']] = l
+    out[:, col['Close']] = c
+    out[:, col['Volume']] = v
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # RSI
+        diff = np.diff(c, prepend=np.nan)
+        up = np.where(diff > 0, diff, 0.0)
+        dn = np.where(diff < 0, -diff, 0.0)
+        ema_up = _ewm(up, 1.0 / RSI_WINDOW, RSI_WINDOW)
+        ema_dn = _ewm(dn, 1.0 / RSI_WINDOW, RSI_WINDOW)
+        out[:, col['RSI']] = np.where(ema_dn == 0, 100, 100 - (100 / (1 + ema_up / ema_dn)))
+        del diff, up, dn, ema_up, ema_dn
+
+        # Estocástico
+        smin = _rolling(l, STOCH_WINDOW, lambda w: w.min(axis=1))
+        smax = _rolling(h, STOCH_WINDOW, lambda w: w.max(axis=1))
+        stoch_k = 100 * (c - smin) / (smax - smin)
+        out[:, col['Stoch_K']] = stoch_k
+        out[:, col['Stoch_D']] = _rolling(stoch_k, STOCH_SMOOTH, _mean)
+        del smin, smax, stoch_k
+
+        # Awesome Oscillator
+        median = 0.5 * (h + l)
+        out[:, col['Awesome_Oscillator']] = _rolling(median, AO_FAST, _mean) - _rolling(median, AO_SLOW, _mean)
+        del median
+
+        # MACD
+        macd = _ewm(c, 2.0 / (MACD_FAST + 1), MACD_FAST) - _ewm(c, 2.0 / (MACD_SLOW + 1), MACD_SLOW)
+        signal = np.full(n, np.nan)
+        if n >= MACD_SLOW:
+            signal[MACD_SLOW - 1:] = _ewm(macd[MACD_SLOW - 1:], 2.0 / (MACD_SIGN + 1), MACD_SIGN)
+        out[:, col['MACD']] = macd
+        out[:, col['MACD_signal']] = signal
+        out[:, col['MACD_diff']] = macd - signal
+        del macd, signal
+
+        # CCI
+        tp = (h + l + c) / 3.0
+        out[:, col['CCI']] = (tp - _rolling(tp, CCI_WINDOW, _mean)) / (CCI_CONSTANT * _rolling(tp, CCI_WINDOW, _mad))
+
+        # ADX
+        adx, adx_pos, adx_neg = _adx(h, l, c)
+        out[:, col['ADX']] = adx
+        out[:, col['ADX_pos']] = adx_pos
+        out[:, col['ADX_neg']] = adx_neg
+        del adx, adx_pos, adx_neg
+
+        # Bandas de Bollinger
+        mavg = _rolling(c, BB_WINDOW, _mean)
+        mstd = _rolling(c, BB_WINDOW, _std)
+        out[:, col['BB_upper']] = mavg + BB_DEV * mstd
+        out[:, col['BB_middle']] = mavg
+        out[:, col['BB_lower']] = mavg - BB_DEV * mstd
+        del mavg, mstd
+
+        out[:, col['EMA_20']] = _ewm(c, 2.0 / (EMA_WINDOW + 1), EMA_WINDOW)
+        out[:, col['ATR']] = _atr(h, l, c)
+
+        # VWAP
+        out[:, col['VWAP']] = _rolling(tp * v, VWAP_WINDOW, lambda w: w.sum(axis=1)) / _rolling(v, VWAP_WINDOW, lambda w: w.sum(axis=1))
+
+        # OBV e Acumulação/Distribuição
+        signed = np.where(c < np.concatenate(([np.nan], c[:-1])), -v, v)
+        out[:, col['OBV']] = np.cumsum(signed)
+        del tp, signed
+        clv = ((c - l) - (h - c)) / (h - l)
+        clv[np.isnan(clv)] = 0.0
+        out[:, col['AccDistIndex']] = np.cumsum(clv * v)
+
+    # Candles
+    out[:, col['Candle_Body']] = c - o
+    out[:, col['Candle_Range']] = h - l
+    out[:, col['Upper_Shadow']] = h - np.maximum(c, o)
+    out[:, col['Lower_Shadow']] = np.minimum(c, o) - l
+    return out
+
+
+def complete_rows(matrix: np.ndarray) -> np.ndarray:
+    """Remove as linhas com NaN (equivalente ao dropna() do pipeline)."""
+    return matrix[~np.isnan(matrix).any(axis=1)]
@@ -1,17 +1,25 @@
 import json
+import re
 import requests
 import pandas as pd
 from datetime import datetime
 from typing import Optional, Dict, Tuple
 from app.config.logger import setup_logger
+from app.config.settings import INDICATOR_STATE_ENABLED, STORAGE_FORMAT
+from app.services.evolution_store import append_evolution, evolution_exists, read_evolution, write_evolution
+from app.services.indicator_state import HistoryLike, update_indicator_state
+from app.services.metadata_store import save_metadata_snapshot
+from app.services.prediction_cache import prediction_cache
 from app.services.stock_data import get_stock_data
+from app.services.symbol_locks import single_flight, symbol_lock
 
 
 from app.services.s3_utils import (
+    read_csv_versioned,
     read_json_from_s3,
+    read_json_versioned,
+    retry_on_conflict,
     write_json_to_s3,
-    read_csv_from_s3,
-    write_csv_to_s3,
 )
 
 logger = setup_logger("fetcher")
@@ -19,14 +27,10 @@ logger = setup_logger("fetcher")
 # Exemplo de bucket e prefixo (pode vir de config/variável ambiente)
 BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
 
+_CHECKPOINT_KEY = re.compile(r"checkpoint/(.+)_checkpoint\.json$")
 
-def read_checkpoint_s3(bucket: str, key: str) -> Optional[Dict[str, datetime]]:
 
-    """
-    Lê checkpoint JSON do S3.
-    Retorna dicionário com timestamps ou None.
-    """
-    payload = read_json_from_s3(bucket, key)
+def _parse_checkpoint(payload: Optional[dict], key: str) -> Optional[Dict[str, datetime]]:
     if not payload:
         return None
     try:
@@ -42,113 +46,191 @@ def read_checkpoint_s3(bucket: str, key: str) -> Optional[Dict[str, datetime]]:
         logger.warning(f"Erro ao ler checkpoint JSON do S3 em {key}: {e}")
         return None
 
-def write_checkpoint_s3(bucket: str, key: str, new_first: datetime, new_last: datetime) -> None:
+def read_checkpoint_s3(bucket: str, key: str) -> Optional[Dict[str, datetime]]:
+
     """
-    Grava checkpoint JSON no S3.
+    Lê checkpoint JSON do S3.
+    Retorna dicionário com timestamps ou None.
     """
-    logger.info(f'Gravando checkpoint no S3 com last_timestamp = {new_last} e start_timestamp = {new_first}')
-    payload = {
-        "start_timestamp": new_first.strftime("%Y-%m-%d %H:%M:%S"),
-        "last_timestamp": new_last.strftime("%Y-%m-%d %H:%M:%S"),
-    }
-    write_json_to_s3(bucket, key, payload)
+    return _parse_checkpoint(read_json_from_s3(bucket, key), key)
 
-def fetch_and_save_s3(symbol: str,
-                      start_date: Optional[str] = None,
-                      end_date: Optional[str] = None,
-                      interval: str = "1m",
-                      period: Optional[str] = "1d",
-                      auto_adjust: bool = True) -> Tuple[str, int]:
-    try:
-        logger.info(f"[fetch_and_save_s3] Símbolo={symbol}, de {start_date} até {end_date}, intervalo:({interval}), período:({period}), auto_adjust:({auto_adjust})")
+def write_checkpoint_s3(bucket: str, key: str, new_first: datetime, new_last: datetime) -> None:
+    """
+    Grava checkpoint JSON no S3, ampliando o intervalo já gravado (menor first, maior last),
+    de modo que o checkpoint nunca recua. A escrita é condicionada ao ETag lido: se outro
+    processo gravou no meio, o checkpoint é relido e mesclado de novo.
+    """
+    def merge() -> None:
+        payload, etag = read_json_versioned(bucket, key)
+        current = _parse_checkpoint(payload, key)
+        first, last = new_first, new_last
+        if current:
+            first = min(first, current["start_timestamp"])
+            last = max(last, current["last_timestamp"])
+            if first == current["start_timestamp"] and last == current["last_timestamp"]:
+                logger.info(f"Checkpoint {key} já cobre first={new_first}, last={new_last}.")
+                return
+        logger.info(f'Gravando checkpoint no S3 com last_timestamp = {last} e start_timestamp = {first}')
+        payload = {
+            "start_timestamp": first.strftime("%Y-%m-%d %H:%M:%S"),
+            "last_timestamp": last.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        write_json_to_s3(bucket, key, payload, if_match=etag, if_none_match=etag is None)
 
-        timestamp_exec = datetime.now().isoformat()
+    retry_on_conflict(f"checkpoint {key}", merge)
 
-        evo_key = f"fetch/{symbol}_evolution.csv"
-        meta_key = f"fetch/{symbol}_metadata.csv"
-        checkpoint_key = f"checkpoint/{symbol}_checkpoint.json"
-
-        data = get_stock_data(
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date,
-            interval=interval,
-            period=period,
-            auto_adjust=auto_adjust,
-        )
+    # Predições em cache para o checkpoint anterior deixam de valer
+    match = _CHECKPOINT_KEY.search(key)
+    if match:
+        prediction_cache.invalidate(match.group(1))
 
-        evo = pd.DataFrame(data["data_evolution"])
-        evo["datetime"] = pd.to_datetime(evo["datetime"], format="%Y-%m-%d %H:%M:%S")
+def refresh_indicator_state(symbol: str, novos: pd.DataFrame, historico: HistoryLike, saved_last: Optional[datetime]) -> None:
+    """
+    Atualiza o estado incremental dos indicadores com as linhas recém-gravadas.
+    Falhas não interrompem a ingestão: o estado é reconstruído na próxima predição.
+    """
+    if not INDICATOR_STATE_ENABLED:
+        return
+    try:
+        last_saved = saved_last.strftime("%Y-%m-%d %H:%M:%S") if saved_last is not None else None
+        update_indicator_state(symbol, novos, historico, last_saved)
+    except Exception as e:
+        logger.warning(f"[Indicadores] Falha ao atualizar estado de {symbol}: {e}")
 
-        menor_ts_lote = evo["datetime"].min()
-        maior_ts_lote = evo["datetime"].max()
+def _save_evolution(symbol: str, evo: pd.DataFrame) -> bool:
+    """
+    Uma tentativa de gravar o lote: histórico, checkpoint e estado dos indicadores.
+    No CSV a escrita é condicionada ao ETag lido; se outro processo gravou no meio, levanta
+    PreconditionFailed e a tentativa é refeita sobre a nova versão (retry_on_conflict).
+    Retorna True se o histórico do símbolo foi criado agora.
+    """
+    evo_key = f"fetch/{symbol}_evolution.csv"
+    checkpoint_key = f"checkpoint/{symbol}_checkpoint.json"
 
-        try:
-            evo_existente = read_csv_from_s3(BUCKET_NAME, evo_key)
-            arquivo_existe = True
-        except Exception as e:
-            logger.warning(f"[S3 Read] Arquivo {evo_key} não encontrado ou erro ao ler: {str(e)}")
-            arquivo_existe = False
+    menor_ts_lote = evo["datetime"].min()
+    maior_ts_lote = evo["datetime"].max()
 
+    chk = None
+    etag = None
+    if STORAGE_FORMAT == "parquet":
+        # Layout particionado: o histórico não é lido, apenas novas partições são gravadas
+        evo_existente = None
+        chk = read_checkpoint_s3(BUCKET_NAME, checkpoint_key)
+        arquivo_existe = chk is not None or evolution_exists(symbol)
+    else:
+        evo_existente, etag = read_csv_versioned(BUCKET_NAME, evo_key)
+        arquivo_existe = evo_existente is not None
         if not arquivo_existe:
-            write_csv_to_s3(BUCKET_NAME, evo_key, evo)
-            write_checkpoint_s3(BUCKET_NAME, checkpoint_key, menor_ts_lote, maior_ts_lote)
-
-            logger.info(f"• Criando {symbol}_evolution.csv com {len(evo)} linhas.")
-            logger.info(f"  -> Checkpoint inicial: first={menor_ts_lote}, last={maior_ts_lote}")
-
-            logger.info(f"• Criando {symbol}_metadata.csv com metadados iniciais.")
-            info = {k: data[k] for k in data if k != "data_evolution"}
-            info_df = pd.DataFrame([{**{"timestamp": timestamp_exec}, **info}])
-            write_csv_to_s3(BUCKET_NAME, meta_key, info_df)
-
-            return f"Dados iniciais do símbolo '{symbol}' gravados com sucesso.", 200
-
+            logger.warning(f"[S3 Read] Arquivo {evo_key} não encontrado.")
+
+    if not arquivo_existe:
+        write_evolution(symbol, evo)
+        write_checkpoint_s3(BUCKET_NAME, checkpoint_key, menor_ts_lote, maior_ts_lote)
+        refresh_indicator_state(symbol, evo, evo, None)
+
+        logger.info(f"• Criando {symbol}_evolution.csv com {len(evo)} linhas.")
+        logger.info(f"  -> Checkpoint inicial: first={menor_ts_lote}, last={maior_ts_lote}")
+        return True
+
+    if evo_existente is not None:
+        # No CSV a versão lida (ETag) é a referência: o checkpoint pode ainda não refletir
+        # uma escrita concorrente já confirmada no arquivo
+        datas = pd.to_datetime(evo_existente["datetime"])
+        saved_first, saved_last = datas.min(), datas.max()
+    else:
         # Checkpoint existente
-        chk = read_checkpoint_s3(BUCKET_NAME, checkpoint_key)
+        if chk is None:
+            chk = read_checkpoint_s3(BUCKET_NAME, checkpoint_key)
         if chk:
             saved_first = chk["start_timestamp"]
             saved_last = chk["last_timestamp"]
         else:
-            saved_first = pd.to_datetime(evo_existente["datetime"]).min()
-            saved_last = pd.to_datetime(evo_existente["datetime"]).max()
+            historico = read_evolution(symbol, columns=["datetime"])
+            saved_first = pd.to_datetime(historico["datetime"]).min()
+            saved_last = pd.to_datetime(historico["datetime"]).max()
 
-        novos = evo[evo["datetime"] > saved_last].copy()
+    novos = evo[evo["datetime"] > saved_last].copy()
 
-        if not novos.empty:
-            novos = novos.sort_values("datetime")
-            df_atualizado = pd.concat([evo_existente, novos], ignore_index=True)
-            write_csv_to_s3(BUCKET_NAME, evo_key, df_atualizado)
+    if not novos.empty:
+        novos = novos.sort_values("datetime")
+        append_evolution(symbol, novos, evo_existente, etag=etag)
 
-            novo_maior_ts = novos["datetime"].max()
-            novo_menor_ts = novos["datetime"].min()
+        novo_maior_ts = novos["datetime"].max()
+        novo_menor_ts = novos["datetime"].min()
 
-            updated_first = min(saved_first, novo_menor_ts)
-            updated_last = max(saved_last, novo_maior_ts)
+        updated_first = min(saved_first, novo_menor_ts)
+        updated_last = max(saved_last, novo_maior_ts)
 
-            write_checkpoint_s3(BUCKET_NAME, checkpoint_key, updated_first, updated_last)
+        write_checkpoint_s3(BUCKET_NAME, checkpoint_key, updated_first, updated_last)
+        if evo_existente is not None:
+            historico = pd.concat([evo_existente, novos], ignore_index=True)
+        else:
+            # Só é lido se o estado dos indicadores precisar ser reconstruído
+            historico = lambda: read_evolution(symbol)
+        refresh_indicator_state(symbol, novos, historico, saved_last)
+
+        logger.info(
+            f"• Adicionadas {len(novos)} linhas em '{symbol}_evolution.csv'.\n"
+            f"  -> First salvo: {saved_first}  |  Last salvo: {saved_last}\n"
+            f"  -> Menor do lote novo: {novo_menor_ts}  |  Maior do lote novo: {novo_maior_ts}\n"
+            f"  -> Checkpoint atualizado: first={updated_first}, last={updated_last}"
+        )
+    else:
+        logger.info("• Nenhuma linha nova para adicionar (já processado).")
+    return False
 
-            logger.info(
-                f"• Adicionadas {len(novos)} linhas em '{symbol}_evolution.csv'.\n"
-                f"  -> First salvo: {saved_first}  |  Last salvo: {saved_last}\n"
-                f"  -> Menor do lote novo: {novo_menor_ts}  |  Maior do lote novo: {novo_maior_ts}\n"
-                f"  -> Checkpoint atualizado: first={updated_first}, last={updated_last}"
+def fetch_and_save_s3(symbol: str,
+                      start_date: Optional[str] = None,
+                      end_date: Optional[str] = None,
+                      interval: str = "1m",
+                      period: Optional[str] = "1d",
+                      auto_adjust: bool = True) -> Tuple[str, int]:
+    """
+    Busca o símbolo no Yahoo e grava o lote no S3. Chamadas simultâneas com os mesmos
+    argumentos neste processo compartilham uma única busca e gravação (single-flight).
+    """
+    key = ("fetch_and_save_s3", symbol, start_date, end_date, interval, period, auto_adjust)
+    return single_flight(key, lambda: _fetch_and_save(symbol, start_date, end_date, interval, period, auto_adjust))
+
+def _fetch_and_save(symbol: str,
+                    start_date: Optional[str],
+                    end_date: Optional[str],
+                    interval: str,
+                    period: Optional[str],
+                    auto_adjust: bool) -> Tuple[str, int]:
+    try:
+        logger.info(f"[fetch_and_save_s3] Símbolo={symbol}, de {start_date} até {end_date}, intervalo:({interval}), período:({period}), auto_adjust:({auto_adjust})")
+
+        timestamp_exec = datetime.now().isoformat()
+
+        # Uma atualização por símbolo por vez neste processo (ex.: argumentos diferentes ou
+        # backfill); entre processos, a proteção são as escritas condicionais no S3
+        with symbol_lock(symbol):
+            data = get_stock_data(
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date,
+                interval=interval,
+                period=period,
+                auto_adjust=auto_adjust,
+                as_frame=True,
             )
-        else:
-            logger.info("• Nenhuma linha nova para adicionar (já processado).")
 
-        try:
-            meta_existente = read_csv_from_s3(BUCKET_NAME, meta_key)
-            info = {k: data[k] for k in data if k != "data_evolution"}
-            info_df = pd.DataFrame([{**{"timestamp": timestamp_exec}, **info}])
-            meta_atualizado = pd.concat([meta_existente, info_df], ignore_index=True)
-            write_csv_to_s3(BUCKET_NAME, meta_key, meta_atualizado)
-        except Exception as e:
-            logger.warning(f"[S3 Meta Write] Criando novo metadata para {symbol}: {str(e)}")
+            evo = data["data_evolution"]
+            if not isinstance(evo, pd.DataFrame):
+                evo = pd.DataFrame(evo)
+                evo["datetime"] = pd.to_datetime(evo["datetime"], format="%Y-%m-%d %H:%M:%S")
+
+            criado = retry_on_conflict(f"ingestão de {symbol}", lambda: _save_evolution(symbol, evo))
+
+            # Snapshot só é gravado se os metadados mudaram desde o último
+            if criado:
+                logger.info(f"• Gravando metadados iniciais de {symbol}.")
             info = {k: data[k] for k in data if k != "data_evolution"}
-            info_df = pd.DataFrame([{**{"timestamp": timestamp_exec}, **info}])
-            write_csv_to_s3(BUCKET_NAME, meta_key, info_df)
+            save_metadata_snapshot(symbol, info, timestamp_exec)
 
+        if criado:
+            return f"Dados iniciais do símbolo '{symbol}' gravados com sucesso.", 200
         return f"Dados de '{symbol}' atualizados com sucesso.", 200
 
     except Exception as e:
@@ -0,0 +1,61 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import SEQ_LENGTH
+from app.services.indicator_state import IndicatorEngine
+from app.services.metrics import observe_batch_size, stage
+from app.services.sequences import last_window
+
+logger = setup_logger("forecast")
+
+# Passo usado quando o histórico não permite deduzir o intervalo das barras
+DEFAULT_STEP = pd.Timedelta(minutes=1)
+
+
+def _last_window(engine: IndicatorEngine) -> np.ndarray:
+    """Mesma janela de prepare_sequence: as últimas SEQ_LENGTH linhas do motor, até a barra mais recente."""
+    tail = np.asarray(list(engine.tail)[-SEQ_LENGTH:], dtype=np.float64)
+    return last_window(tail, SEQ_LENGTH)[0]
+
+
+def _future_timestamps(engine: IndicatorEngine, horizon: int) -> List[str]:
+    """Timestamps das barras sintéticas: o último real mais o intervalo mediano das barras recentes."""
+    index = pd.to_datetime(list(engine.tail_index)[-SEQ_LENGTH:])
+    step = pd.Series(index).diff().median() if len(index) > 1 else pd.NaT
+    if pd.isna(step) or step <= pd.Timedelta(0):
+        step = DEFAULT_STEP
+    last = pd.Timestamp(engine.last_timestamp)
+    return [(last + step * (i + 1)).strftime("%Y-%m-%d %H:%M:%S") for i in range(horizon)]
+
+
+def rollout(model, engines: List[IndicatorEngine], horizon: int) -> List[List[dict]]:
+    """
+    Forecast autorregressivo de `horizon` passos para vários símbolos de uma vez.
+
+    A cada passo, as janelas de todos os símbolos vão numa única chamada model.predict; cada
+    valor previsto vira uma barra sintética (candle plano no valor previsto, volume médio
+    das barras recentes) processada em O(1) por uma cópia do motor de indicadores, que
+    atualiza apenas a nova linha de features; a janela do passo seguinte já termina nessa
+    barra. O estado original dos motores não é alterado. O passo 1 é igual à predição de
+    próximo valor do endpoint.
+    """
+    engines = [engine.copy() for engine in engines]
+    stamps = [_future_timestamps(engine, horizon) for engine in engines]
+    volumes = [float(np.mean([row[4] for row in list(engine.tail)[-SEQ_LENGTH:]])) for engine in engines]
+    paths: List[List[dict]] = [[] for _ in engines]
+
+    for step in range(horizon):
+        X = np.stack([_last_window(engine) for engine in engines]).astype(np.float32)
+        observe_batch_size(len(X), "forecast")
+        with stage("model_predict"):
+            predictions = model.predict(X, batch_size=len(X), verbose=0)[:, 0].tolist()
+        for i, value in enumerate(predictions):
+            paths[i].append({"datetime": stamps[i][step], "prediction": value})
+            if step + 1 < horizon:
+                engines[i].append_bar(stamps[i][step], value, value, value, value, volumes[i])
+
+    logger.info(f"Forecast de {horizon} passo(s) para {len(engines)} símbolo(s) em {horizon} inferência(s).")
+    return paths
@@ -0,0 +1,400 @@
+import copy
+import math
+from collections import deque
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import FEATURE_COLUMNS, INDICATOR_TAIL_ROWS
+from app.services.s3_utils import read_json_from_s3, read_json_versioned, retry_on_conflict, write_json_to_s3
+
+logger = setup_logger("indicator_state")
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+STATE_VERSION = 1
+
+_NAN = float("nan")
+
+# Histórico completo ou função que o carrega (lido apenas quando é preciso reconstruir)
+HistoryLike = Union[pd.DataFrame, Callable[[], pd.DataFrame]]
+
+# Janelas usadas em add_technical_indicators (mesmos parâmetros da biblioteca `ta`)
+RSI_WINDOW = 14
+STOCH_WINDOW, STOCH_SMOOTH = 14, 3
+AO_FAST, AO_SLOW = 5, 34
+MACD_FAST, MACD_SLOW, MACD_SIGN = 12, 26, 9
+CCI_WINDOW, CCI_CONSTANT = 20, 0.015
+ADX_WINDOW = 14
+EMA_WINDOW = 20
+BB_WINDOW, BB_DEV = 20, 2
+ATR_WINDOW = 14
+VWAP_WINDOW = 14
+
+
+def state_key(symbol: str) -> str:
+    return f"state/{symbol}_indicators.json"
+
+
+def _div(a: float, b: float) -> float:
+    """Divisão com semântica IEEE (nan/inf), como no pandas/numpy."""
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a != a or a == 0:
+            return _NAN
+        return math.copysign(math.inf, a)
+
+
+def _span_alpha(span: int) -> float:
+    # Mesma derivação usada pelo pandas: span -> com -> alpha
+    return 1.0 / (1.0 + (span - 1) / 2.0)
+
+
+def _wilder_alpha(window: int) -> float:
+    return 1.0 / (1.0 + (1.0 / (1.0 / window) - 1.0))
+
+
+def _ewm(prev: float, nobs: int, x: float, alpha: float):
+    """Um passo de `Series.ewm(alpha=..., adjust=False).mean()`; retorna (valor, observações)."""
+    if x != x:
+        return prev, nobs
+    if nobs == 0:
+        return x, 1
+    old_wt = 1.0 - alpha
+    if prev != x:
+        prev = (old_wt * prev + alpha * x) / (old_wt + alpha)
+    return prev, nobs + 1
+
+
+def _mean(values) -> float:
+    return sum(values) / len(values)
+
+
+class IndicatorEngine:
+    """
+    Motor incremental dos indicadores de add_technical_indicators.
+    Mantém os acumuladores (médias exponenciais, janelas móveis, somas de Wilder do
+    ADX/ATR, OBV e AccDist acumulados) e processa cada nova barra em O(1), produzindo
+    a mesma linha de features (ordem de FEATURE_COLUMNS) que o caminho com `ta`.
+    Apenas as últimas `tail_rows` linhas completas (sem NaN) são mantidas.
+    """
+
+    _SCALARS = (
+        "count", "last_timestamp", "prev_close", "prev_high", "prev_low",
+        "rsi_up", "rsi_dn", "rsi_nobs",
+        "macd_fast", "macd_fast_nobs", "macd_slow", "macd_slow_nobs", "macd_sig", "macd_sig_nobs",
+        "ema", "ema_nobs",
+        "adx_trs", "adx_dip", "adx_din", "adx_trs_sum", "adx_dip_sum", "adx_din_sum", "adx",
+        "atr", "atr_sum", "obv", "adi",
+    )
+    _WINDOWS = {
+        "stoch_high": STOCH_WINDOW, "stoch_low": STOCH_WINDOW, "stoch_k": STOCH_SMOOTH,
+        "ao_median": AO_SLOW, "cci_tp": CCI_WINDOW, "bb_close": BB_WINDOW,
+        "vwap_pv": VWAP_WINDOW, "vwap_vol": VWAP_WINDOW, "adx_di": ADX_WINDOW,
+    }
+
+    def __init__(self, tail_rows: int = INDICATOR_TAIL_ROWS):
+        self.tail_rows = tail_rows
+        self.count = 0
+        self.last_timestamp: Optional[str] = None
+        self.prev_close = self.prev_high = self.prev_low = _NAN
+        self.rsi_up = self.rsi_dn = _NAN
+        self.rsi_nobs = 0
+        self.macd_fast = self.macd_slow = self.macd_sig = _NAN
+        self.macd_fast_nobs = self.macd_slow_nobs = self.macd_sig_nobs = 0
+        self.ema = _NAN
+        self.ema_nobs = 0
+        self.adx_trs = self.adx_dip = self.adx_din = _NAN
+        self.adx_trs_sum = self.adx_dip_sum = self.adx_din_sum = 0.0
+        self.adx = 0.0
+        self.atr = 0.0
+        self.atr_sum = 0.0
+        self.obv = 0.0
+        self.adi = 0.0
+        for name, size in self._WINDOWS.items():
+            setattr(self, name, deque(maxlen=size))
+        self.tail_index: deque = deque(maxlen=tail_rows)
+        self.tail: deque = deque(maxlen=tail_rows)
+
+    # --- Processamento das barras ---
+    def _step(self, o: float, h: float, l: float, c: float, v: float) -> List[float]:
+        t = self.count
+        pc, ph, pl = self.prev_close, self.prev_high, self.prev_low
+
+        # RSI (Wilder, ewm alpha=1/14)
+        diff = c - pc if t else _NAN
+        up = diff if diff > 0 else 0.0
+        dn = -diff if diff < 0 else 0.0
+        alpha = _wilder_alpha(RSI_WINDOW)
+        self.rsi_up, nobs = _ewm(self.rsi_up, self.rsi_nobs, up, alpha)
+        self.rsi_dn, self.rsi_nobs = _ewm(self.rsi_dn, self.rsi_nobs, dn, alpha)
+        if self.rsi_nobs < RSI_WINDOW:
+            rsi = _NAN
+        elif self.rsi_dn == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + _div(self.rsi_up, self.rsi_dn)))
+
+        # Estocástico
+        self.stoch_high.append(h)
+        self.stoch_low.append(l)
+        if len(self.stoch_high) == STOCH_WINDOW:
+            smin, smax = min(self.stoch_low), max(self.stoch_high)
+            stoch_k = _div(100 * (c - smin), smax - smin)
+        else:
+            stoch_k = _NAN
+        self.stoch_k.append(stoch_k)
+        ks = list(self.stoch_k)
+        stoch_d = _mean(ks) if len(ks) == STOCH_SMOOTH and all(k == k for k in ks) else _NAN
+
+        # Awesome Oscillator
+        self.ao_median.append(0.5 * (h + l))
+        if len(self.ao_median) == AO_SLOW:
+            medians = list(self.ao_median)
+            ao = _mean(medians[-AO_FAST:]) - _mean(medians)
+        else:
+            ao = _NAN
+
+        # MACD
+        self.macd_fast, self.macd_fast_nobs = _ewm(self.macd_fast, self.macd_fast_nobs, c, _span_alpha(MACD_FAST))
+        self.macd_slow, self.macd_slow_nobs = _ewm(self.macd_slow, self.macd_slow_nobs, c, _span_alpha(MACD_SLOW))
+        fast = self.macd_fast if self.macd_fast_nobs >= MACD_FAST else _NAN
+        slow = self.macd_slow if self.macd_slow_nobs >= MACD_SLOW else _NAN
+        macd = fast - slow
+        self.macd_sig, self.macd_sig_nobs = _ewm(self.macd_sig, self.macd_sig_nobs, macd, _span_alpha(MACD_SIGN))
+        macd_signal = self.macd_sig if self.macd_sig_nobs >= MACD_SIGN else _NAN
+        macd_diff = macd - macd_signal
+
+        # CCI
+        tp = (h + l + c) / 3.0
+        self.cci_tp.append(tp)
+        if len(self.cci_tp) == CCI_WINDOW:
+            tps = list(self.cci_tp)
+            tp_mean = _mean(tps)
+            mad = _mean([abs(x - tp_mean) for x in tps])
+            cci = _div(tp - tp_mean, CCI_CONSTANT * mad)
+        else:
+            cci = _NAN
+
+        # ADX (replica as somas de Wilder e o preenchimento com zeros do `ta`)
+        w = ADX_WINDOW
+        if t:
+            ddm = max(h, pc) - min(l, pc)
+            du, dd = h - ph, pl - l
+            pos = du if (du > dd and du > 0) else 0.0
+            neg = dd if (dd > du and dd > 0) else 0.0
+            if t < w:
+                self.adx_trs_sum += ddm
+                self.adx_dip_sum += pos
+                self.adx_din_sum += neg
+            elif t == w:
+                self.adx_trs = self.adx_trs_sum + ddm
+                self.adx_dip = self.adx_dip_sum + pos
+                self.adx_din = self.adx_din_sum + neg
+            else:
+                self.adx_trs = self.adx_trs - (self.adx_trs / float(w)) + ddm
+                self.adx_dip = self.adx_dip - (self.adx_dip / float(w)) + pos
+                self.adx_din = self.adx_din - (self.adx_din / float(w)) + neg
+        adx_pos = adx_neg = 0.0
+        adx = 0.0
+        if t >= w:
+            dip = 100 * _div(self.adx_dip, self.adx_trs)
+            din = 100 * _div(self.adx_din, self.adx_trs)
+            if t > w:
+                adx_pos, adx_neg = dip, din
+            di = 100 * abs(_div(dip - din, dip + din))
+            if t < 2 * w - 1:
+                self.adx_di.append(di)
+            elif t == 2 * w - 1:
+                self.adx_di.append(di)
+                self.adx = _mean(self.adx_di)
+                adx = self.adx
+            else:
+                self.adx = ((self.adx * (w - 1)) + di) / float(w)
+                adx = self.adx
+
+        # EMA 20
+        self.ema, self.ema_nobs = _ewm(self.ema, self.ema_nobs, c, _span_alpha(EMA_WINDOW))
+        ema = self.ema if self.ema_nobs >= EMA_WINDOW else _NAN
+
+        # Bandas de Bollinger (desvio populacional, ddof=0)
+        self.bb_close.append(c)
+        if len(self.bb_close) == BB_WINDOW:
+            closes = list(self.bb_close)
+            mavg = _mean(closes)
+            mstd = math.sqrt(_mean([(x - mavg) ** 2 for x in closes]))
+            bb_upper, bb_middle, bb_lower = mavg + BB_DEV * mstd, mavg, mavg - BB_DEV * mstd
+        else:
+            bb_upper = bb_middle = bb_lower = _NAN
+
+        # ATR (zeros até completar a primeira janela, como no `ta`)
+        tr = h - l if not t else max(h - l, abs(h - pc), abs(l - pc))
+        if t < ATR_WINDOW - 1:
+            self.atr_sum += tr
+            atr = 0.0
+        elif t == ATR_WINDOW - 1:
+            self.atr = (self.atr_sum + tr) / ATR_WINDOW
+            atr = self.atr
+        else:
+            self.atr = (self.atr * (ATR_WINDOW - 1) + tr) / float(ATR_WINDOW)
+            atr = self.atr
+
+        # OBV e Acumulação/Distribuição (acumulados)
+        self.obv += -v if (t and c < pc) else v
+        clv = _div((c - l) - (h - c), h - l)
+        self.adi += (0.0 if clv != clv else clv) * v
+
+        # VWAP
+        self.vwap_pv.append(tp * v)
+        self.vwap_vol.append(v)
+        if len(self.vwap_pv) == VWAP_WINDOW:
+            vwap = _div(sum(self.vwap_pv), sum(self.vwap_vol))
+        else:
+            vwap = _NAN
+
+        self.prev_close, self.prev_high, self.prev_low = c, h, l
+        self.count = t + 1
+
+        return [
+            o, h, l, c, v,
+            rsi, stoch_k, stoch_d, ao,
+            macd, macd_signal, macd_diff,
+            cci, adx, adx_pos, adx_neg,
+            bb_upper, bb_middle, bb_lower,
+            ema, atr, vwap, self.obv, self.adi,
+            c - o, h - l, h - max(c, o), min(c, o) - l,
+        ]
+
+    def update(self, bars: pd.DataFrame) -> int:
+        """
+        Processa as barras mais novas que `last_timestamp` (em ordem cronológica).
+        Aceita colunas em minúsculas (CSV do S3) ou capitalizadas. Retorna quantas barras foram processadas.
+        """
+        cols = {c.lower(): c for c in bars.columns}
+        timestamps = pd.to_datetime(bars[cols["datetime"]], errors="coerce")
+        frame = pd.DataFrame({
+            "datetime": timestamps,
+            "open": bars[cols["open"]].to_numpy(dtype=float),
+            "high": bars[cols["high"]].to_numpy(dtype=float),
+            "low": bars[cols["low"]].to_numpy(dtype=float),
+            "close": bars[cols["close"]].to_numpy(dtype=float),
+            "volume": bars[cols["volume"]].to_numpy(dtype=float),
+        }).dropna(subset=["datetime"]).sort_values("datetime", kind="stable")
+        if self.last_timestamp is not None:
+            frame = frame[frame["datetime"] > pd.Timestamp(self.last_timestamp)]
+        if frame.empty:
+            return 0
+
+        stamps = frame["datetime"].dt.strftime("%Y-%m-%d %H:%M:%S").tolist()
+        values = frame[["open", "high", "low", "close", "volume"]].to_numpy()
+        for ts, (o, h, l, c, v) in zip(stamps, values.tolist()):
+            self.append_bar(ts, o, h, l, c, v)
+        return len(stamps)
+
+    def append_bar(self, timestamp: str, o: float, h: float, l: float, c: float, v: float) -> List[float]:
+        """Processa uma única barra (já posterior a `last_timestamp`) e devolve sua linha de features."""
+        row = self._step(o, h, l, c, v)
+        # Equivalente ao dropna() do pipeline: só linhas completas entram nas sequências
+        if all(x == x for x in row):
+            self.tail_index.append(timestamp)
+            self.tail.append(row)
+        self.last_timestamp = timestamp
+        return row
+
+    def copy(self) -> "IndicatorEngine":
+        """Cópia independente do estado (ex.: para simular barras sem alterar o original)."""
+        return copy.deepcopy(self)
+
+    def feature_matrix(self) -> np.ndarray:
+        """Últimas linhas completas de features, shape (n, len(FEATURE_COLUMNS))."""
+        return np.asarray(self.tail, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+
+    def feature_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.feature_matrix(), columns=FEATURE_COLUMNS, index=pd.to_datetime(list(self.tail_index)))
+
+    # --- Serialização ---
+    def to_dict(self) -> dict:
+        payload = {"version": STATE_VERSION, "tail_rows": self.tail_rows}
+        payload.update({name: getattr(self, name) for name in self._SCALARS})
+        payload.update({name: list(getattr(self, name)) for name in self._WINDOWS})
+        payload["tail_index"] = list(self.tail_index)
+        payload["tail"] = [list(row) for row in self.tail]
+        return payload
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "IndicatorEngine":
+        if payload.get("version") != STATE_VERSION:
+            raise ValueError(f"Versão de estado incompatível: {payload.get('version')}")
+        engine = cls(tail_rows=max(int(payload.get("tail_rows", INDICATOR_TAIL_ROWS)), INDICATOR_TAIL_ROWS))
+        for name in cls._SCALARS:
+            setattr(engine, name, payload[name])
+        for name, size in cls._WINDOWS.items():
+            setattr(engine, name, deque(payload[name], maxlen=size))
+        engine.tail_index.extend(payload["tail_index"])
+        engine.tail.extend(payload["tail"])
+        return engine
+
+    @classmethod
+    def from_history(cls, history: pd.DataFrame) -> "IndicatorEngine":
+        engine = cls()
+        engine.update(history)
+        return engine
+
+
+def load_indicator_state(symbol: str, bucket: str = BUCKET_NAME) -> Optional[IndicatorEngine]:
+    """Lê o estado persistido do símbolo; None se ausente ou incompatível."""
+    try:
+        payload = read_json_from_s3(bucket, state_key(symbol))
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o estado de indicadores de {symbol}: {e}")
+        return None
+    if not payload:
+        return None
+    try:
+        return IndicatorEngine.from_dict(payload)
+    except Exception as e:
+        logger.warning(f"Estado de indicadores de {symbol} descartado: {e}")
+        return None
+
+
+def save_indicator_state(symbol: str, engine: IndicatorEngine, bucket: str = BUCKET_NAME) -> bool:
+    """
+    Grava o estado com escrita condicional (ETag), para que um estado mais antigo nunca
+    sobrescreva um mais avançado gravado por outra ingestão ou requisição. O avanço é
+    (last_timestamp, barras processadas): a reconstrução após um backfill anterior ao início
+    mantém o último timestamp e processa mais barras. Retorna True se o estado foi gravado.
+    """
+    key = state_key(symbol)
+    progress = (engine.last_timestamp or "", engine.count)
+
+    def attempt() -> bool:
+        current, etag = read_json_versioned(bucket, key)
+        if current and current.get("version") == STATE_VERSION:
+            stored = (current.get("last_timestamp") or "", int(current.get("count", 0)))
+            if stored > progress:
+                logger.info(f"Estado de indicadores de {symbol} mais recente já gravado ({stored[0]}); mantido.")
+                return False
+        write_json_to_s3(bucket, key, engine.to_dict(), if_match=etag, if_none_match=etag is None)
+        return True
+
+    return retry_on_conflict(f"estado de indicadores de {symbol}", attempt)
+
+
+def update_indicator_state(symbol: str, new_bars: pd.DataFrame, history: HistoryLike, last_saved: Optional[str] = None,
+                           bucket: str = BUCKET_NAME) -> IndicatorEngine:
+    """
+    Atualiza o estado do símbolo com as barras novas, em O(barras novas).
+    Se o estado não existir ou não estiver alinhado com o último timestamp gravado
+    antes deste lote (`last_saved`), reconstrói a partir do histórico completo.
+    """
+    engine = load_indicator_state(symbol, bucket)
+    if engine is not None and last_saved is not None and engine.last_timestamp == last_saved:
+        processed = engine.update(new_bars)
+        logger.info(f"Estado de indicadores de {symbol} atualizado com {processed} barra(s).")
+    else:
+        engine = IndicatorEngine.from_history(history() if callable(history) else history)
+        logger.info(f"Estado de indicadores de {symbol} reconstruído a partir de {engine.count} barra(s).")
+    save_indicator_state(symbol, engine, bucket)
+    return engine
@@ -0,0 +1,141 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple, Type
+
+import numpy as np
+
+from app.config.settings import INFERENCE_BACKEND
+
+
+class InferenceBackend(ABC):
+    """
+    Interface comum dos backends de inferência, no formato já usado do modelo Keras:
+    `input_shape` (com None no lote) e `predict(X, verbose=0)` -> array (n, saídas).
+    """
+
+    name = "base"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    @abstractmethod
+    def input_shape(self) -> Tuple[Optional[int], ...]:
+        ...
+
+    @abstractmethod
+    def predict(self, X: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        ...
+
+
+class KerasBackend(InferenceBackend):
+    """Comportamento original: TensorFlow/Keras completo."""
+
+    name = "keras"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # TensorFlow só é importado quando este backend é usado
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path, compile=False)
+
+    @property
+    def input_shape(self) -> Tuple[Optional[int], ...]:
+        return tuple(self.model.input_shape)
+
+    def predict(self, X: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        return self.model.predict(X, verbose=verbose, batch_size=batch_size)
+
+
+def _tflite_interpreter_class():
+    """Interpretador mais leve disponível: LiteRT, tflite-runtime ou, por fim, o TensorFlow completo."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Artefato .tflite exportado com lote fixo 1 (ver run_convert_model.py), então um lote é
+    processado amostra a amostra; o interpretador não é thread-safe e fica sob um lock.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        super().__init__(path)
+        self._interpreter = _tflite_interpreter_class()(model_path=path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self) -> Tuple[Optional[int], ...]:
+        return (None,) + tuple(int(d) for d in self._input["shape"][1:])
+
+    def predict(self, X: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        X = np.asarray(X, dtype=self._input["dtype"])
+        out = np.empty((len(X),) + tuple(self._output["shape"][1:]), dtype=np.float32)
+        with self._lock:
+            for i in range(len(X)):
+                self._interpreter.set_tensor(self._input["index"], X[i:i + 1])
+                self._interpreter.invoke()
+                out[i] = self._interpreter.get_tensor(self._output["index"])[0]
+        return out
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime (CPU). A sessão é thread-safe e aceita lotes de qualquer tamanho."""
+
+    name = "onnx"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input = self._session.get_inputs()[0]
+
+    @property
+    def input_shape(self) -> Tuple[Optional[int], ...]:
+        return tuple(d if isinstance(d, int) else None for d in self._input.shape)
+
+    def predict(self, X: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self._session.run(None, {self._input.name: X})[0]
+
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+_EXTENSIONS = {".tflite": TFLiteBackend.name, ".onnx": OnnxBackend.name}
+
+
+def backend_name(path: str, backend: str = INFERENCE_BACKEND) -> str:
+    """Backend configurado ou, em "auto", deduzido pela extensão do arquivo."""
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de inferência desconhecido: '{backend}'.")
+        return backend
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), KerasBackend.name)
+
+
+def load_backend(path: str, backend: str = INFERENCE_BACKEND) -> Any:
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return BACKENDS[backend_name(path, backend)](path)
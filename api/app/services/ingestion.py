@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.config.logger import setup_logger
+from app.config.settings import (
+    INGESTION_CONCURRENCY,
+    INGESTION_DELAY_SECONDS,
+    INGESTION_INTERVAL,
+    INGESTION_PERIOD,
+    INGESTION_SYMBOLS,
+)
+from app.services.executors import run_io
+from app.services.fetcher import BUCKET_NAME, fetch_and_save_s3
+from app.services.metrics import stage
+from app.services.s3_utils import read_json_from_s3, write_json_to_s3
+from app.services.symbol_locks import single_flight
+
+logger = setup_logger("ingestion")
+
+# Duração de cada barra por intervalo do Yahoo Finance
+INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800,
+    "60m": 3600, "90m": 5400, "1h": 3600, "1d": 86400,
+    "5d": 5 * 86400, "1wk": 7 * 86400, "1mo": 30 * 86400, "3mo": 90 * 86400,
+}
+
+# Última ingestão bem-sucedida conhecida por este processo (epoch)
+_last_ingested: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def interval_seconds(interval: str) -> int:
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"Intervalo não suportado: {interval}")
+    return INTERVAL_SECONDS[interval]
+
+
+def ingestion_key(symbol: str) -> str:
+    return f"checkpoint/{symbol}_ingestion.json"
+
+
+def parse_symbols(spec: str = INGESTION_SYMBOLS, default_interval: str = INGESTION_INTERVAL) -> List[Tuple[str, str]]:
+    """'TSLA,AAPL:5m' -> [('TSLA', '1m'), ('AAPL', '5m')]."""
+    symbols = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        symbol, _, interval = item.partition(":")
+        interval = interval.strip() or default_interval
+        interval_seconds(interval)
+        symbols.append((symbol.strip().upper(), interval))
+    return symbols
+
+
+def record_ingestion(symbol: str, when: Optional[float] = None) -> None:
+    """
+    Registra a ingestão no processo e no S3. O marcador é gravado a cada rodada, mesmo sem
+    barras novas (mercado fechado), para que outros processos (ex.: Lambda da API com
+    run_fetcher.py agendado à parte) saibam que os dados estão em dia.
+    """
+    when = time.time() if when is None else when
+    with _lock:
+        _last_ingested[symbol] = when
+    stamp = datetime.fromtimestamp(when, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        write_json_to_s3(BUCKET_NAME, ingestion_key(symbol), {"last_run": stamp})
+    except Exception as e:
+        logger.warning(f"[Ingestão] Falha ao gravar marcador de {symbol}: {e}")
+
+
+def last_ingested_at(symbol: str) -> Optional[float]:
+    """Epoch da última ingestão conhecida (processo atual ou marcador no S3); None se nunca houve."""
+    with _lock:
+        local = _last_ingested.get(symbol)
+    if local is not None:
+        return local
+    try:
+        payload = read_json_from_s3(BUCKET_NAME, ingestion_key(symbol))
+    except Exception:
+        return None
+    if not payload or "last_run" not in payload:
+        return None
+    stamp = datetime.strptime(payload["last_run"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def data_age(symbol: str) -> Optional[float]:
+    last = last_ingested_at(symbol)
+    return None if last is None else max(time.time() - last, 0.0)
+
+
+def ingest(symbol: str,
+           start_date: Optional[str] = None,
+           end_date: Optional[str] = None,
+           interval: str = INGESTION_INTERVAL,
+           period: Optional[str] = INGESTION_PERIOD,
+           auto_adjust: bool = True) -> Tuple[str, int]:
+    """fetch_and_save_s3 + registro da ingestão quando bem-sucedida."""
+    with stage("ingest"):
+        msg = fetch_and_save_s3(symbol, start_date, end_date, interval, period, auto_adjust)
+    if 200 in msg:
+        record_ingestion(symbol)
+    return msg
+
+
+def ensure_fresh(symbol: str, max_staleness: float, **fetch_kwargs) -> Tuple[Tuple[str, int], bool, Optional[float]]:
+    """
+    Busca no Yahoo apenas se os dados ingeridos tiverem mais de `max_staleness` segundos
+    (ou nunca tiverem sido ingeridos). Retorna (mensagem, atualizou, idade em segundos).
+    Single-flight: requisições simultâneas do mesmo símbolo compartilham a primeira
+    atualização e reaproveitam o resultado, em vez de cada uma buscar e regravar o histórico.
+    """
+    age = data_age(symbol)
+    if age is not None and age <= max_staleness:
+        return (f"Dados de '{symbol}' servidos da ingestão em segundo plano.", 200), False, age
+
+    def refresh() -> Tuple[Tuple[str, int], bool, Optional[float]]:
+        # Revalida antes de buscar: uma atualização pode ter terminado desde a primeira verificação
+        age = data_age(symbol)
+        if age is not None and age <= max_staleness:
+            return (f"Dados de '{symbol}' atualizados por requisição simultânea.", 200), False, age
+        logger.info(f"[Ingestão] {symbol} desatualizado (idade={age}s, limite={max_staleness}s): atualização síncrona.")
+        return ingest(symbol, **fetch_kwargs), True, 0.0
+
+    key = ("ensure_fresh", symbol, max_staleness, tuple(sorted(fetch_kwargs.items())))
+    return single_flight(key, refresh)
+
+
+async def ensure_fresh_async(symbol: str, max_staleness: float, **fetch_kwargs) -> Tuple[Tuple[str, int], bool, Optional[float]]:
+    """ensure_fresh para handlers async: a consulta ao S3 e a busca no Yahoo rodam no pool de I/O."""
+    return await run_io(ensure_fresh, symbol, max_staleness, **fetch_kwargs)
+
+
+class IngestionScheduler:
+    """
+    Mantém os símbolos configurados atualizados: cada símbolo é buscado logo após o
+    fechamento de cada barra do seu intervalo. As chamadas bloqueantes (Yahoo + S3) rodam
+    no pool de I/O, com no máximo `concurrency` símbolos ao mesmo tempo.
+    """
+
+    def __init__(self,
+                 symbols: List[Tuple[str, str]],
+                 period: Optional[str] = INGESTION_PERIOD,
+                 delay: float = INGESTION_DELAY_SECONDS,
+                 concurrency: int = INGESTION_CONCURRENCY):
+        self.symbols = symbols
+        self.period = period
+        self.delay = delay
+        self.concurrency = max(int(concurrency), 1)
+        self._stop = asyncio.Event()
+        self.runs = 0
+        self.failures = 0
+
+    @classmethod
+    def from_settings(cls) -> "IngestionScheduler":
+        return cls(parse_symbols())
+
+    def _next_due(self, interval: str, now: float) -> float:
+        step = interval_seconds(interval)
+        return (now // step + 1) * step + self.delay
+
+    async def _run_symbol(self, semaphore: asyncio.Semaphore, symbol: str, interval: str) -> None:
+        async with semaphore:
+            try:
+                msg = await run_io(ingest, symbol, None, None, interval, self.period, True)
+                self.runs += 1
+                if 200 not in msg:
+                    self.failures += 1
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"[Ingestão] Falha ao atualizar {symbol}: {e}")
+
+    async def run_once(self, symbols: Optional[List[Tuple[str, str]]] = None) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._run_symbol(semaphore, s, i) for s, i in (symbols or self.symbols)))
+
+    async def run_forever(self) -> None:
+        logger.info(f"[Ingestão] Agendador iniciado para {self.symbols}")
+        # Primeira rodada imediata para não servir dados antigos após o deploy
+        await self.run_once()
+        now = time.time()
+        due = {symbol: self._next_due(interval, now) for symbol, interval in self.symbols}
+        while not self._stop.is_set():
+            wait = max(min(due.values()) - time.time(), 0.0)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=wait)
+                break
+            except asyncio.TimeoutError:
+                pass
+            now = time.time()
+            ready = [(s, i) for s, i in self.symbols if due[s] <= now]
+            await self.run_once(ready)
+            now = time.time()
+            for symbol, interval in ready:
+                due[symbol] = self._next_due(interval, now)
+        logger.info("[Ingestão] Agendador encerrado.")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        ages = {symbol: data_age(symbol) for symbol, _ in self.symbols}
+        return {"symbols": dict(self.symbols), "runs": self.runs, "failures": self.failures, "data_age_seconds": ages}
@@ -0,0 +1,135 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import METADATA_STORAGE
+from app.services.s3_utils import (
+    PreconditionFailed,
+    list_keys_s3,
+    read_bytes_from_s3,
+    read_csv_versioned,
+    read_json_from_s3,
+    read_json_versioned,
+    retry_on_conflict,
+    write_bytes_to_s3,
+    write_csv_to_s3,
+    write_json_to_s3,
+)
+
+logger = setup_logger("metadata_store")
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+# Campos que descrevem o ticker e só mudam por eventos (cadastro, dividendos, balanços):
+# apenas eles contam para detectar mudança. Cotação, volume, market cap, múltiplos e médias
+# mudam a cada busca durante o pregão e são gravados junto com o snapshot, sem criar um novo.
+_DESCRIPTIVE_FIELDS = (
+    "symbol", "shortName", "longName", "currency", "exchange", "quoteType",
+    "dividendRate", "exDividendDate", "earningsDate",
+    "totalRevenue", "grossProfits", "ebitda", "totalCash", "totalDebt",
+)
+
+
+def metadata_csv_key(symbol: str) -> str:
+    return f"fetch/{symbol}_metadata.csv"
+
+
+def metadata_prefix(symbol: str) -> str:
+    return f"fetch/metadata/symbol={symbol}/"
+
+
+def latest_key(symbol: str) -> str:
+    return f"{metadata_prefix(symbol)}latest.json"
+
+
+def snapshot_hash(snapshot: dict) -> str:
+    content = {k: snapshot.get(k) for k in _DESCRIPTIVE_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def latest_metadata(symbol: str) -> Optional[dict]:
+    """Último snapshot do símbolo em uma única leitura (ponteiro latest.json), sem varrer o histórico."""
+    payload = read_json_from_s3(BUCKET_NAME, latest_key(symbol))
+    return payload.get("snapshot") if payload else None
+
+
+def save_metadata_snapshot(symbol: str, info: dict, timestamp: str, storage: str = METADATA_STORAGE) -> bool:
+    """
+    Registra o snapshot de metadados da execução. No layout de snapshots só grava quando os
+    campos descritivos (_DESCRIPTIVE_FIELDS) mudaram em relação ao último: um objeto novo
+    (uma linha NDJSON) por mudança, em partição por data, e o ponteiro latest.json. Os campos
+    de cotação vão no snapshot como estavam no momento da mudança. Retorna True se algo foi gravado.
+    Ponteiro e CSV legado são gravados com escrita condicional (ETag), sem perder
+    atualizações de outros processos.
+    """
+    snapshot = {"timestamp": timestamp, **info}
+    if storage == "csv":
+        _append_csv(symbol, snapshot)
+        return True
+
+    digest = snapshot_hash(snapshot)
+    previous = read_json_from_s3(BUCKET_NAME, latest_key(symbol))
+    if previous and previous.get("hash") == digest:
+        logger.info(f"[Metadados] {symbol}: snapshot inalterado ({digest}), nada gravado.")
+        return False
+
+    moment = pd.Timestamp(datetime.fromisoformat(timestamp))
+    key = f"{metadata_prefix(symbol)}date={moment:%Y-%m-%d}/{moment:%H%M%S}-{digest}.ndjson"
+    line = json.dumps(snapshot, default=str, ensure_ascii=False) + "\n"
+    try:
+        write_bytes_to_s3(BUCKET_NAME, key, line.encode("utf-8"), if_none_match=True)
+    except PreconditionFailed:
+        # Mesmo conteúdo no mesmo segundo: já gravado por outra ingestão
+        logger.info(f"[Metadados] {symbol}: snapshot {key} já existe.")
+    retry_on_conflict(f"ponteiro de metadados de {symbol}",
+                      lambda: _point_latest(symbol, {"hash": digest, "key": key, "snapshot": snapshot}))
+    logger.info(f"[Metadados] {symbol}: novo snapshot {digest} em {key}.")
+    return True
+
+
+def _point_latest(symbol: str, pointer: dict) -> None:
+    """Move latest.json para o snapshot, a menos que outro processo já tenha gravado um mais recente."""
+    current, etag = read_json_versioned(BUCKET_NAME, latest_key(symbol))
+    if current:
+        current_ts = str(current.get("snapshot", {}).get("timestamp", ""))
+        if current.get("hash") == pointer["hash"] or current_ts > pointer["snapshot"]["timestamp"]:
+            logger.info(f"[Metadados] {symbol}: ponteiro já aponta para {current.get('key')}; mantido.")
+            return
+    write_json_to_s3(BUCKET_NAME, latest_key(symbol), pointer, if_match=etag, if_none_match=etag is None)
+
+
+def read_metadata_history(symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+    """Snapshots do símbolo (um por mudança), podados por data de partição."""
+    rows: List[dict] = []
+    for key in sorted(list_keys_s3(BUCKET_NAME, metadata_prefix(symbol))):
+        if not key.endswith(".ndjson"):
+            continue
+        day = key.split("date=")[1][:10]
+        if (start is not None and day < start[:10]) or (end is not None and day > end[:10]):
+            continue
+        body = read_bytes_from_s3(BUCKET_NAME, key)
+        rows.extend(json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip())
+    history = pd.DataFrame(rows)
+    if history.empty:
+        return history
+    return history.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+
+def _append_csv(symbol: str, snapshot: dict) -> None:
+    key = metadata_csv_key(symbol)
+    info_df = pd.DataFrame([snapshot])
+
+    def append() -> None:
+        meta_existente, etag = read_csv_versioned(BUCKET_NAME, key)
+        if meta_existente is None:
+            logger.warning(f"[S3 Meta Write] Criando novo metadata para {symbol}.")
+            write_csv_to_s3(BUCKET_NAME, key, info_df, if_none_match=True)
+        else:
+            write_csv_to_s3(BUCKET_NAME, key, pd.concat([meta_existente, info_df], ignore_index=True), if_match=etag)
+
+    retry_on_conflict(f"metadados CSV de {symbol}", append)
@@ -0,0 +1,206 @@
+import contextlib
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import ContextManager, Dict, Optional, Sequence, Tuple
+
+from app.config.logger import request_id_var, setup_logger
+from app.config.settings import METRICS_ENABLED
+
+logger = setup_logger("metrics")
+
+# Limites dos histogramas: durações (s) e tamanhos de lote
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+# Durações por etapa da requisição corrente (compartilhado com as threads dos pools)
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+_NOOP = contextlib.nullcontext()
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Por rótulo: contagem por bucket (não cumulativa, +Inf no fim), soma e total
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Duração de cada etapa do pipeline.", ["stage"])
+ROWS_TOTAL = Counter("rows_processed_total", "Linhas processadas por etapa.", ["stage"])
+MODEL_BATCH_SIZE = Histogram("model_batch_size", "Amostras por chamada model.predict.", ["source"], SIZE_BUCKETS)
+S3_REQUESTS = Counter("s3_requests_total", "Chamadas ao S3 por operação.", ["operation", "status"])
+S3_BYTES = Counter("s3_bytes_total", "Bytes lidos/gravados no S3.", ["operation", "direction"])
+S3_SECONDS = Histogram("s3_request_duration_seconds", "Duração das chamadas ao S3.", ["operation"])
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "Duração das requisições HTTP.", ["method", "path", "status"])
+
+_METRICS = (HTTP_SECONDS, STAGE_SECONDS, ROWS_TOTAL, MODEL_BATCH_SIZE, S3_REQUESTS, S3_BYTES, S3_SECONDS)
+
+
+@contextlib.contextmanager
+def _timed_stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def stage(name: str) -> ContextManager[None]:
+    """Mede uma etapa (histograma + resumo da requisição corrente). Desligado, não mede nada."""
+    return _timed_stage(name) if METRICS_ENABLED else _NOOP
+
+
+def add_rows(stage_name: str, rows: int) -> None:
+    if METRICS_ENABLED:
+        ROWS_TOTAL.inc(rows, stage=stage_name)
+
+
+def observe_batch_size(size: int, source: str) -> None:
+    if METRICS_ENABLED:
+        MODEL_BATCH_SIZE.observe(size, source=source)
+
+
+def render() -> str:
+    """Métricas no formato texto do Prometheus."""
+    return "\n".join(metric.render() for metric in _METRICS) + "\n"
+
+
+# --- S3 (eventos do botocore: todas as chamadas do cliente, inclusive as do cache) ---
+def _s3_before_put(params, model, **kwargs) -> None:
+    body = params.get("Body")
+    if isinstance(body, (bytes, bytearray)):
+        S3_BYTES.inc(len(body), operation=model.name, direction="written")
+
+
+def _s3_before_call(context, **kwargs) -> None:
+    context["metrics_started"] = time.perf_counter()
+
+
+def _s3_after_call(http_response, parsed, model, context, **kwargs) -> None:
+    started = context.get("metrics_started")
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        S3_SECONDS.observe(elapsed, operation=model.name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages["s3"] = stages.get("s3", 0.0) + elapsed
+    status = getattr(http_response, "status_code", 0)
+    S3_REQUESTS.inc(operation=model.name, status=status)
+    if model.name == "GetObject" and status in (200, 206):
+        S3_BYTES.inc(parsed.get("ContentLength") or 0, operation=model.name, direction="read")
+
+
+def instrument_s3(client) -> None:
+    """Registra os ganchos de métricas no cliente boto3 (nada é registrado se desligado)."""
+    if not METRICS_ENABLED:
+        return
+    client.meta.events.register("before-parameter-build.s3.PutObject", _s3_before_put)
+    client.meta.events.register("before-call.s3", _s3_before_call)
+    client.meta.events.register("after-call.s3", _s3_after_call)
+
+
+# --- Contexto da requisição ---
+async def instrument_request(request, call_next):
+    """
+    Middleware HTTP: define o request ID (cabeçalho X-Request-ID ou um novo), devolvido na
+    resposta e incluído nos logs JSON; com métricas ligadas, registra a duração da
+    requisição e emite um log estruturado com o tempo de cada etapa.
+    """
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    rid_token = request_id_var.set(request_id)
+    if not METRICS_ENABLED:
+        try:
+            response = await call_next(request)
+        finally:
+            request_id_var.reset(rid_token)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+    stages: Dict[str, float] = {}
+    stages_token = _request_stages.set(stages)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        HTTP_SECONDS.observe(elapsed, method=request.method, path=path, status=status)
+        stages_ms = {name: round(seconds * 1000, 3) for name, seconds in stages.items()}
+        logger.info(f"{request.method} {path} {status} em {elapsed * 1000:.1f} ms; etapas (ms): {stages_ms}", extra={"fields": {
+            "event": "request",
+            "method": request.method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "stages_ms": stages_ms,
+        }})
+        _request_stages.reset(stages_token)
+        request_id_var.reset(rid_token)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.config.logger import setup_logger
+from app.config.settings import MODEL_RELOAD_CHECK_SECONDS, SEQ_LENGTH
+from app.services.inference_backends import load_backend
+
+logger = setup_logger("model_registry")
+
+
+@dataclass
+class ModelEntry:
+    path: str
+    version: str
+    mtime: float
+    model: Any
+    loaded_at: float
+    checked_at: float
+    warmed_up: bool = False
+
+
+def load_artifact(path: str) -> Any:
+    """Carrega o artefato do modelo no backend configurado (INFERENCE_BACKEND; ver inference_backends)."""
+    return load_backend(path)
+
+
+def file_version(path: str) -> str:
+    """Hash SHA-256 (12 primeiros caracteres) do conteúdo do arquivo do modelo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Mantém os modelos carregados em memória, indexados pelo caminho do arquivo.
+    Cada entrada guarda a versão (hash do arquivo); quando o mtime muda, o hash é
+    recalculado e, se diferente, o modelo é recarregado e aquecido antes da troca.
+    """
+
+    def __init__(self, reload_check_seconds: float = MODEL_RELOAD_CHECK_SECONDS):
+        self.reload_check_seconds = reload_check_seconds
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path: str, warmup: bool) -> ModelEntry:
+        logger.info(f"Carregando o modelo de: {path}")
+        started = time.perf_counter()
+        mtime = os.path.getmtime(path)
+        version = file_version(path)
+        model = load_artifact(path)
+        now = time.time()
+        entry = ModelEntry(path=path, version=version, mtime=mtime, model=model, loaded_at=now, checked_at=now)
+        logger.info(f"Modelo carregado com sucesso (versão={version}) em {time.perf_counter() - started:.2f}s.")
+        if warmup:
+            self._warmup(entry)
+        return entry
+
+    def _warmup(self, entry: ModelEntry) -> None:
+        """Executa uma inferência com zeros para disparar o tracing do grafo."""
+        shape = [dim if dim is not None else 1 for dim in entry.model.input_shape]
+        if len(shape) == 3 and entry.model.input_shape[1] is None:
+            shape[1] = SEQ_LENGTH
+        started = time.perf_counter()
+        entry.model.predict(np.zeros(shape, dtype=np.float32), verbose=0)
+        entry.warmed_up = True
+        logger.info(f"Warm-up do modelo {entry.path} concluído em {time.perf_counter() - started:.2f}s.")
+
+    def _is_stale(self, entry: ModelEntry) -> bool:
+        now = time.time()
+        if now - entry.checked_at < self.reload_check_seconds:
+            return False
+        entry.checked_at = now
+        try:
+            mtime = os.path.getmtime(entry.path)
+        except OSError as e:
+            logger.warning(f"Não foi possível verificar o modelo {entry.path}: {e}. Mantendo versão {entry.version}.")
+            return False
+        if mtime == entry.mtime:
+            return False
+        if file_version(entry.path) == entry.version:
+            entry.mtime = mtime
+            return False
+        return True
+
+    def get_entry(self, path: str, warmup: bool = True) -> ModelEntry:
+        entry = self._entries.get(path)
+        if entry is not None and not self._is_stale(entry):
+            return entry
+        with self._lock:
+            current = self._entries.get(path)
+            if current is not None and current is not entry:
+                # Outra thread já carregou/recarregou enquanto aguardávamos o lock
+                return current
+            if current is not None:
+                logger.info(f"Arquivo do modelo {path} foi alterado; recarregando (versão atual={current.version}).")
+            new_entry = self._load(path, warmup=warmup)
+            self._entries[path] = new_entry
+            return new_entry
+
+    def get(self, path: str) -> Any:
+        return self.get_entry(path).model
+
+    def version(self, path: str) -> str:
+        return self.get_entry(path).version
+
+    def preload(self, path: str) -> Optional[ModelEntry]:
+        """Carrega e aquece o modelo; falhas são apenas registradas em log."""
+        try:
+            return self.get_entry(path, warmup=True)
+        except FileNotFoundError:
+            logger.error(f"Arquivo de modelo não encontrado em '{path}'.")
+        except Exception as e:
+            logger.exception(f"Erro ao pré-carregar o modelo {path}: {e}")
+        return None
+
+    def evict(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+
+# Registro único por processo
+registry = ModelRegistry()
+
+
+def get_model(path: str) -> Any:
+    return registry.get(path)
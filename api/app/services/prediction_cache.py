@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config.logger import setup_logger
+from app.config.settings import PREDICTION_CACHE_MAX_ENTRIES
+
+logger = setup_logger("prediction_cache")
+
+CacheKey = Tuple[str, str, str]
+
+
+class PredictionCache:
+    """
+    Cache LRU de predições por (símbolo, last_timestamp do checkpoint, versão do modelo).
+    Enquanto nenhuma barra nova chega e o modelo não muda, a predição é a mesma; quando o
+    checkpoint avança a chave muda sozinha, e write_checkpoint_s3 ainda descarta as entradas
+    antigas do símbolo.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol: str, last_timestamp: str, model_version: str) -> Optional[float]:
+        key = (symbol, last_timestamp, model_version)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, symbol: str, last_timestamp: str, model_version: str, value: float) -> None:
+        with self._lock:
+            self._entries[(symbol, last_timestamp, model_version)] = value
+            self._entries.move_to_end((symbol, last_timestamp, model_version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, symbol: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == symbol]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "max_entries": self.max_entries}
+
+
+# Cache único por processo
+prediction_cache = PredictionCache()
@@ -1,52 +1,74 @@
+import asyncio
 import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
-from tensorflow.keras.models import load_model
-from ta.momentum import RSIIndicator, StochasticOscillator, AwesomeOscillatorIndicator
-from ta.trend import MACD, CCIIndicator, ADXIndicator, EMAIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.volume import OnBalanceVolumeIndicator, AccDistIndexIndicator
-from ta.volume import VolumeWeightedAveragePrice
-
-from app.services.s3_utils import read_csv_from_s3
+from typing import List, Optional, Tuple
+
+from app.services.evolution_store import read_evolution, read_evolution_tail
+from app.services.model_registry import registry
+from app.services.batcher import get_batcher
+from app.services.executors import run_cpu, run_io
+from app.services.fetcher import read_checkpoint_s3
+from app.services.forecast import rollout
+from app.services.features import complete_rows, compute_feature_matrix
+from app.services.sequences import last_window, sliding_windows
+from app.services.prediction_cache import prediction_cache
+from app.services.indicator_state import IndicatorEngine, load_indicator_state, save_indicator_state
+from app.services.metrics import add_rows, observe_batch_size, stage
 from app.config.logger import setup_logger
+from app.config.settings import (
+    BATCHING_ENABLED,
+    FEATURE_BACKEND,
+    FEATURE_COLUMNS,
+    INDICATOR_STATE_ENABLED,
+    MODEL_PATH,
+    PREDICT_HISTORY_BARS,
+    PREDICTION_CACHE_ENABLED,
+    SEQ_LENGTH,
+)
 
 logger = setup_logger("predictor")
 
-# Caminho do modelo
-MODEL_PATH = "api/app/model/modelo_v1.h5"
 BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
-SEQ_LENGTH = 24 
 
 def create_sequences(data, seq_length):
-    X, y = [], []
-    for i in range(len(data) - seq_length - 1):
-        X.append(data[i:(i + seq_length), :])
-        y.append(data[i + seq_length, 0])  # Close price na posição 0
-    return np.array(X), np.array(y)
-
-# --- Função para carregar e prever ---
-def predict_next_price(model_path: str, data: np.ndarray) -> Optional[float]:
+    # Views sem cópia sobre `data` (ver app.services.sequences.sliding_windows)
+    return sliding_windows(data, seq_length)
+
+# --- Função para prever com o modelo já carregado ---
+def predict_next_price(model, data: np.ndarray) -> Optional[float]:
     try:
-        logger.info(f"Carregando o modelo de: {model_path}")
-        model = load_model(model_path, compile=False)
-        logger.info("Modelo carregado com sucesso.")
-        prediction = model.predict(data)
+        observe_batch_size(len(data), "single")
+        with stage("model_predict"):
+            prediction = model.predict(data, verbose=0)
         return float(prediction[0][0])
-    except FileNotFoundError:
-        logger.error(f"Arquivo de modelo não encontrado em '{model_path}'.")
     except Exception as e:
         logger.exception(f"Erro durante a predição: {e}")
     return None
 
 # --- Função para indicadores técnicos ---
-def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
+def add_technical_indicators(df: pd.DataFrame, backend: str = FEATURE_BACKEND) -> pd.DataFrame:
     try:
         df.columns = df.columns.str.title()
         if 'Close' not in df.columns:
             raise ValueError("DataFrame não contém a coluna 'Close'.")
 
+        if backend == "numpy":
+            matrix = compute_feature_matrix(df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])
+            indicators = FEATURE_COLUMNS[5:]
+            df[indicators] = matrix[:, 5:].astype(np.float64)
+            return df
+        if backend != "ta":
+            raise ValueError(f"Backend de features desconhecido: '{backend}'.")
+
+        # Importado só quando o cálculo completo com `ta` é usado (fora do cold start)
+        from ta.momentum import RSIIndicator, StochasticOscillator, AwesomeOscillatorIndicator
+        from ta.trend import MACD, CCIIndicator, ADXIndicator, EMAIndicator
+        from ta.volatility import BollingerBands, AverageTrueRange
+        from ta.volume import OnBalanceVolumeIndicator, AccDistIndexIndicator
+        from ta.volume import VolumeWeightedAveragePrice
+
         df['RSI'] = RSIIndicator(close=df['Close'], window=14).rsi()
         stoch = StochasticOscillator(high=df['High'], low=df['Low'], close=df['Close'], window=14, smooth_window=3)
         df['Stoch_K'] = stoch.stoch()
@@ -85,6 +107,201 @@ def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
         logger.exception(f"Erro ao adicionar indicadores técnicos: {e}")
         raise
 
+# --- Leitura do histórico e cálculo completo das features ---
+def _read_history(symbol: str, start=None, tail_rows: int = 0) -> Optional[pd.DataFrame]:
+    logger.info(f"Lendo dados do S3 para o símbolo: {symbol}")
+    # Datetime já convertido e ordenado; com `start` ou `tail_rows`, apenas o trecho final é lido
+    with stage("history_read"):
+        if tail_rows > 0:
+            data = read_evolution_tail(symbol, tail_rows)
+        else:
+            data = read_evolution(symbol, start=start)
+    if data is None or data.empty:
+        logger.error("Nenhum dado encontrado no S3.")
+        return None
+    add_rows("history_read", len(data))
+    return data
+
+def _features_from_history(
+    data: pd.DataFrame,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    # Conversão das datas de entrada
+    if start_date:
+        start_date = pd.to_datetime(start_date)
+    else:
+        start_date = data['datetime'].min()
+
+    if end_date:
+        end_date = pd.to_datetime(end_date)
+    else:
+        end_date = data['datetime'].max()
+
+    df = data
+    #df = data[(data['datetime'] >= start_date) & (data['datetime'] <= end_date)]
+
+    if df.empty:
+        logger.warning("Nenhum dado disponível no intervalo de tempo fornecido.")
+        return None
+
+    add_rows("features", len(df))
+    if FEATURE_BACKEND == "numpy":
+        # Caminho vetorizado: as features já saem na ordem do modelo, sem DataFrame intermediário
+        df.columns = df.columns.str.title()
+        with stage("features"):
+            matrix = compute_feature_matrix(df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])
+            return complete_rows(matrix)
+
+    with stage("features"):
+        df = add_technical_indicators(df)
+        df.dropna(inplace=True)
+
+    features = [f for f in FEATURE_COLUMNS if f in df.columns]
+    if not features:
+        logger.error("Nenhuma feature válida disponível para predição.")
+        return None
+
+    # Extraindo as features e convertendo para numpy
+    return df[features].to_numpy()
+
+# --- Entradas do pipeline: etapa de I/O separada da etapa de CPU ---
+@dataclass
+class PipelineInputs:
+    """
+    Resultado da etapa de I/O. Com o estado incremental: o estado persistido e as barras
+    que ele ainda não viu (None se já está alinhado com o checkpoint). Sem ele: o histórico.
+    """
+    from_state: bool
+    engine: Optional[IndicatorEngine] = None
+    history: Optional[pd.DataFrame] = None
+
+def load_inputs(symbol: str) -> Optional[PipelineInputs]:
+    """
+    Etapa de I/O (pool de I/O): estado persistido por fetch_and_save_s3 e checkpoint; se o
+    estado não está alinhado com o checkpoint, lê uma vez as barras ainda não vistas (ou o
+    histórico, se não houver estado). None se não houver dados.
+    """
+    if not INDICATOR_STATE_ENABLED:
+        data = _read_history(symbol, tail_rows=PREDICT_HISTORY_BARS)
+        return PipelineInputs(from_state=False, history=data) if data is not None else None
+
+    engine = load_indicator_state(symbol)
+    chk = read_checkpoint_s3(BUCKET_NAME, f"checkpoint/{symbol}_checkpoint.json")
+    last_saved = chk["last_timestamp"].strftime("%Y-%m-%d %H:%M:%S") if chk else None
+    if engine is not None and last_saved is not None and engine.last_timestamp == last_saved:
+        logger.info(f"Usando estado de indicadores de {symbol} (último timestamp {last_saved}).")
+        return PipelineInputs(from_state=True, engine=engine)
+
+    data = _read_history(symbol, start=engine.last_timestamp if engine is not None else None)
+    if data is None:
+        return None
+    return PipelineInputs(from_state=True, engine=engine, history=data)
+
+def _sync_engine(inputs: PipelineInputs) -> IndicatorEngine:
+    """Etapa de CPU: processa no estado as barras ainda não vistas (inputs.engine é atualizado)."""
+    if inputs.engine is None:
+        inputs.engine = IndicatorEngine()
+    if inputs.history is not None:
+        with stage("features"):
+            processed = inputs.engine.update(inputs.history)
+        add_rows("features", processed)
+        logger.info(f"Estado de indicadores sincronizado com {processed} barra(s) do histórico.")
+    return inputs.engine
+
+def store_state(symbol: str, inputs: PipelineInputs) -> None:
+    """
+    Etapa de I/O: grava o estado sincronizado pela etapa de CPU, a menos que uma ingestão
+    simultânea já tenha gravado um estado mais avançado (save_indicator_state).
+    """
+    if not inputs.from_state or inputs.history is None or inputs.engine is None:
+        return
+    try:
+        save_indicator_state(symbol, inputs.engine)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o estado de indicadores de {symbol}: {e}")
+
+def build_sequence(
+    inputs: PipelineInputs,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """Etapa de CPU: última sequência, shape (1, SEQ_LENGTH, n_features), ou None sem dados suficientes."""
+    if inputs.from_state:
+        data_for_model = _sync_engine(inputs).feature_matrix()
+    else:
+        data_for_model = _features_from_history(inputs.history, start_date, end_date)
+    if data_for_model is None:
+        return None
+
+    if len(data_for_model) < SEQ_LENGTH:
+        logger.error(f"Dados insuficientes para criar uma sequência de tamanho {SEQ_LENGTH}.")
+        return None
+
+    # A previsão da próxima barra usa as últimas SEQ_LENGTH linhas, até a barra mais recente
+    with stage("sequences"):
+        last_sequence = last_window(data_for_model, SEQ_LENGTH)
+    return last_sequence
+
+def build_engine(inputs: PipelineInputs) -> Optional[IndicatorEngine]:
+    """Etapa de CPU: motor de indicadores sincronizado, base do forecast multi-passo."""
+    if inputs.from_state:
+        engine = _sync_engine(inputs)
+    else:
+        engine = IndicatorEngine.from_history(inputs.history)
+    if len(engine.tail) < SEQ_LENGTH:
+        logger.error(f"Dados insuficientes para criar uma sequência de tamanho {SEQ_LENGTH}.")
+        return None
+    return engine
+
+# --- Preparação da sequência de entrada ---
+def prepare_sequence(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """Última sequência do símbolo, shape (1, SEQ_LENGTH, n_features), ou None sem dados suficientes."""
+    inputs = load_inputs(symbol)
+    if inputs is None:
+        return None
+    sequence = build_sequence(inputs, start_date, end_date)
+    store_state(symbol, inputs)
+    return sequence
+
+def prepare_engine(symbol: str) -> Optional[IndicatorEngine]:
+    """
+    Motor de indicadores sincronizado com o histórico do símbolo, base do forecast multi-passo.
+    Sem o estado incremental, é montado a partir do histórico lido do S3.
+    """
+    inputs = load_inputs(symbol)
+    if inputs is None:
+        return None
+    engine = build_engine(inputs)
+    store_state(symbol, inputs)
+    return engine
+
+async def prepare_sequence_async(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """prepare_sequence com leituras/gravações do S3 no pool de I/O e features no pool de CPU."""
+    inputs = await run_io(load_inputs, symbol)
+    if inputs is None:
+        return None
+    sequence = await run_cpu(build_sequence, inputs, start_date, end_date)
+    await run_io(store_state, symbol, inputs)
+    return sequence
+
+async def prepare_engine_async(symbol: str) -> Optional[IndicatorEngine]:
+    """prepare_engine com leituras/gravações do S3 no pool de I/O e indicadores no pool de CPU."""
+    inputs = await run_io(load_inputs, symbol)
+    if inputs is None:
+        return None
+    engine = await run_cpu(build_engine, inputs)
+    await run_io(store_state, symbol, inputs)
+    return engine
+
 # --- Pipeline principal ---
 def pipe_to_predict(
     symbol: str,
@@ -92,70 +309,141 @@ def pipe_to_predict(
     end_date: Optional[str] = None,
 ) -> Optional[float]:
     try:
-        logger.info(f"Lendo dados do S3 para o símbolo: {symbol}")
-        data = read_csv_from_s3(BUCKET_NAME, f"fetch/{symbol}_evolution.csv")
-        if data is None or data.empty:
-            logger.error("Nenhum dado encontrado no S3.")
+        last_sequence = prepare_sequence(symbol, start_date, end_date)
+        if last_sequence is None:
             return None
-        
-        # Converte datetime de forma robusta, sem forçar o formato
-        data['datetime'] = pd.to_datetime(data['datetime'], errors='coerce')
-        data.sort_values("datetime", inplace=True)
-
-        # Conversão das datas de entrada
-        if start_date:
-            start_date = pd.to_datetime(start_date)
-        else:
-            start_date = data['datetime'].min()
-
-        if end_date:
-            end_date = pd.to_datetime(end_date)
-        else:
-            end_date = data['datetime'].max()
-
-        df = data
-        #df = data[(data['datetime'] >= start_date) & (data['datetime'] <= end_date)]
 
-        if df.empty:
-            logger.warning("Nenhum dado disponível no intervalo de tempo fornecido.")
+        try:
+            model = registry.get(MODEL_PATH)
+        except FileNotFoundError:
+            logger.error(f"Arquivo de modelo não encontrado em '{MODEL_PATH}'.")
             return None
 
-        df = add_technical_indicators(df)
-        df.dropna(inplace=True)
+        logger.info(f"Realizando predição com sequência de shape {last_sequence.shape}.")
+        if BATCHING_ENABLED:
+            return get_batcher(MODEL_PATH).predict(last_sequence)
+        return predict_next_price(model, last_sequence)
+    
+    except Exception as e:
+        logger.exception(f"Erro na execução do pipeline de predição: {e}")
+        return None
 
-        available_features = [
-            'Open', 'High', 'Low', 'Close', 'Volume',
-            'RSI', 'Stoch_K', 'Stoch_D', 'Awesome_Oscillator',
-            'MACD', 'MACD_signal', 'MACD_diff',
-            'CCI', 'ADX', 'ADX_pos', 'ADX_neg',
-            'BB_upper', 'BB_middle', 'BB_lower',
-            'EMA_20', 'ATR', 'VWAP', 'OBV', 'AccDistIndex',
-            'Candle_Body', 'Candle_Range', 'Upper_Shadow', 'Lower_Shadow'
-        ]
-
-        features = [f for f in available_features if f in df.columns]
-        if not features:
-            logger.error("Nenhuma feature válida disponível para predição.")
-            return None
+# --- Pipeline com cache de predições ---
+def prediction_cache_key(symbol: str) -> Optional[Tuple[str, str]]:
+    """(last_timestamp do checkpoint, versão do modelo) do símbolo; None sem checkpoint."""
+    chk = read_checkpoint_s3(BUCKET_NAME, f"checkpoint/{symbol}_checkpoint.json")
+    if chk is None:
+        return None
+    return chk["last_timestamp"].strftime("%Y-%m-%d %H:%M:%S"), registry.version(MODEL_PATH)
 
-        if len(df) < SEQ_LENGTH + 1:
-            logger.error(f"Dados insuficientes para criar uma sequência de tamanho {SEQ_LENGTH}.")
-            return None
+def pipe_to_predict_cached(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[Optional[float], bool]:
+    """
+    Retorna (predição, cache_hit). Sem barra nova no checkpoint e com o mesmo modelo,
+    a predição anterior é devolvida sem refazer leitura, indicadores e inferência.
+    """
+    if not PREDICTION_CACHE_ENABLED:
+        return pipe_to_predict(symbol, start_date, end_date), False
+    try:
+        key = prediction_cache_key(symbol)
+    except Exception as e:
+        logger.warning(f"Cache de predições indisponível para {symbol}: {e}")
+        return pipe_to_predict(symbol, start_date, end_date), False
+    if key is None:
+        return pipe_to_predict(symbol, start_date, end_date), False
 
-        # Extraindo as features e convertendo para numpy
-        data_for_model = df[features].to_numpy()
+    last_timestamp, model_version = key
+    cached = prediction_cache.get(symbol, last_timestamp, model_version)
+    if cached is not None:
+        logger.info(f"Predição de {symbol} servida do cache (last_timestamp={last_timestamp}, modelo={model_version}).")
+        return cached, True
 
-        # Criar sequências
-        X, y = create_sequences(data_for_model, SEQ_LENGTH)
+    value = pipe_to_predict(symbol, start_date, end_date)
+    if value is not None:
+        prediction_cache.put(symbol, last_timestamp, model_version, value)
+    return value, False
+
+# --- Pipeline assíncrono ---
+async def pipe_to_predict_async(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[Optional[float], bool]:
+    """
+    Versão para handlers async de pipe_to_predict_cached: leituras do S3 no pool de I/O,
+    features no pool de CPU e, com micro-batching, a espera pela inferência é um Future
+    aguardado no event loop (nenhuma thread fica parada enquanto o lote se forma).
+    """
+    key = None
+    if PREDICTION_CACHE_ENABLED:
+        try:
+            key = await run_io(prediction_cache_key, symbol)
+        except Exception as e:
+            logger.warning(f"Cache de predições indisponível para {symbol}: {e}")
+        if key is not None:
+            cached = prediction_cache.get(symbol, *key)
+            if cached is not None:
+                return cached, True
 
-        # Pega a última sequência para previsão
-        last_sequence = X[-1].reshape(1, SEQ_LENGTH, len(features))
+    try:
+        last_sequence = await prepare_sequence_async(symbol, start_date, end_date)
+        if last_sequence is None:
+            return None, False
+        try:
+            model = await run_io(registry.get, MODEL_PATH)
+        except FileNotFoundError:
+            logger.error(f"Arquivo de modelo não encontrado em '{MODEL_PATH}'.")
+            return None, False
 
-        logger.info(f"Realizando predição com sequência de shape {last_sequence.shape}.")
-        return predict_next_price(MODEL_PATH, last_sequence)
-    
+        if BATCHING_ENABLED:
+            # Espera na fila do micro-batcher + inferência do lote
+            with stage("model_wait"):
+                value = await asyncio.wrap_future(get_batcher(MODEL_PATH).submit(last_sequence))
+        else:
+            value = await run_cpu(predict_next_price, model, last_sequence)
     except Exception as e:
         logger.exception(f"Erro na execução do pipeline de predição: {e}")
+        return None, False
+
+    if key is not None and value is not None:
+        prediction_cache.put(symbol, *key, value)
+    return value, False
+
+# --- Forecast multi-passo ---
+def pipe_to_forecast(symbol: str, horizon: int) -> Optional[List[dict]]:
+    """Caminho previsto para os próximos `horizon` passos: [{"datetime", "prediction"}, ...]."""
+    try:
+        engine = prepare_engine(symbol)
+        if engine is None:
+            return None
+        try:
+            model = registry.get(MODEL_PATH)
+        except FileNotFoundError:
+            logger.error(f"Arquivo de modelo não encontrado em '{MODEL_PATH}'.")
+            return None
+        return rollout(model, [engine], horizon)[0]
+    except Exception as e:
+        logger.exception(f"Erro na execução do forecast de {symbol}: {e}")
+        return None
+
+async def pipe_to_forecast_async(symbol: str, horizon: int) -> Optional[List[dict]]:
+    """pipe_to_forecast com o S3 no pool de I/O; indicadores e inferências no pool de CPU."""
+    try:
+        engine = await prepare_engine_async(symbol)
+        if engine is None:
+            return None
+        try:
+            model = await run_io(registry.get, MODEL_PATH)
+        except FileNotFoundError:
+            logger.error(f"Arquivo de modelo não encontrado em '{MODEL_PATH}'.")
+            return None
+        paths = await run_cpu(rollout, model, [engine], horizon)
+        return paths[0]
+    except Exception as e:
+        logger.exception(f"Erro na execução do forecast de {symbol}: {e}")
         return None
 
 # --- Exemplo de chamada ---
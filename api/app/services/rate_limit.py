@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Optional
+
+from app.config.settings import (
+    YF_BURST,
+    YF_MIN_RATE_PER_SECOND,
+    YF_RATE_DECREASE,
+    YF_RATE_PER_SECOND,
+    YF_RATE_RECOVERY,
+)
+
+
+class TokenBucket:
+    """
+    Limitador de taxa thread-safe: até `burst` chamadas imediatas e, depois,
+    `rate` chamadas por segundo. `acquire` bloqueia até haver token disponível.
+    Adaptativo (AIMD): `throttled()` (429 do servidor) multiplica a taxa por `decrease`,
+    até `min_rate`; cada `succeeded()` a aumenta em `recovery` chamadas/s, até a taxa inicial.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: Optional[float] = None,
+                 decrease: float = 0.5, recovery: float = 0.0):
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.burst = max(int(burst), 1)
+        self.min_rate = self.max_rate if min_rate is None else min(float(min_rate), self.max_rate)
+        self.decrease = float(decrease)
+        self.recovery = float(recovery)
+        self.throttles = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Consome `tokens`, esperando o necessário; retorna o tempo esperado (s)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate if self.rate > 0 else 0.1
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self) -> None:
+        """
+        O servidor recusou por excesso de chamadas: reduz a taxa e descarta a rajada acumulada.
+        Os 429 das chamadas que já estavam em voo (intervalo de uma chamada na taxa atual)
+        contam como um único sinal.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            if self.rate > 0 and now - self._last_decrease < 1.0 / self.rate:
+                return
+            self._last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.throttles += 1
+
+    def succeeded(self) -> None:
+        """Chamada aceita: recupera a taxa gradualmente, até a configurada."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "max_rate": self.max_rate, "throttles": self.throttles}
+
+
+# Limitador compartilhado por todas as chamadas ao Yahoo Finance do processo
+yahoo_limiter = TokenBucket(YF_RATE_PER_SECOND, YF_BURST, min_rate=YF_MIN_RATE_PER_SECOND,
+                            decrease=YF_RATE_DECREASE, recovery=YF_RATE_RECOVERY)
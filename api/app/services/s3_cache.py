@@ -0,0 +1,204 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from app.config.logger import setup_logger
+
+logger = setup_logger("s3_cache")
+
+
+@dataclass
+class CacheEntry:
+    etag: str
+    value: Any
+    size: int
+    expires_at: float
+
+
+def _is_not_modified(error: ClientError) -> bool:
+    code = str(error.response.get("Error", {}).get("Code", ""))
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("304", "NotModified") or status == 304
+
+
+def _copy(value: Any) -> Any:
+    # Os chamadores alteram os objetos lidos (ex.: conversão de datetime in-place)
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+class S3Cache:
+    """
+    Cache read-through de objetos do S3 já convertidos (DataFrame, dict...).
+    - Memória: LRU limitada por `max_bytes` (tamanho do objeto no S3).
+    - Disco (opcional, ex.: /tmp): guarda bytes + ETag e sobrevive a reinícios do processo
+      no mesmo container.
+    Dentro do TTL a entrada é servida sem chamada ao S3; depois dele é revalidada com
+    If-None-Match (resposta 304 renova a entrada sem baixar o objeto).
+    """
+
+    def __init__(self, max_bytes: int, default_ttl: float = 0.0, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # --- Camada em disco ---
+    def _disk_path(self, bucket: str, key: str) -> str:
+        digest = hashlib.sha1(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, digest)
+
+    def _disk_load(self, bucket: str, key: str):
+        if not self.disk_dir:
+            return None, None
+        path = self._disk_path(bucket, key)
+        try:
+            with open(path + ".meta", "r", encoding="utf-8") as f:
+                etag = json.load(f)["etag"]
+            with open(path + ".bin", "rb") as f:
+                return etag, f.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _disk_store(self, bucket: str, key: str, etag: str, body: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(bucket, key)
+        try:
+            with open(path + ".bin.tmp", "wb") as f:
+                f.write(body)
+            os.replace(path + ".bin.tmp", path + ".bin")
+            with open(path + ".meta", "w", encoding="utf-8") as f:
+                json.dump({"bucket": bucket, "key": key, "etag": etag}, f)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar s3://{bucket}/{key} no cache em disco: {e}")
+
+    def _disk_drop(self, bucket: str, key: str) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(bucket, key)
+        for suffix in (".bin", ".meta"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+
+    # --- Camada em memória ---
+    def _store(self, cache_key: tuple, entry: CacheEntry) -> None:
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[cache_key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def _lookup(self, cache_key: tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+            return entry
+
+    def get(self, client, bucket: str, key: str, parser: Callable[[bytes], Any], variant: str = "",
+            ttl: Optional[float] = None) -> Any:
+        """
+        Retorna o objeto convertido por `parser`. `variant` distingue conversões diferentes
+        do mesmo objeto (ex.: colunas lidas de um Parquet). Erros do S3 (NoSuchKey...) propagam.
+        """
+        return self.get_versioned(client, bucket, key, parser, variant, ttl)[0]
+
+    def get_versioned(self, client, bucket: str, key: str, parser: Callable[[bytes], Any], variant: str = "",
+                      ttl: Optional[float] = None) -> Tuple[Any, str]:
+        """
+        Como get(), mas retorna (objeto, ETag), base para uma escrita condicional (If-Match).
+        Uma entrada servida dentro do TTL pode estar desatualizada: a escrita condicional
+        falha e o chamador relê, então o resultado continua correto.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        cache_key = (bucket, key, variant)
+        now = time.time()
+        entry = self._lookup(cache_key)
+        if entry is not None and now < entry.expires_at:
+            self.hits += 1
+            return _copy(entry.value), entry.etag
+
+        etag = entry.etag if entry is not None else None
+        disk_body = None
+        if etag is None:
+            etag, disk_body = self._disk_load(bucket, key)
+
+        params = {"Bucket": bucket, "Key": key}
+        if etag:
+            params["IfNoneMatch"] = etag
+        try:
+            obj = client.get_object(**params)
+        except ClientError as e:
+            if etag and _is_not_modified(e):
+                self.revalidations += 1
+                if entry is None:
+                    self.disk_hits += 1
+                    value = parser(disk_body)
+                    entry = CacheEntry(etag=etag, value=value, size=len(disk_body), expires_at=0.0)
+                entry.expires_at = now + ttl
+                self._store(cache_key, entry)
+                self.hits += 1
+                return _copy(entry.value), entry.etag
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                self.invalidate(bucket, key)
+            raise
+
+        self.misses += 1
+        body = obj["Body"].read()
+        value = parser(body)
+        new_etag = obj.get("ETag", "")
+        self._store(cache_key, CacheEntry(etag=new_etag, value=value, size=len(body), expires_at=now + ttl))
+        self._disk_store(bucket, key, new_etag, body)
+        return _copy(value), new_etag
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        """Remove todas as variantes do objeto (chamado após escritas feitas por este processo)."""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == bucket and k[1] == key]:
+                self._bytes -= self._entries.pop(cache_key).size
+        self._disk_drop(bucket, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,18 +1,121 @@
 import boto3
 import json
+import random
+import time
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import io
 import pandas as pd
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
 from app.config.logger import setup_logger  # Importa a função setup_logger do arquivo config
+from app.config.settings import (
+    S3_CACHE_DISK_DIR,
+    S3_CACHE_ENABLED,
+    S3_CACHE_MAX_MB,
+    S3_CACHE_TTL_SECONDS,
+    S3_CAS_BACKOFF_BASE_SECONDS,
+    S3_CAS_BACKOFF_MAX_SECONDS,
+    S3_CAS_MAX_RETRIES,
+    S3_MAX_POOL_CONNECTIONS,
+)
+from app.services.metrics import instrument_s3
+from app.services.s3_cache import S3Cache
 
 logger = setup_logger("s3_utils")
 
-s3 = boto3.client("s3")
+T = TypeVar("T")
 
-def read_json_from_s3(bucket: str, key: str) -> dict:
+# Cliente único (thread-safe) com pool de conexões do tamanho do pool de I/O dos handlers async
+s3 = boto3.client("s3", config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+# Bytes, duração e status de cada chamada (GET /metrics)
+instrument_s3(s3)
+
+# Cache read-through (LRU em memória + disco opcional) com revalidação por ETag
+cache = S3Cache(
+    max_bytes=int(S3_CACHE_MAX_MB * 1024 * 1024),
+    default_ttl=S3_CACHE_TTL_SECONDS,
+    disk_dir=S3_CACHE_DISK_DIR,
+)
+
+
+class PreconditionFailed(Exception):
+    """Escrita condicional recusada: o objeto mudou (If-Match) ou já existe (If-None-Match) desde a leitura."""
+
+
+def _is_precondition_failed(error: ClientError) -> bool:
+    code = str(error.response.get("Error", {}).get("Code", ""))
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    # 409: outra escrita condicional na mesma chave ainda em andamento
+    return code in ("PreconditionFailed", "ConditionalRequestConflict") or status in (409, 412)
+
+
+def _put(bucket: str, key: str, body: bytes, if_match: Optional[str], if_none_match: bool) -> None:
+    """
+    PutObject, opcionalmente condicional: `if_match` (ETag lido) só grava se o objeto não
+    mudou; `if_none_match` só grava se o objeto ainda não existe. Recusa -> PreconditionFailed.
+    """
+    params = {"Bucket": bucket, "Key": key, "Body": body}
+    if if_match:
+        params["IfMatch"] = if_match
+    elif if_none_match:
+        params["IfNoneMatch"] = "*"
+    try:
+        s3.put_object(**params)
+    except ClientError as e:
+        if (if_match or if_none_match) and _is_precondition_failed(e):
+            # A entrada em cache (se houver) é a versão que perdeu a disputa
+            cache.invalidate(bucket, key)
+            raise PreconditionFailed(f"s3://{bucket}/{key} alterado por outra escrita") from e
+        raise
+    cache.invalidate(bucket, key)
+
+
+def retry_on_conflict(description: str, fn: Callable[[], T], max_retries: int = S3_CAS_MAX_RETRIES) -> T:
+    """
+    Concorrência otimista: executa `fn` (leitura + escrita condicional) e, se outra escrita
+    vencer (PreconditionFailed), refaz a partir de uma nova leitura, com backoff e jitter.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except PreconditionFailed as e:
+            if attempt >= max_retries:
+                logger.error(f"[S3 CAS] {description}: conflito persistente após {attempt} nova(s) tentativa(s).")
+                raise
+            delay = random.uniform(0, min(S3_CAS_BACKOFF_MAX_SECONDS, S3_CAS_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            attempt += 1
+            logger.warning(f"[S3 CAS] {description}: {e}; nova tentativa {attempt}/{max_retries} em {delay:.2f}s.")
+            time.sleep(delay)
+
+
+def _get_parsed(bucket: str, key: str, parser, variant: str, cache_ttl: Optional[float]):
+    return _get_versioned(bucket, key, parser, variant, cache_ttl)[0]
+
+def _get_versioned(bucket: str, key: str, parser, variant: str, cache_ttl: Optional[float]) -> Tuple[Any, str]:
+    if S3_CACHE_ENABLED:
+        return cache.get_versioned(s3, bucket, key, parser, variant=variant, ttl=cache_ttl)
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    return parser(obj["Body"].read()), obj.get("ETag", "")
+
+def read_json_versioned(bucket: str, key: str) -> Tuple[Optional[dict], Optional[str]]:
+    """(conteúdo, ETag) do JSON, ou (None, None) se o objeto não existe."""
+    try:
+        return _get_versioned(bucket, key, lambda body: json.loads(body.decode("utf-8")), "json", None)
+    except s3.exceptions.NoSuchKey:
+        return None, None
+
+def read_csv_versioned(bucket: str, key: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """(DataFrame, ETag) do CSV, ou (None, None) se o objeto não existe."""
+    try:
+        return _get_versioned(bucket, key, lambda body: pd.read_csv(io.BytesIO(body)), "csv", None)
+    except s3.exceptions.NoSuchKey:
+        return None, None
+
+def read_json_from_s3(bucket: str, key: str, cache_ttl: Optional[float] = None) -> dict:
     logger.info(f"Attempting to read JSON from s3://{bucket}/{key}")
     try:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        data = json.loads(obj["Body"].read().decode("utf-8"))
+        data = _get_parsed(bucket, key, lambda body: json.loads(body.decode("utf-8")), "json", cache_ttl)
         logger.info(f"Successfully read JSON from s3://{bucket}/{key}")
         return data
     except s3.exceptions.NoSuchKey:
@@ -22,37 +125,153 @@ def read_json_from_s3(bucket: str, key: str) -> dict:
         logger.error(f"Error reading JSON from s3://{bucket}/{key}: {e}", exc_info=True)
         raise
 
-def write_json_to_s3(bucket: str, key: str, data: dict) -> None:
+def write_json_to_s3(bucket: str, key: str, data: dict, if_match: Optional[str] = None, if_none_match: bool = False) -> None:
     logger.info(f"Writing JSON to s3://{bucket}/{key}")
     try:
-        s3.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
-        )
+        _put(bucket, key, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"), if_match, if_none_match)
         logger.info(f"Successfully wrote JSON to s3://{bucket}/{key}")
+    except PreconditionFailed:
+        raise
     except Exception as e:
         logger.error(f"Error writing JSON to s3://{bucket}/{key}: {e}", exc_info=True)
         raise
 
-def read_csv_from_s3(bucket: str, key: str) -> pd.DataFrame:
+def read_csv_from_s3(bucket: str, key: str, cache_ttl: Optional[float] = None) -> pd.DataFrame:
     logger.info(f"Attempting to read CSV from s3://{bucket}/{key}")
     try:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(io.BytesIO(obj["Body"].read()))
+        df = _get_parsed(bucket, key, lambda body: pd.read_csv(io.BytesIO(body)), "csv", cache_ttl)
         logger.info(f"Successfully read CSV from s3://{bucket}/{key} (rows: {len(df)})")
         return df
     except Exception as e:
         logger.error(f"Error reading CSV from s3://{bucket}/{key}: {e}", exc_info=True)
         raise
 
-def write_csv_to_s3(bucket: str, key: str, df: pd.DataFrame, mode: str = "w") -> None:
+def write_csv_to_s3(bucket: str, key: str, df: pd.DataFrame, mode: str = "w",
+                    if_match: Optional[str] = None, if_none_match: bool = False) -> None:
     logger.info(f"Writing CSV to s3://{bucket}/{key} (mode={mode})")
     try:
         csv_buffer = io.StringIO()
         df.to_csv(csv_buffer, index=False)
-        s3.put_object(Bucket=bucket, Key=key, Body=csv_buffer.getvalue().encode("utf-8"))
+        _put(bucket, key, csv_buffer.getvalue().encode("utf-8"), if_match, if_none_match)
         logger.info(f"Successfully wrote CSV to s3://{bucket}/{key} (rows: {len(df)})")
+    except PreconditionFailed:
+        raise
     except Exception as e:
         logger.error(f"Error writing CSV to s3://{bucket}/{key}: {e}", exc_info=True)
         raise
+
+def list_keys_s3(bucket: str, prefix: str) -> List[str]:
+    logger.info(f"Listing objects under s3://{bucket}/{prefix}")
+    keys = []
+    try:
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return sorted(keys)
+    except Exception as e:
+        logger.error(f"Error listing s3://{bucket}/{prefix}: {e}", exc_info=True)
+        raise
+
+def list_prefixes_s3(bucket: str, prefix: str) -> List[str]:
+    """Subprefixos diretos de `prefix` (um nível, delimitador '/'), sem listar os objetos de cada um."""
+    logger.info(f"Listing prefixes under s3://{bucket}/{prefix}")
+    prefixes = []
+    try:
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+            prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        return sorted(prefixes)
+    except Exception as e:
+        logger.error(f"Error listing prefixes of s3://{bucket}/{prefix}: {e}", exc_info=True)
+        raise
+
+def delete_keys_s3(bucket: str, keys: List[str]) -> None:
+    logger.info(f"Deleting {len(keys)} object(s) from s3://{bucket}")
+    try:
+        # DeleteObjects aceita até 1000 chaves por chamada
+        for i in range(0, len(keys), 1000):
+            batch = keys[i:i + 1000]
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True})
+            for key in batch:
+                cache.invalidate(bucket, key)
+    except Exception as e:
+        logger.error(f"Error deleting objects from s3://{bucket}: {e}", exc_info=True)
+        raise
+
+def _parse_parquet(body: bytes, columns: Optional[List[str]], filters: Optional[list]) -> pd.DataFrame:
+    # Importado sob demanda: o layout CSV nunca carrega o pyarrow
+    import pyarrow.parquet as pq
+    # Projeção e filtro no leitor: row groups fora do intervalo nem são decodificados
+    return pq.read_table(io.BytesIO(body), columns=columns, filters=filters).to_pandas()
+
+def read_parquet_from_s3(bucket: str, key: str, columns: Optional[List[str]] = None, filters: Optional[list] = None,
+                         cache_ttl: Optional[float] = None) -> pd.DataFrame:
+    logger.info(f"Attempting to read Parquet from s3://{bucket}/{key} (columns={columns}, filters={filters})")
+    try:
+        if S3_CACHE_ENABLED:
+            # O cache guarda os bytes do objeto (uma entrada por chave, qualquer que seja a
+            # consulta); colunas e filtro são repassados ao leitor a cada chamada
+            body = _get_parsed(bucket, key, lambda body: body, "parquet", cache_ttl)
+        else:
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        df = _parse_parquet(body, columns, filters)
+        logger.info(f"Successfully read Parquet from s3://{bucket}/{key} (rows: {len(df)})")
+        return df
+    except Exception as e:
+        logger.error(f"Error reading Parquet from s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+
+def read_parquet_versioned(bucket: str, key: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """(DataFrame, ETag) do Parquet, ou (None, None) se o objeto não existe."""
+    try:
+        body, etag = _get_versioned(bucket, key, lambda body: body, "parquet", None)
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return _parse_parquet(body, None, None), etag
+
+def write_parquet_to_s3(bucket: str, key: str, df: pd.DataFrame,
+                        if_match: Optional[str] = None, if_none_match: bool = False) -> None:
+    logger.info(f"Writing Parquet to s3://{bucket}/{key}")
+    try:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False, engine="pyarrow", compression="snappy")
+        _put(bucket, key, buffer.getvalue(), if_match, if_none_match)
+        logger.info(f"Successfully wrote Parquet to s3://{bucket}/{key} (rows: {len(df)})")
+    except PreconditionFailed:
+        raise
+    except Exception as e:
+        logger.error(f"Error writing Parquet to s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+
+def head_object_s3(bucket: str, key: str) -> dict:
+    logger.info(f"Fetching metadata of s3://{bucket}/{key}")
+    try:
+        return s3.head_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        logger.error(f"Error fetching metadata of s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+
+def read_bytes_from_s3(bucket: str, key: str, byte_range: Optional[str] = None) -> bytes:
+    """Lê o objeto inteiro ou apenas um intervalo HTTP (ex.: 'bytes=0-1023' ou 'bytes=-65536')."""
+    logger.info(f"Attempting to read bytes from s3://{bucket}/{key} (range={byte_range})")
+    try:
+        params = {"Bucket": bucket, "Key": key}
+        if byte_range:
+            params["Range"] = byte_range
+        body = s3.get_object(**params)["Body"].read()
+        logger.info(f"Successfully read {len(body)} bytes from s3://{bucket}/{key}")
+        return body
+    except Exception as e:
+        logger.error(f"Error reading bytes from s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
+
+def write_bytes_to_s3(bucket: str, key: str, body: bytes, if_none_match: bool = False) -> None:
+    logger.info(f"Writing {len(body)} bytes to s3://{bucket}/{key}")
+    try:
+        _put(bucket, key, body, None, if_none_match)
+        logger.info(f"Successfully wrote bytes to s3://{bucket}/{key}")
+    except PreconditionFailed:
+        raise
+    except Exception as e:
+        logger.error(f"Error writing bytes to s3://{bucket}/{key}: {e}", exc_info=True)
+        raise
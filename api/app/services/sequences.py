@@ -0,0 +1,45 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data: np.ndarray, seq_length: int, last_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Janelas (X) e alvos (y) com a mesma semântica de create_sequences:
+    X[i] = data[i:i + seq_length] e y[i] = data[i + seq_length, 0] (Close na posição 0),
+    para i em range(len(data) - seq_length - 1).
+
+    X tem shape (n_janelas, seq_length, n_features) e, assim como y, é uma view
+    somente leitura sobre `data` (sem cópia). Com `last_k`, apenas as últimas k janelas
+    são devolvidas, o que mantém constante o custo da inferência quando o histórico cresce.
+    """
+    data = np.asarray(data)
+    n_windows = max(len(data) - seq_length - 1, 0)
+    if last_k is not None:
+        k = min(max(int(last_k), 0), n_windows)
+        # Recorta apenas o trecho necessário para as k últimas janelas e seus alvos
+        data = data[n_windows - k:n_windows + seq_length]
+        n_windows = k
+    if n_windows == 0:
+        empty_x = np.empty((0, seq_length) + data.shape[1:], dtype=data.dtype)
+        return empty_x, np.empty(0, dtype=data.dtype)
+
+    # sliding_window_view coloca a dimensão da janela no fim: (n, n_features, seq) -> (n, seq, n_features)
+    windows = sliding_window_view(data, seq_length, axis=0)
+    X = np.moveaxis(windows, -1, 1)[:n_windows]
+    y = data[seq_length:seq_length + n_windows, 0]
+    y.flags.writeable = False
+    return X, y
+
+
+def last_window(data: np.ndarray, seq_length: int) -> np.ndarray:
+    """
+    Janela de entrada para prever a barra seguinte à última de `data`: as últimas
+    `seq_length` linhas, shape (1, seq_length, n_features). Diferente das janelas de
+    treino, não reserva alvo: a previsão fica condicionada à barra mais recente.
+    """
+    data = np.asarray(data)
+    if len(data) < seq_length:
+        raise ValueError(f"São necessárias {seq_length} linhas para a janela; recebidas {len(data)}.")
+    return data[len(data) - seq_length:][np.newaxis]
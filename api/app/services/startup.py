@@ -0,0 +1,30 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+# Marco zero: este módulo é importado primeiro por main.py
+_process_started = time.perf_counter()
+_phases: List[Dict[str, float]] = []
+
+# Dependências cujo import domina o cold start
+HEAVY_MODULES = ("tensorflow", "keras", "yfinance", "ta", "pyarrow", "ai_edge_litert", "tflite_runtime", "onnxruntime")
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Mede uma etapa da inicialização (imports, carga do modelo...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({"name": name, "seconds": round(time.perf_counter() - started, 4)})
+
+
+def startup_report() -> dict:
+    """Tempo por etapa desde o início do processo e dependências pesadas já carregadas."""
+    return {
+        "phases": list(_phases),
+        "since_process_start_seconds": round(time.perf_counter() - _process_started, 4),
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, TypeVar
+
+from app.config.logger import setup_logger
+
+logger = setup_logger("symbol_locks")
+
+T = TypeVar("T")
+
+# Um lock por símbolo, criado sob demanda. Reentrante: quem já o segura (ex.: backfill)
+# pode chamar funções que o adquirem de novo na mesma thread.
+_locks: Dict[str, threading.RLock] = {}
+_registry_lock = threading.Lock()
+
+# Execuções em andamento por chave (single_flight)
+_inflight: Dict[Hashable, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _lock_for(symbol: str) -> threading.RLock:
+    with _registry_lock:
+        lock = _locks.get(symbol)
+        if lock is None:
+            lock = _locks[symbol] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def symbol_lock(symbol: str) -> Iterator[None]:
+    """
+    Serializa, dentro do processo, a leitura-alteração-escrita dos objetos de um símbolo
+    (histórico, checkpoint, metadados). Símbolos diferentes nunca esperam uns pelos outros;
+    entre processos a proteção é a escrita condicional no S3 (s3_utils.retry_on_conflict).
+    """
+    lock = _lock_for(symbol)
+    if not lock.acquire(blocking=False):
+        logger.info(f"[Lock] {symbol}: aguardando outra atualização em andamento.")
+        lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def single_flight(key: Hashable, fn: Callable[[], T]) -> T:
+    """
+    Chamadas simultâneas com a mesma `key` compartilham uma única execução de `fn`: a
+    primeira executa e as demais recebem o mesmo resultado (ou exceção), em vez de repetir
+    a busca no Yahoo e a gravação no S3 uma após a outra.
+    Não chame segurando symbol_lock: a execução líder pode estar esperando por ele.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        logger.info(f"[Single-flight] {key}: aguardando execução em andamento.")
+        return future.result()
+    try:
+        future.set_result(fn())
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+    return future.result()
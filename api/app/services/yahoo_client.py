@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.config.logger import setup_logger
+from app.config.settings import (
+    YF_BACKOFF_BASE_SECONDS,
+    YF_BACKOFF_MAX_SECONDS,
+    YF_INFO_TTL_SECONDS,
+    YF_MAX_RETRIES,
+)
+from app.services.metrics import add_rows, stage
+from app.services.rate_limit import TokenBucket, yahoo_limiter
+
+logger = setup_logger("yahoo_client")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return int(status) if status is not None else None
+
+
+def is_throttled(error: Exception) -> bool:
+    """O Yahoo recusou por excesso de chamadas (429)."""
+    from yfinance.exceptions import YFRateLimitError
+    if isinstance(error, YFRateLimitError):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status == 429
+    message = str(error)
+    return "Too Many Requests" in message or "Rate limited" in message
+
+
+def is_retryable(error: Exception) -> bool:
+    """Throttling (429) e erros 5xx do Yahoo são temporários; o resto é propagado na hora."""
+    if is_throttled(error):
+        return True
+    status = _status_code(error)
+    return status is not None and 500 <= status < 600
+
+
+class YahooClient:
+    """
+    Cliente compartilhado do Yahoo Finance:
+    - limitador de taxa (token bucket) comum a todas as chamadas do processo, que desacelera
+      a cada 429 e recupera a taxa aos poucos com as chamadas aceitas;
+    - novas tentativas com backoff exponencial e jitter em 429/5xx;
+    - coalescência: chamadas simultâneas com os mesmos parâmetros compartilham uma única
+      requisição ao Yahoo;
+    - cache de `ticker.info` com TTL.
+    """
+
+    def __init__(self,
+                 limiter: TokenBucket = yahoo_limiter,
+                 max_retries: int = YF_MAX_RETRIES,
+                 backoff_base: float = YF_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = YF_BACKOFF_MAX_SECONDS,
+                 info_ttl: float = YF_INFO_TTL_SECONDS):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.info_ttl = info_ttl
+        self._inflight: Dict[Tuple, Future] = {}
+        self._info: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.info_hits = 0
+
+    def _call(self, description: str, fn: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            self.calls += 1
+            try:
+                with stage("yahoo"):
+                    result = fn()
+                self.limiter.succeeded()
+                return result
+            except Exception as e:
+                if is_throttled(e):
+                    self.limiter.throttled()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter: espera aleatória em [0, min(max, base * 2^tentativa)]
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"[Yahoo] {description}: {e}; nova tentativa {attempt}/{self.max_retries} em {delay:.2f}s.")
+                time.sleep(delay)
+
+    def _coalesced(self, key: Tuple, description: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                future.set_result(self._call(description, fn))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return future.result()
+
+    def history(self,
+                symbol: str,
+                start: Optional[str] = None,
+                end: Optional[str] = None,
+                interval: str = "1d",
+                period: Optional[str] = None,
+                auto_adjust: bool = True) -> pd.DataFrame:
+        """Ticker.history com limite de taxa, novas tentativas e coalescência. Retorna uma cópia."""
+        # yfinance é importado na primeira chamada, fora do cold start
+        import yfinance as yf
+        key = ("history", symbol, start, end, interval, period, auto_adjust)
+        df = self._coalesced(key, f"history {symbol} {interval}", lambda: yf.Ticker(symbol).history(
+            start=start,
+            end=end,
+            interval=interval,
+            period=period,
+            auto_adjust=auto_adjust,
+            actions=False,
+        ))
+        add_rows("yahoo_history", len(df))
+        # Cada chamador recebe sua cópia: o resultado compartilhado não pode ser alterado
+        return df.copy()
+
+    def info(self, symbol: str) -> dict:
+        """ticker.info em cache por `info_ttl` segundos."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._info.get(symbol)
+            if cached is not None and cached[0] > now:
+                self.info_hits += 1
+                return dict(cached[1])
+        import yfinance as yf
+        info = self._coalesced(("info", symbol), f"info {symbol}", lambda: yf.Ticker(symbol).info)
+        with self._lock:
+            self._info[symbol] = (time.monotonic() + self.info_ttl, info)
+        return dict(info)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "info_hits": self.info_hits,
+            "inflight": len(self._inflight),
+            "limiter": self.limiter.stats(),
+        }
+
+
+# Cliente único por processo
+yahoo = YahooClient()
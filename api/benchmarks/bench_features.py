@@ -0,0 +1,38 @@
+# Benchmark do cálculo completo de features: caminho `ta`/pandas x kernel NumPy.
+# Uso (a partir de api/): python -m benchmarks.bench_features [n_linhas ...]
+import sys
+import time
+import tracemalloc
+
+from app.services.features import compute_feature_matrix
+from app.services.preditict import add_technical_indicators
+from benchmarks.synthetic import synthetic_ohlcv
+
+
+def _run_ta(history):
+    add_technical_indicators(history.copy(), backend="ta")
+
+
+def _run_numpy(history):
+    compute_feature_matrix(history["open"], history["high"], history["low"], history["close"], history["volume"])
+
+
+def measure(fn, history) -> dict:
+    """Tempo de parede e pico de memória alocada (tracemalloc) de uma execução."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn(history)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "rows_per_sec": len(history) / elapsed, "peak_mb": peak / 1024 ** 2}
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'linhas':>10} {'backend':>8} {'segundos':>10} {'linhas/s':>14} {'pico MB':>10}")
+    for n_rows in sizes:
+        history = synthetic_ohlcv(n_rows)
+        for name, fn in (("ta", _run_ta), ("numpy", _run_numpy)):
+            result = measure(fn, history)
+            print(f"{n_rows:>10} {name:>8} {result['seconds']:>10.3f} {result['rows_per_sec']:>14,.0f} {result['peak_mb']:>10.1f}")
@@ -0,0 +1,60 @@
+# Benchmark da serialização do histórico do yfinance: iterrows + dicts (caminho antigo)
+# x conversão colunar (history_frame). Inclui a reconversão feita pela ingestão.
+# Uso (a partir de api/): python -m benchmarks.bench_stock_data [anos ...]
+import sys
+
+import pandas as pd
+
+from app.services.stock_data import evolution_records, history_frame
+from benchmarks.bench_features import measure
+from benchmarks.synthetic import synthetic_ohlcv
+
+# Barras de 1 minuto por ano (252 pregões de 6h30)
+BARS_PER_YEAR = 252 * 390
+
+
+def yfinance_frame(n_rows: int) -> pd.DataFrame:
+    """DataFrame no formato devolvido por Ticker.history (índice com timezone, colunas em Title case)."""
+    bars = synthetic_ohlcv(n_rows)
+    index = pd.DatetimeIndex(pd.to_datetime(bars.pop("datetime")), name="Datetime").tz_localize("UTC")
+    bars.index = index
+    bars.columns = bars.columns.str.title()
+    return bars
+
+
+def _legacy(df):
+    data_evolution = []
+    for dt, row in df.iterrows():
+        data_evolution.append({
+            "datetime": dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "open": float(row["Open"]),
+            "high": float(row["High"]),
+            "low": float(row["Low"]),
+            "close": float(row["Close"]),
+            "volume": int(row["Volume"]),
+        })
+    evo = pd.DataFrame(data_evolution)
+    evo["datetime"] = pd.to_datetime(evo["datetime"], format="%Y-%m-%d %H:%M:%S")
+
+
+def _columnar(df):
+    history_frame(df)
+
+
+def _records(df):
+    evolution_records(history_frame(df))
+
+
+if __name__ == "__main__":
+    years = [float(arg) for arg in sys.argv[1:]] or [1, 3]
+    print(f"{'anos':>5} {'linhas':>10} {'caminho':>10} {'segundos':>10} {'linhas/s':>14} {'pico MB':>10}")
+    for n_years in years:
+        df = yfinance_frame(int(n_years * BARS_PER_YEAR))
+        assert history_frame(df).equals(
+            pd.DataFrame(evolution_records(history_frame(df))).assign(
+                datetime=lambda f: pd.to_datetime(f["datetime"]))
+        )
+        for name, fn in (("iterrows", _legacy), ("colunar", _columnar), ("dicts", _records)):
+            result = measure(fn, df)
+            print(f"{n_years:>5g} {len(df):>10} {name:>10} {result['seconds']:>10.3f} "
+                  f"{result['rows_per_sec']:>14,.0f} {result['peak_mb']:>10.1f}")
@@ -0,0 +1,111 @@
+"""
+Substitutos locais para os benchmarks: S3 em memória (moto), yfinance falso alimentado por
+barras sintéticas e um modelo Keras de mesmo shape quando o modelo real não está disponível.
+Devem ser instalados antes de importar os módulos de `app` (o cliente S3 e as configurações
+são criados no import).
+"""
+import os
+import sys
+import types
+import zlib
+from typing import Dict, Optional
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+
+def local_s3():
+    """Inicia o moto (S3 em memória) com o bucket do projeto; retorna o mock para `stop()`."""
+    for name, value in (("AWS_DEFAULT_REGION", "us-east-1"), ("AWS_ACCESS_KEY_ID", "bench"),
+                        ("AWS_SECRET_ACCESS_KEY", "bench")):
+        os.environ.setdefault(name, value)
+    from moto import mock_aws
+    import boto3
+
+    mock = mock_aws()
+    mock.start()
+    boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+    return mock
+
+
+class FakeMarket:
+    """
+    Mercado sintético por símbolo: cada chamada a history() devolve as próximas
+    `bars_per_call` barras (simulando a ingestão periódica), no formato do Ticker.history.
+    """
+
+    def __init__(self, bars_per_call: int = 390, total_bars: int = 200_000):
+        self.bars_per_call = bars_per_call
+        self.total_bars = total_bars
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._cursor: Dict[str, int] = {}
+        self.calls = 0
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self._frames:
+            bars = synthetic_ohlcv(self.total_bars, seed=zlib.crc32(symbol.encode()))
+            index = pd.DatetimeIndex(pd.to_datetime(bars.pop("datetime")), name="Datetime").tz_localize("UTC")
+            bars.index = index
+            bars.columns = bars.columns.str.title()
+            self._frames[symbol] = bars
+        return self._frames[symbol]
+
+    def seek(self, symbol: str, position: int) -> None:
+        self._cursor[symbol] = position
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        self.calls += 1
+        frame = self.frame(symbol)
+        start = self._cursor.get(symbol, 0)
+        end = min(start + self.bars_per_call, len(frame))
+        self._cursor[symbol] = end
+        return frame.iloc[start:end].copy()
+
+
+def stub_yfinance(market: FakeMarket) -> None:
+    """Registra um módulo `yfinance` falso (Ticker.history/info) servido pelo FakeMarket."""
+    class Ticker:
+        def __init__(self, symbol: str):
+            self.symbol = symbol
+
+        def history(self, **kwargs) -> pd.DataFrame:
+            return market.history(self.symbol, **kwargs)
+
+        @property
+        def info(self) -> dict:
+            return {"symbol": self.symbol, "shortName": f"{self.symbol} Bench", "currency": "USD"}
+
+    class YFRateLimitError(Exception):
+        pass
+
+    module = types.ModuleType("yfinance")
+    module.Ticker = Ticker
+    exceptions = types.ModuleType("yfinance.exceptions")
+    exceptions.YFRateLimitError = YFRateLimitError
+    module.exceptions = exceptions
+    sys.modules["yfinance"] = module
+    sys.modules["yfinance.exceptions"] = exceptions
+
+
+def stand_in_model(path: str, seq_length: int, n_features: int, seed: int = 0) -> str:
+    """Modelo LSTM aleatório com o shape de entrada do serviço, gravado em `path` (.h5)."""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(seq_length, n_features)),
+        tf.keras.layers.LSTM(64),
+        tf.keras.layers.Dense(1),
+    ])
+    model.save(path)
+    return path
+
+
+def resolve_model(path: Optional[str], workdir: str, seq_length: int, n_features: int) -> tuple:
+    """(caminho, substituto?) — usa `path` se existir, senão grava o modelo substituto em `workdir`."""
+    if path and os.path.exists(path):
+        return path, False
+    return stand_in_model(os.path.join(workdir, "stand_in.h5"), seq_length, n_features), True
@@ -0,0 +1,312 @@
+# Suíte de benchmarks reprodutível do pipeline de serviço e de ingestão, sem rede:
+# S3 em memória (moto), yfinance falso com barras sintéticas e, sem o modelo real, um
+# modelo substituto de mesmo shape. Os resultados vão para JSON, comparáveis entre commits.
+# Uso (a partir de api/):
+#   python -m benchmarks.suite [--quick] [--only micro,ingestion,endpoint] [--model caminho.h5]
+#                              [--output arquivo.json] [--compare baseline.json]
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks import stubs
+
+PROFILES = {
+    "full": {
+        "feature_rows": [10_000, 100_000, 1_000_000],
+        "sequence_rows": [10_000, 100_000, 1_000_000],
+        "predict_repeats": 200,
+        "predict_batches": [1, 32, 256],
+        "history_sizes": [10_000, 100_000, 500_000],
+        "ingestion_calls": 10,
+        "endpoint_symbols": 8,
+        "endpoint_requests": 400,
+        "endpoint_concurrency": [1, 16, 64],
+    },
+    "quick": {
+        "feature_rows": [10_000],
+        "sequence_rows": [10_000],
+        "predict_repeats": 30,
+        "predict_batches": [1, 32],
+        "history_sizes": [5_000, 20_000],
+        "ingestion_calls": 3,
+        "endpoint_symbols": 2,
+        "endpoint_requests": 40,
+        "endpoint_concurrency": [1, 8],
+    },
+}
+# Barras por ingestão incremental (um pregão de 1 minuto)
+BARS_PER_CALL = 390
+# Barras do histórico de cada símbolo usado no teste do endpoint
+ENDPOINT_HISTORY_BARS = 3_000
+
+
+def percentiles(samples) -> dict:
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {"p50_ms": p50, "p90_ms": p90, "p95_ms": p95, "p99_ms": p99, "max_ms": float(values.max()),
+            "mean_ms": float(values.mean()), "n": int(values.size)}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# --- Micro-benchmarks ---
+def bench_micro(profile: dict, model) -> dict:
+    from app.config.settings import FEATURE_COLUMNS, SEQ_LENGTH
+    from app.services.preditict import add_technical_indicators, create_sequences, predict_next_price
+    from benchmarks.bench_features import measure
+    from benchmarks.synthetic import synthetic_ohlcv
+
+    results = {"add_technical_indicators": [], "create_sequences": [], "predict_next_price": {}, "model_predict_batch": []}
+    for n_rows in profile["feature_rows"]:
+        history = synthetic_ohlcv(n_rows)
+        for backend in ("ta", "numpy"):
+            result = measure(lambda h: add_technical_indicators(h.copy(), backend=backend), history)
+            results["add_technical_indicators"].append({"rows": n_rows, "backend": backend, **result})
+
+    rng = np.random.default_rng(0)
+    for n_rows in profile["sequence_rows"]:
+        data = rng.normal(size=(n_rows, len(FEATURE_COLUMNS)))
+        started = time.perf_counter()
+        X, _ = create_sequences(data, SEQ_LENGTH)
+        views = time.perf_counter() - started
+        started = time.perf_counter()
+        X.astype(np.float32)
+        materialized = time.perf_counter() - started
+        results["create_sequences"].append({"rows": n_rows, "windows": len(X), "views_seconds": views,
+                                            "float32_copy_seconds": materialized,
+                                            "windows_per_sec": len(X) / materialized if materialized else None})
+
+    sequence = rng.normal(size=(1, SEQ_LENGTH, len(FEATURE_COLUMNS))).astype(np.float32)
+    predict_next_price(model, sequence)  # aquecimento
+    timings = []
+    for _ in range(profile["predict_repeats"]):
+        started = time.perf_counter()
+        predict_next_price(model, sequence)
+        timings.append(time.perf_counter() - started)
+    results["predict_next_price"] = percentiles(timings)
+
+    for batch in profile["predict_batches"]:
+        X = rng.normal(size=(batch, SEQ_LENGTH, len(FEATURE_COLUMNS))).astype(np.float32)
+        model.predict(X, verbose=0)
+        started = time.perf_counter()
+        repeats = max(profile["predict_repeats"] // 10, 3)
+        for _ in range(repeats):
+            model.predict(X, batch_size=batch, verbose=0)
+        elapsed = (time.perf_counter() - started) / repeats
+        results["model_predict_batch"].append({"batch": batch, "seconds": elapsed, "samples_per_sec": batch / elapsed})
+    return results
+
+
+# --- Ingestão ---
+def bench_ingestion(profile: dict, market: stubs.FakeMarket) -> list:
+    """fetch_and_save_s3 com históricos crescentes: carga inicial e ingestões incrementais."""
+    from app.services.fetcher import fetch_and_save_s3
+
+    results = []
+    for size in profile["history_sizes"]:
+        symbol = f"ING{size}"
+        market.seek(symbol, 0)
+        market.bars_per_call = size
+        started = time.perf_counter()
+        _, status = fetch_and_save_s3(symbol, interval="1m", period="1d")
+        seed_seconds = time.perf_counter() - started
+
+        market.bars_per_call = BARS_PER_CALL
+        timings = []
+        for _ in range(profile["ingestion_calls"]):
+            started = time.perf_counter()
+            fetch_and_save_s3(symbol, interval="1m", period="1d")
+            timings.append(time.perf_counter() - started)
+        mean = float(np.mean(timings))
+        results.append({
+            "history_rows": size,
+            "seed_status": status,
+            "seed_seconds": seed_seconds,
+            "seed_rows_per_sec": size / seed_seconds,
+            "incremental": percentiles(timings),
+            "incremental_rows_per_sec": BARS_PER_CALL / mean,
+        })
+    return results
+
+
+# --- Endpoint ---
+async def _load(app, path: str, params_for, n_requests: int, concurrency: int) -> dict:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, errors = [], 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, params=params_for(i))
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200 or not isinstance(response.json(), float):
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        wall = time.perf_counter() - started
+    return {"concurrency": concurrency, "requests_per_sec": n_requests / wall, "errors": errors, **percentiles(timings)}
+
+
+def bench_endpoint(profile: dict, market: stubs.FakeMarket) -> dict:
+    """Latência de /stock-data-prediction sob carga concorrente, com e sem cache de predições."""
+    import main
+    from app.config.settings import MODEL_PATH
+    from app.services import preditict
+    from app.services.fetcher import fetch_and_save_s3
+    from app.services.model_registry import registry
+
+    registry.preload(MODEL_PATH)
+    symbols = [f"END{i}" for i in range(profile["endpoint_symbols"])]
+    market.bars_per_call = ENDPOINT_HISTORY_BARS
+    for symbol in symbols:
+        market.seek(symbol, 0)
+        fetch_and_save_s3(symbol, interval="1m", period="1d")
+    market.bars_per_call = BARS_PER_CALL
+
+    scenarios = {
+        # Dados recentes e predição em cache: só leitura do checkpoint
+        "cache_hit": (True, 1e9),
+        # Dados recentes, sem cache: indicadores + sequência + inferência a cada requisição
+        "cache_miss": (False, 1e9),
+        # Sempre busca no Yahoo (falso) e grava no S3 antes de prever
+        "refresh": (True, 0),
+    }
+    results = {}
+    original = preditict.PREDICTION_CACHE_ENABLED
+    try:
+        for name, (cache_enabled, staleness) in scenarios.items():
+            preditict.PREDICTION_CACHE_ENABLED = cache_enabled
+            params_for = lambda i, s=staleness: {"symbol": symbols[i % len(symbols)], "max_staleness": s}
+            results[name] = [
+                asyncio.run(_load(main.app, "/stock-data-prediction", params_for, profile["endpoint_requests"], c))
+                for c in profile["endpoint_concurrency"]
+            ]
+    finally:
+        preditict.PREDICTION_CACHE_ENABLED = original
+    return results
+
+
+# --- Comparação ---
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            label = next((f"{k}={item[k]}" for k in ("rows", "history_rows", "concurrency", "batch") if isinstance(item, dict) and k in item), str(i))
+            if isinstance(item, dict) and "backend" in item:
+                label += f",{item['backend']}"
+            yield from _flatten(item, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> None:
+    """Imprime as métricas que mudaram mais que `threshold` (por padrão 10%)."""
+    old = dict(_flatten(baseline["results"]))
+    print(f"\nComparação com {baseline['meta'].get('commit')} (variação > {threshold:.0%}):")
+    for key, value in _flatten(current["results"]):
+        before = old.get(key)
+        if before is None or before == 0 or key.endswith((".n", "rows", "windows", "errors", "batch", "concurrency", "seed_status")):
+            continue
+        change = value / before - 1
+        if abs(change) > threshold:
+            better = change > 0 if "per_sec" in key else change < 0
+            print(f"  {'melhor' if better else 'PIOR  '} {change:+8.1%}  {key}: {before:.6g} -> {value:.6g}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline com substitutos locais")
+    parser.add_argument("--quick", action="store_true", help="tamanhos reduzidos (verificação rápida)")
+    parser.add_argument("--only", default="micro,ingestion,endpoint")
+    parser.add_argument("--model", default=None, help="modelo .h5/.tflite; sem ele, usa um substituto de mesmo shape")
+    parser.add_argument("--output", default=None, help="padrão: benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior")
+    parser.add_argument("--keep-logs", action="store_true", help="mantém os logs INFO da aplicação")
+    args = parser.parse_args()
+
+    profile_name = "quick" if args.quick else "full"
+    profile = PROFILES[profile_name]
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    workdir = tempfile.mkdtemp(prefix="bench-")
+
+    # Substitutos instalados antes de importar os serviços (cliente S3 e caminhos são lidos no import)
+    from app.config import settings
+    model_path, stand_in = stubs.resolve_model(args.model or os.getenv("MODEL_PATH"), workdir,
+                                               settings.SEQ_LENGTH, len(settings.FEATURE_COLUMNS))
+    os.environ["MODEL_PATH"] = model_path
+    importlib.reload(settings)
+    model_path = settings.MODEL_PATH
+    mock = stubs.local_s3()
+    market = stubs.FakeMarket(total_bars=max(profile["history_sizes"]) + BARS_PER_CALL * (profile["ingestion_calls"] + 1))
+    stubs.stub_yfinance(market)
+    if not args.keep_logs:
+        logging.disable(logging.INFO)
+
+    from app.services.model_registry import registry
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "profile": profile_name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": model_path,
+            "stand_in_model": stand_in,
+            "storage_format": os.getenv("STORAGE_FORMAT", "csv"),
+            "inference_backend": os.getenv("INFERENCE_BACKEND", "auto"),
+            "logs": args.keep_logs,
+        },
+        "results": {},
+    }
+    try:
+        if "micro" in sections:
+            print("micro-benchmarks...")
+            report["results"]["micro"] = bench_micro(profile, registry.get(model_path))
+        if "ingestion" in sections:
+            print("ingestão (fetch_and_save_s3)...")
+            report["results"]["ingestion"] = bench_ingestion(profile, market)
+        if "endpoint" in sections:
+            print("endpoint /stock-data-prediction...")
+            report["results"]["endpoint"] = bench_endpoint(profile, market)
+    finally:
+        mock.stop()
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f"Resultados gravados em {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_ohlcv(n_rows: int, start: str = "2020-01-02 14:30:00", freq: str = "1min", seed: int = 42,
+                    price: float = 100.0) -> pd.DataFrame:
+    """
+    Gera barras OHLCV sintéticas (passeio aleatório geométrico) no mesmo layout
+    do `{symbol}_evolution.csv`: datetime, open, high, low, close, volume.
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0, 0.001, n_rows)
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([price], close[:-1])) * (1 + rng.normal(0.0, 0.0002, n_rows))
+    spread = np.abs(rng.normal(0.0, 0.0008, n_rows)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(1_000, 50_000, n_rows)
+    index = pd.date_range(start=start, periods=n_rows, freq=freq)
+    return pd.DataFrame({
+        "datetime": index.strftime("%Y-%m-%d %H:%M:%S"),
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+    })
@@ -1,13 +1,53 @@
-from fastapi import FastAPI
-from app.api import router
-from mangum import Mangum
-from fastapi.middleware.cors import CORSMiddleware
+from app.services import startup
 
+import asyncio
+from contextlib import asynccontextmanager
 
-app = FastAPI(root_path="/prod")
+with startup.phase("import fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+with startup.phase("import app.api"):
+    from app.api import router
+from app.config.logger import setup_logger
+from app.config.settings import INGESTION_ENABLED, MODEL_PATH, MODEL_PRELOAD
+from app.services import metrics
+from app.services.ingestion import IngestionScheduler
+from app.services.model_registry import registry
+with startup.phase("import mangum"):
+    from mangum import Mangum
+
+logger = setup_logger("main")
+
+
+def warm_up() -> None:
+    # Carrega e aquece o modelo uma única vez por processo/container
+    if MODEL_PRELOAD:
+        with startup.phase("model preload"):
+            registry.preload(MODEL_PATH)
+    logger.info(f"Inicialização: {startup.startup_report()}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up()
+    # Mantém os símbolos configurados atualizados fora do caminho da requisição
+    scheduler, task = None, None
+    if INGESTION_ENABLED:
+        scheduler = IngestionScheduler.from_settings()
+        task = asyncio.create_task(scheduler.run_forever())
+    yield
+    if scheduler is not None:
+        scheduler.stop()
+        await task
+
+
+app = FastAPI(root_path="/prod", lifespan=lifespan)
 
 app.include_router(router)
 
+# Request ID (X-Request-ID) e, com METRICS_ENABLED, duração e etapas de cada requisição
+app.middleware("http")(metrics.instrument_request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # ou restringido para domínio específico
@@ -16,4 +56,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-handler = Mangum(app)
\ No newline at end of file
+# Lambda: o Mangum executaria o lifespan (startup e shutdown) a cada invocação, então ele
+# fica desligado e o aquecimento roda uma vez por container, na primeira invocação. Os pools
+# de executors vivem o container inteiro e o agendador não roda (use run_fetcher.py agendado).
+_mangum = Mangum(app, lifespan="off")
+_warmed = False
+
+
+def handler(event, context):
+    global _warmed
+    if not _warmed:
+        warm_up()
+        if INGESTION_ENABLED:
+            logger.warning("INGESTION_ENABLED é ignorado no Lambda: agende run_fetcher.py.")
+        _warmed = True
+    return _mangum(event, context)
\ No newline at end of file
@@ -0,0 +1,21 @@
+# run_backfill.py
+# Backfill histórico em blocos respeitando os limites do Yahoo por intervalo
+# (ex.: 1m = 7 dias por requisição, últimos 30 dias; 5m = 60 dias).
+# Uso: python run_backfill.py TSLA AAPL --start 2025-01-01 [--end 2025-06-30] [--interval 1h]
+import argparse
+
+from app.services.backfill import backfill_symbol
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill do histórico de símbolos no S3")
+    parser.add_argument("symbols", nargs="*", default=["TSLA"])
+    parser.add_argument("--start", required=True, help="data inicial (inclusiva), ex.: 2025-01-01")
+    parser.add_argument("--end", default=None, help="data final (exclusiva); padrão: amanhã (UTC)")
+    parser.add_argument("--interval", default="1m")
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        report = backfill_symbol(symbol, args.start, args.end, interval=args.interval)
+        print(f"{symbol}: {report.fetched}/{report.planned} bloco(s), {report.rows_written} linha(s) gravadas, {report.failed} falha(s).")
+        for error in report.errors:
+            print(f"  - {error}")
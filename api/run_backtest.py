@@ -0,0 +1,50 @@
+# run_backtest.py
+# Backtest offline do modelo sobre o histórico gravado no S3 ({symbol}_evolution),
+# com MAE/RMSE/MAPE e acerto de direção por símbolo e por período.
+# Uso: python run_backtest.py TSLA AAPL [--start 2025-01-01] [--end 2025-06-30] [--bucket D]
+#      [--workers 4] [--chunk-rows 100000] [--batch-size 4096] [--output relatorio.json]
+import argparse
+import json
+
+from app.services.backtest import BATCH_SIZE, BUCKET, CHUNK_ROWS, run_backtest
+
+
+def _fmt(value, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest do modelo sobre o histórico no S3")
+    parser.add_argument("symbols", nargs="*", default=["TSLA"])
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--bucket", default=BUCKET, help='agrupamento das métricas: "h", "D", "W", "M"...')
+    parser.add_argument("--workers", type=int, default=1, help="processos em paralelo (um símbolo por processo)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", default=None, help="grava o relatório completo (com buckets) em JSON")
+    args = parser.parse_args()
+
+    report = run_backtest(
+        args.symbols,
+        workers=args.workers,
+        start=args.start,
+        end=args.end,
+        chunk_rows=args.chunk_rows,
+        batch_size=args.batch_size,
+        bucket=args.bucket,
+    )
+
+    print(f"{'símbolo':>10} {'barras':>10} {'janelas':>10} {'MAE':>12} {'RMSE':>12} {'MAPE %':>9} {'direção':>8} {'s':>8}")
+    rows = [(symbol, item) for symbol, item in report["symbols"].items()] + [("TOTAL", report)]
+    for symbol, item in rows:
+        overall = item["overall"]
+        print(f"{symbol:>10} {item.get('bars', ''):>10} {item.get('windows', overall['n']):>10} "
+              f"{_fmt(overall['mae'], '12.6f')} {_fmt(overall['rmse'], '12.6f')} "
+              f"{_fmt(overall['mape'], '9.3f')} {_fmt(overall['directional_accuracy'], '8.3f')} "
+              f"{item.get('seconds', ''):>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Relatório gravado em {args.output}")
@@ -0,0 +1,82 @@
+# run_convert_model.py
+# Exporta o modelo Keras (.h5) para os backends de inferência sem TensorFlow (ver
+# app/services/inference_backends.py) e confere a paridade de cada artefato com o Keras.
+# Com os artefatos gerados, o serviço roda com INFERENCE_BACKEND=tflite ou onnx e a imagem
+# pode ser construída com requirements-serving.txt (sem tensorflow).
+# Uso: python run_convert_model.py [--format tflite|onnx|all] [--source modelo.h5]
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from app.config.settings import MODEL_SOURCE_PATH
+
+# Diferença máxima aceita entre Keras e o artefato exportado
+TOLERANCE = 1e-4
+# Amostras aleatórias usadas na verificação de paridade
+PARITY_SAMPLES = 64
+FORMATS = ("tflite", "onnx")
+
+
+def export_tflite(model, target: str) -> None:
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    _, seq_length, n_features = model.input_shape
+    # Assinatura com shape estático e variáveis congeladas: a LSTM vira um único op fundido do TFLite
+    signature = tf.TensorSpec([1, seq_length, n_features], tf.float32)
+    concrete = tf.function(lambda x: model(x, training=False)).get_concrete_function(signature)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([convert_variables_to_constants_v2(concrete)])
+    with open(target, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, target: str) -> None:
+    # tf2onnx só é necessário na exportação, não no serviço
+    import tensorflow as tf
+    import tf2onnx
+
+    _, seq_length, n_features = model.input_shape
+    # Lote dinâmico: o ONNX Runtime processa o micro-lote inteiro numa chamada
+    signature = [tf.TensorSpec([None, seq_length, n_features], tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=target)
+
+
+EXPORTERS = {"tflite": export_tflite, "onnx": export_onnx}
+
+
+def check_parity(model, target: str, backend: str) -> float:
+    """Maior diferença absoluta entre Keras e o artefato em entradas aleatórias."""
+    from app.services.inference_backends import load_backend
+
+    _, seq_length, n_features = model.input_shape
+    X = np.random.default_rng(0).normal(size=(PARITY_SAMPLES, seq_length, n_features)).astype(np.float32)
+    exported = load_backend(target, backend)
+    return float(np.abs(exported.predict(X) - model.predict(X, verbose=0)).max())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta o modelo Keras para TFLite/ONNX e confere a paridade.")
+    parser.add_argument("--format", choices=FORMATS + ("all",), default="all")
+    parser.add_argument("--source", default=MODEL_SOURCE_PATH, help="modelo Keras de origem (.h5/.keras)")
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(args.source, compile=False)
+    ok = True
+    for fmt in FORMATS if args.format == "all" else (args.format,):
+        target = os.path.splitext(args.source)[0] + "." + fmt
+        try:
+            EXPORTERS[fmt](model, target)
+            diff = check_parity(model, target, fmt)
+        except ImportError as e:
+            print(f"[{fmt}] dependência ausente ({e.name}); exportação ignorada.")
+            ok &= args.format != fmt
+            continue
+        close = diff <= TOLERANCE
+        print(f"[{fmt}] {args.source} -> {target} (diferença máxima em {PARITY_SAMPLES} amostras: {diff:.2e}) "
+              f"{'OK' if close else 'DIVERGENTE'}")
+        ok &= close
+    sys.exit(0 if ok else 1)
@@ -1,9 +1,13 @@
 # run_fetcher.py
-from app.services.fetcher import fetch_and_save_s3
+import argparse
+import asyncio
+
+from app.config.settings import INGESTION_SYMBOLS
+from app.services.ingestion import IngestionScheduler, ingest, parse_symbols
 
 if __name__ == "__main__":
     # Exemplo: roda sempre com esses parâmetros
-    # Você pode parametrizar via argparse ou variáveis de ambiente, se quiser.
+    # Com --loop, mantém os símbolos atualizados a cada barra (agendador de ingestão).
     PATH = "data"
     SYMBOL = "TSLA"
     START = None
@@ -12,12 +16,26 @@ if __name__ == "__main__":
     PERIOD   = "1d"
     AUTO_ADJUST = True
 
-    fetch_and_save_s3(
-        symbol=SYMBOL,
-        start_date=START,
-        end_date=END,
-        interval=INTERVAL,
-        period=PERIOD,
-        auto_adjust=AUTO_ADJUST,
-        #api_url="http://127.0.0.1:8000/stock-data"
-    )
+    parser = argparse.ArgumentParser(description="Ingestão de dados do Yahoo Finance para o S3")
+    parser.add_argument("--loop", action="store_true", help="executa continuamente no intervalo de cada símbolo")
+    parser.add_argument("--symbols", default=None, help=f"ex.: 'TSLA,AAPL:5m' (padrão do --loop: {INGESTION_SYMBOLS})")
+    args = parser.parse_args()
+
+    if args.loop:
+        scheduler = IngestionScheduler(parse_symbols(args.symbols or INGESTION_SYMBOLS, INTERVAL), period=PERIOD)
+        try:
+            asyncio.run(scheduler.run_forever())
+        except KeyboardInterrupt:
+            pass
+    elif args.symbols:
+        asyncio.run(IngestionScheduler(parse_symbols(args.symbols, INTERVAL), period=PERIOD).run_once())
+    else:
+        ingest(
+            symbol=SYMBOL,
+            start_date=START,
+            end_date=END,
+            interval=INTERVAL,
+            period=PERIOD,
+            auto_adjust=AUTO_ADJUST,
+            #api_url="http://127.0.0.1:8000/stock-data"
+        )
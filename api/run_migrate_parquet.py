@@ -0,0 +1,14 @@
+# run_migrate_parquet.py
+# Migração única de fetch/{symbol}_evolution.csv para o layout particionado em Parquet
+# (fetch/evolution/symbol={symbol}/date=YYYY-MM-DD/part-*.parquet).
+import sys
+
+from app.services.evolution_store import migrate_csv_to_parquet
+
+if __name__ == "__main__":
+    # Símbolos via argumentos de linha de comando; por padrão, TSLA
+    SYMBOLS = sys.argv[1:] or ["TSLA"]
+
+    for symbol in SYMBOLS:
+        linhas = migrate_csv_to_parquet(symbol)
+        print(f"{symbol}: {linhas} linhas migradas. Defina STORAGE_FORMAT=parquet para usar o novo layout.")
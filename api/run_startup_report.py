@@ -0,0 +1,72 @@
+# run_startup_report.py
+# Relatório de custo de inicialização: tempo de import por pacote (python -X importtime)
+# e etapas medidas por app.services.startup (imports, carga do modelo).
+# Uso (a partir de api/): python run_startup_report.py [--json] [--top N]
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Executado em um processo limpo para medir o cold start real
+_PROBE = """
+import json, asyncio
+import main
+from app.services import startup
+async def _lifespan():
+    async with main.lifespan(main.app):
+        pass
+asyncio.run(_lifespan())
+print("STARTUP_REPORT=" + json.dumps(startup.startup_report()))
+"""
+
+
+def import_costs(stderr: str) -> dict:
+    """Tempo próprio (self) somado por pacote de topo e por módulo do app, em segundos."""
+    packages = defaultdict(float)
+    app_modules = {}
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, module = match.groups()
+        packages[module.split(".")[0]] += int(self_us) / 1e6
+        if module.split(".")[0] in ("app", "main"):
+            app_modules[module] = int(cumulative_us) / 1e6
+    return {"packages": dict(packages), "app_modules": app_modules}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatório de tempo de inicialização")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = {**os.environ, "INGESTION_ENABLED": "0"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE],
+                            capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    report_line = next((l for l in result.stdout.splitlines() if l.startswith("STARTUP_REPORT=")), None)
+    if report_line is None:
+        sys.stderr.write(result.stderr[-4000:])
+        sys.exit(1)
+    report = {"startup": json.loads(report_line.split("=", 1)[1]), **import_costs(result.stderr)}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        sys.exit(0)
+
+    print("Etapas:")
+    for phase in report["startup"]["phases"]:
+        print(f"  {phase['name']:<30} {phase['seconds']:>8.3f}s")
+    print(f"  {'total desde o início':<30} {report['startup']['since_process_start_seconds']:>8.3f}s")
+    print(f"Dependências pesadas carregadas: {report['startup']['heavy_modules_loaded']}")
+    print(f"Import por pacote (tempo próprio, top {args.top}):")
+    for name, seconds in sorted(report["packages"].items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<30} {seconds:>8.3f}s")
+    print("Módulos do app (acumulado):")
+    for name, seconds in sorted(report["app_modules"].items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<30} {seconds:>8.3f}s")
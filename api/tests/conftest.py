@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do serviço são importados como `app.*`, a partir da pasta api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O cliente S3 de app.services.s3_utils é criado no import: credenciais falsas antes dele
+for _name, _value in (("AWS_DEFAULT_REGION", "us-east-1"), ("AWS_ACCESS_KEY_ID", "test"),
+                      ("AWS_SECRET_ACCESS_KEY", "test")):
+    os.environ.setdefault(_name, _value)
+
+try:
+    # Importado antes dos módulos de app para interceptar também os clientes criados no import
+    import moto
+except ImportError:  # pragma: no cover
+    moto = None
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+
+@pytest.fixture
+def s3():
+    """Cliente boto3 sobre o S3 em memória do moto, com o bucket do projeto."""
+    if moto is None:
+        pytest.skip("moto não instalado (pip install -r tests/requirements.txt)")
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
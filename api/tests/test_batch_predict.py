@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from app.config.logger import request_id_var
+from app.services import batch_predict
+
+
+class RecordingModel:
+    """Devolve o primeiro valor de cada sequência e registra o tamanho de cada lote."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, X, batch_size=None, verbose=0):
+        self.batches.append(len(X))
+        return X[:, -1, :1]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = RecordingModel()
+    seen = []
+
+    async def ensure_fresh_async(symbol, max_staleness, **kwargs):
+        return ("ok", 200), False, 0.0
+
+    async def prepare_sequence_async(symbol, start_date, end_date):
+        seen.append((threading.current_thread().name, request_id_var.get()))
+        return np.full((1, 4, 2), float(symbol[1:]), dtype=np.float32)
+
+    monkeypatch.setattr(batch_predict, "PREDICTION_CACHE_ENABLED", False)
+    monkeypatch.setattr(batch_predict, "ensure_fresh_async", ensure_fresh_async)
+    monkeypatch.setattr(batch_predict, "prepare_sequence_async", prepare_sequence_async)
+    monkeypatch.setattr(batch_predict.registry, "get", lambda path: model)
+    model.seen = seen
+    return model
+
+
+async def collect(symbols, **kwargs):
+    request_id_var.set("req-1")
+    return [item async for item in batch_predict.predict_many(symbols, 60.0, **kwargs)]
+
+
+def test_micro_batches_are_flushed_when_full(model):
+    symbols = [f"S{i}" for i in range(10)]
+
+    items = asyncio.run(collect(symbols, batch_size=4, concurrency=3))
+
+    assert model.batches == [4, 4, 2]
+    assert sorted(item["prediction"] for item in items) == list(range(10))
+    assert all(rid == "req-1" for _, rid in model.seen)
+
+
+def test_errors_are_streamed_alongside_predictions(model, monkeypatch):
+    async def ensure_fresh_async(symbol, max_staleness, **kwargs):
+        return ((("Símbolo inválido.", 404) if symbol == "S2" else ("ok", 200)), False, 0.0)
+
+    monkeypatch.setattr(batch_predict, "ensure_fresh_async", ensure_fresh_async)
+
+    items = asyncio.run(collect(["S1", "S2", "S3", "S1"]))
+
+    assert {item["symbol"]: item.get("error") for item in items} == {"S1": None, "S2": "Símbolo inválido.", "S3": None}
+    assert model.batches == [2]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import run_convert_model
+from app.services.inference_backends import load_backend
+
+SEQ_LENGTH, N_FEATURES = 8, 4
+
+
+@pytest.fixture(scope="module")
+def model():
+    """LSTM mínima com a mesma estrutura de entrada/saída do modelo servido."""
+    tf.keras.utils.set_random_seed(0)
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(SEQ_LENGTH, N_FEATURES)),
+        tf.keras.layers.LSTM(8),
+        tf.keras.layers.Dense(1),
+    ])
+
+
+@pytest.mark.parametrize("fmt, deps", [
+    ("tflite", ()),
+    ("onnx", ("onnxruntime", "tf2onnx")),
+])
+def test_exported_model_matches_keras(model, tmp_path, fmt, deps):
+    for dep in deps:
+        pytest.importorskip(dep)
+    target = str(tmp_path / f"model.{fmt}")
+
+    run_convert_model.EXPORTERS[fmt](model, target)
+
+    backend = load_backend(target, fmt)
+    assert backend.input_shape == (None, SEQ_LENGTH, N_FEATURES)
+    X = np.random.default_rng(1).normal(size=(5, SEQ_LENGTH, N_FEATURES)).astype(np.float32)
+    assert np.abs(backend.predict(X) - model.predict(X, verbose=0)).max() <= run_convert_model.TOLERANCE
+    assert run_convert_model.check_parity(model, target, fmt) <= run_convert_model.TOLERANCE
@@ -0,0 +1,97 @@
+import io
+
+import pandas as pd
+import pytest
+
+from app.services import evolution_store, s3_utils
+from app.services.evolution_store import (
+    append_evolution,
+    compact_day,
+    evolution_prefix,
+    read_evolution,
+    read_evolution_tail,
+)
+from benchmarks.synthetic import synthetic_ohlcv
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+
+def hourly(n_rows: int) -> pd.DataFrame:
+    """Barras horárias: 2020-01-02 (10 barras), 03 e 04 (24 cada) e o restante em 05."""
+    df = synthetic_ohlcv(n_rows, freq="1h")
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    return df
+
+
+def ingest(symbol: str, bars: pd.DataFrame, batch: int = 5) -> None:
+    for start in range(0, len(bars), batch):
+        append_evolution(symbol, bars.iloc[start:start + batch], storage="parquet")
+
+
+def day_files(s3, symbol: str, day: str) -> list:
+    prefix = f"{evolution_prefix(symbol)}date={day}/"
+    return [obj["Key"][len(prefix):] for obj in s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix).get("Contents", [])]
+
+
+def test_closed_days_are_compacted(s3):
+    bars = hourly(60)
+    ingest("EVC", bars)
+
+    for day in ("2020-01-02", "2020-01-03", "2020-01-04"):
+        assert day_files(s3, "EVC", day) == ["data.parquet"]
+    assert len(day_files(s3, "EVC", "2020-01-05")) == 1  # dia corrente: partes ainda não compactadas
+
+    pd.testing.assert_frame_equal(read_evolution("EVC", storage="parquet"), bars, check_dtype=False)
+    pd.testing.assert_frame_equal(read_evolution_tail("EVC", 30, storage="parquet"),
+                                  bars.tail(30).reset_index(drop=True), check_dtype=False)
+
+
+def test_range_reads_share_one_cache_entry_per_file(s3):
+    bars = hourly(60)
+    ingest("EVF", bars)
+    read_evolution("EVF", storage="parquet")
+    entries = s3_utils.cache.stats()["entries"]
+
+    start, end = bars["datetime"].iloc[12], bars["datetime"].iloc[40]
+    df = read_evolution("EVF", columns=["close"], start=start, end=end, storage="parquet")
+
+    expected = bars[(bars["datetime"] >= start) & (bars["datetime"] <= end)][["datetime", "close"]]
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True), check_dtype=False)
+    assert s3_utils.cache.stats()["entries"] == entries
+
+
+def test_closed_day_listing_is_cached(s3, monkeypatch):
+    ingest("EVL", hourly(60))
+    read_evolution("EVL", storage="parquet")
+    listed = []
+    original = evolution_store.list_keys_s3
+    monkeypatch.setattr(evolution_store, "list_keys_s3", lambda bucket, prefix: listed.append(prefix) or original(bucket, prefix))
+
+    read_evolution("EVL", storage="parquet")
+
+    assert listed == [f"{evolution_prefix('EVL')}date=2020-01-05/"]
+
+
+def test_concurrent_compaction_keeps_every_row(s3, monkeypatch):
+    monkeypatch.setattr(evolution_store, "PARQUET_COMPACTION_ENABLED", False)
+    bars = hourly(10)
+    ingest("EVR", bars, batch=3)
+    original = evolution_store.read_parquet_versioned
+    calls = []
+
+    def racing_read(bucket, key):
+        current = original(bucket, key)
+        if not calls:
+            # Outra compactação grava o arquivo do dia entre a leitura e a escrita condicional
+            buffer = io.BytesIO()
+            bars.iloc[:3].to_parquet(buffer, index=False)
+            s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        calls.append(key)
+        return current
+
+    monkeypatch.setattr(evolution_store, "read_parquet_versioned", racing_read)
+    assert compact_day("EVR", pd.Timestamp("2020-01-02").date()) == 4
+
+    assert len(calls) == 2
+    assert day_files(s3, "EVR", "2020-01-02") == ["data.parquet"]
+    pd.testing.assert_frame_equal(read_evolution("EVR", storage="parquet"), bars, check_dtype=False)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from app.config.settings import FEATURE_COLUMNS, SEQ_LENGTH
+from app.services.forecast import rollout
+from app.services.indicator_state import IndicatorEngine
+from app.services.sequences import last_window
+from benchmarks.synthetic import synthetic_ohlcv
+
+CLOSE = FEATURE_COLUMNS.index("Close")
+
+
+class RecordingModel:
+    """Modelo falso: guarda as janelas recebidas e prevê um valor fixo por passo."""
+
+    def __init__(self, values):
+        self.values = values
+        self.inputs = []
+
+    def predict(self, X, batch_size=None, verbose=0):
+        self.inputs.append(np.array(X))
+        value = self.values[len(self.inputs) - 1]
+        return np.full((len(X), 1), value, dtype=np.float32)
+
+
+def make_engine(n_rows: int = 200) -> IndicatorEngine:
+    history = synthetic_ohlcv(n_rows)
+    history["datetime"] = pd.to_datetime(history["datetime"])
+    return IndicatorEngine.from_history(history)
+
+
+def test_step_one_uses_window_ending_at_latest_bar():
+    engine = make_engine()
+    model = RecordingModel([101.0])
+
+    path = rollout(model, [engine], horizon=1)[0]
+
+    expected = last_window(np.asarray(list(engine.tail), dtype=np.float64), SEQ_LENGTH)
+    np.testing.assert_allclose(model.inputs[0], expected.astype(np.float32))
+    step = pd.Timedelta(minutes=1)
+    assert path[0]["datetime"] == (pd.Timestamp(engine.last_timestamp) + step).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def test_step_two_window_contains_step_one_bar():
+    engine = make_engine()
+    model = RecordingModel([101.0, 102.0, 103.0])
+
+    rollout(model, [engine], horizon=3)
+
+    first, second, third = (X[0] for X in model.inputs)
+    # A janela avança uma barra por passo e termina na barra sintética recém-processada
+    np.testing.assert_allclose(second[:-1], first[1:])
+    assert second[-1, CLOSE] == 101.0
+    np.testing.assert_allclose(third[:-1], second[1:])
+    assert third[-1, CLOSE] == 102.0
+
+
+def test_rollout_leaves_engine_untouched():
+    engine = make_engine()
+    last, rows = engine.last_timestamp, len(engine.tail)
+
+    rollout(RecordingModel([1.0, 2.0]), [engine], horizon=2)
+
+    assert engine.last_timestamp == last
+    assert len(engine.tail) == rows
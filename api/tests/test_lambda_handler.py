@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("mangum")
+
+import main
+from app import api
+from app.services import executors, ingestion
+
+
+def api_gateway_event(path: str, query: dict) -> dict:
+    """Evento mínimo do API Gateway (REST, proxy) como o Lambda o entrega ao Mangum."""
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"host": "api.example.com"},
+        "multiValueHeaders": {},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": None,
+        "pathParameters": None,
+        "stageVariables": None,
+        "requestContext": {
+            "stage": "prod", "resourcePath": "/{proxy+}", "httpMethod": "GET",
+            "requestId": "test", "identity": {"sourceIp": "127.0.0.1"},
+        },
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Ingestão e predição falsas que passam pelos pools de I/O e de CPU, como as reais."""
+    monkeypatch.setattr(main, "warm_up", lambda: None)
+    monkeypatch.setattr(ingestion, "ensure_fresh",
+                        lambda symbol, limit, **kwargs: ((f"Dados de '{symbol}'.", 200), False, 0.0))
+
+    async def pipe_to_predict_async(symbol, start_date, end_date):
+        value = await executors.run_cpu(lambda: {"symbol": symbol, "prediction": 1.0})
+        return value, False
+
+    monkeypatch.setattr(api, "pipe_to_predict_async", pipe_to_predict_async)
+    # O Mangum usa o loop corrente da thread, como num processo recém-iniciado do Lambda
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def test_warm_invocations_reuse_executors(pipeline):
+    for _ in range(2):
+        response = main.handler(api_gateway_event("/stock-data-prediction", {"symbol": "TSLA"}), None)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"symbol": "TSLA", "prediction": 1.0}
@@ -0,0 +1,38 @@
+from app.services import metadata_store
+from app.services.metadata_store import latest_metadata, metadata_prefix, save_metadata_snapshot, snapshot_hash
+
+INFO = {
+    "symbol": "TSLA",
+    "shortName": "Tesla, Inc.",
+    "currency": "USD",
+    "exchange": "NMS",
+    "quoteType": "EQUITY",
+    "exDividendDate": None,
+    "marketState": "REGULAR",
+    "regularMarketPrice": 250.0,
+    "regularMarketVolume": 1_000,
+    "marketCap": 800_000_000_000,
+}
+
+
+def snapshots(s3, symbol: str) -> list:
+    listing = s3.list_objects_v2(Bucket=metadata_store.BUCKET_NAME, Prefix=metadata_prefix(symbol))
+    return [obj["Key"] for obj in listing.get("Contents", []) if obj["Key"].endswith(".ndjson")]
+
+
+def test_live_quote_fields_do_not_change_hash():
+    live = {**INFO, "regularMarketPrice": 251.5, "regularMarketVolume": 2_000, "marketState": "POST"}
+    assert snapshot_hash(live) == snapshot_hash(INFO)
+    assert snapshot_hash({**INFO, "shortName": "Tesla"}) != snapshot_hash(INFO)
+
+
+def test_snapshot_written_only_when_descriptive_fields_change(s3):
+    assert save_metadata_snapshot("MDA", INFO, "2026-01-02T14:30:00", storage="snapshots")
+    assert not save_metadata_snapshot("MDA", {**INFO, "regularMarketPrice": 260.0}, "2026-01-02T14:31:00",
+                                      storage="snapshots")
+    assert len(snapshots(s3, "MDA")) == 1
+
+    assert save_metadata_snapshot("MDA", {**INFO, "exDividendDate": "2026-03-01"}, "2026-01-02T14:32:00",
+                                  storage="snapshots")
+    assert len(snapshots(s3, "MDA")) == 2
+    assert latest_metadata("MDA")["exDividendDate"] == "2026-03-01"
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import preditict
+from app.services.indicator_state import IndicatorEngine
+
+
+def _history(n: int) -> pd.DataFrame:
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, n))
+    return pd.DataFrame({
+        "datetime": pd.date_range("2025-01-01", periods=n, freq="h"),
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": np.full(n, 1000.0),
+    })
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    """Registra em que pool cada etapa do pipeline executa."""
+    seen = {}
+
+    def record(step, fn):
+        def wrapper(*args, **kwargs):
+            seen.setdefault(step, set()).add(threading.current_thread().name.split("_")[0])
+            return fn(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(preditict, "INDICATOR_STATE_ENABLED", True)
+    monkeypatch.setattr(preditict, "load_indicator_state", record("state_read", lambda symbol: None))
+    monkeypatch.setattr(preditict, "read_checkpoint_s3", record("checkpoint_read", lambda bucket, key: None))
+    monkeypatch.setattr(preditict, "_read_history", record("history_read", lambda symbol, **kw: _history(300)))
+    monkeypatch.setattr(preditict, "save_indicator_state", record("state_write", lambda symbol, engine: True))
+    monkeypatch.setattr(IndicatorEngine, "update", record("features", IndicatorEngine.update))
+    return seen
+
+
+def test_predict_sequence_reads_s3_on_io_pool(threads):
+    sequence = asyncio.run(preditict.prepare_sequence_async("TSLA"))
+
+    assert sequence is not None and sequence.shape[:2] == (1, preditict.SEQ_LENGTH)
+    assert threads == {
+        "state_read": {"io"}, "checkpoint_read": {"io"}, "history_read": {"io"},
+        "state_write": {"io"}, "features": {"cpu"},
+    }
+
+
+def test_forecast_engine_reads_s3_on_io_pool(threads):
+    engine = asyncio.run(preditict.prepare_engine_async("TSLA"))
+
+    assert engine is not None
+    assert threads == {
+        "state_read": {"io"}, "checkpoint_read": {"io"}, "history_read": {"io"},
+        "state_write": {"io"}, "features": {"cpu"},
+    }
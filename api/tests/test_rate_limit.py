@@ -0,0 +1,68 @@
+import pytest
+
+from app.services.rate_limit import TokenBucket
+from app.services.yahoo_client import YahooClient
+
+
+class TooManyRequests(Exception):
+    def __init__(self):
+        super().__init__("Too Many Requests")
+
+
+def test_throttle_halves_rate_down_to_minimum():
+    bucket = TokenBucket(rate=8, burst=4, min_rate=1, decrease=0.5)
+
+    for expected in (4, 2, 1, 1):
+        bucket._last_decrease = float("-inf")  # sinais de episódios distintos
+        bucket.throttled()
+        assert bucket.rate == expected
+
+
+def test_throttles_in_flight_count_once():
+    bucket = TokenBucket(rate=8, burst=4, min_rate=1, decrease=0.5)
+
+    for _ in range(4):
+        bucket.throttled()
+
+    assert bucket.rate == 4
+    assert bucket.throttles == 1
+
+
+def test_successes_recover_rate_up_to_configured():
+    bucket = TokenBucket(rate=2, burst=4, min_rate=0.5, decrease=0.25, recovery=0.5)
+    bucket.throttled()
+
+    rates = []
+    for _ in range(4):
+        bucket.succeeded()
+        rates.append(bucket.rate)
+
+    assert rates == [1.0, 1.5, 2.0, 2.0]
+
+
+def test_client_slows_down_on_429_and_recovers(monkeypatch):
+    monkeypatch.setattr("app.services.yahoo_client.time.sleep", lambda s: None)
+    limiter = TokenBucket(rate=1000, burst=10, min_rate=1, decrease=0.5, recovery=100)
+    client = YahooClient(limiter=limiter, max_retries=3, backoff_base=0)
+    outcomes = iter([TooManyRequests(), "ok", "ok"])
+
+    def call():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert client._call("history TEST", call) == "ok"
+    assert limiter.throttles == 1 and limiter.rate == 600
+    assert client._call("history TEST", call) == "ok"
+    assert limiter.rate == 700
+
+
+def test_other_errors_do_not_slow_down(monkeypatch):
+    monkeypatch.setattr("app.services.yahoo_client.time.sleep", lambda s: None)
+    limiter = TokenBucket(rate=1000, burst=10, min_rate=1)
+    client = YahooClient(limiter=limiter, max_retries=0)
+
+    with pytest.raises(ValueError):
+        client._call("history TEST", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert limiter.rate == 1000 and limiter.throttles == 0
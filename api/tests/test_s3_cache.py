@@ -0,0 +1,140 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.services.s3_cache import S3Cache
+
+BUCKET_NAME = "tech-challanger-4-prd-raw-zone-593793061865"
+
+
+class CountingClient:
+    """Repassa get_object ao cliente real, registrando os parâmetros de cada chamada."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def get_object(self, **params):
+        self.calls.append(params)
+        return self.client.get_object(**params)
+
+
+def parse_json(body: bytes) -> dict:
+    return json.loads(body.decode("utf-8"))
+
+
+def put_json(s3, key: str, data: dict) -> None:
+    s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=json.dumps(data).encode("utf-8"))
+
+
+def test_ttl_hit_makes_no_s3_call(s3):
+    put_json(s3, "a.json", {"v": 1})
+    client = CountingClient(s3)
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=60)
+
+    assert cache.get(client, BUCKET_NAME, "a.json", parse_json) == {"v": 1}
+    assert cache.get(client, BUCKET_NAME, "a.json", parse_json) == {"v": 1}
+
+    assert len(client.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_returns_copies(s3):
+    put_json(s3, "a.json", {"v": 1})
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=60)
+
+    cache.get(s3, BUCKET_NAME, "a.json", parse_json)["v"] = 2
+
+    assert cache.get(s3, BUCKET_NAME, "a.json", parse_json) == {"v": 1}
+
+
+def test_revalidation_304_keeps_entry(s3):
+    put_json(s3, "a.json", {"v": 1})
+    client = CountingClient(s3)
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=0)
+
+    first, etag = cache.get_versioned(client, BUCKET_NAME, "a.json", parse_json)
+    second, revalidated_etag = cache.get_versioned(client, BUCKET_NAME, "a.json", parse_json)
+
+    assert first == second == {"v": 1}
+    assert revalidated_etag == etag
+    assert client.calls[1]["IfNoneMatch"] == etag
+    assert (cache.misses, cache.revalidations, cache.hits) == (1, 1, 1)
+    assert cache.stats()["entries"] == 1
+
+
+def test_external_overwrite_is_picked_up(s3):
+    put_json(s3, "a.json", {"v": 1})
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=0)
+    cache.get(s3, BUCKET_NAME, "a.json", parse_json)
+
+    put_json(s3, "a.json", {"v": 2})
+
+    assert cache.get(s3, BUCKET_NAME, "a.json", parse_json) == {"v": 2}
+    assert (cache.misses, cache.revalidations) == (2, 0)
+
+
+def test_missing_key_raises_and_drops_entry(s3):
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=0)
+    with pytest.raises(ClientError) as error:
+        cache.get(s3, BUCKET_NAME, "missing.json", parse_json)
+    assert error.value.response["Error"]["Code"] == "NoSuchKey"
+
+    put_json(s3, "a.json", {"v": 1})
+    cache.get(s3, BUCKET_NAME, "a.json", parse_json)
+    s3.delete_object(Bucket=BUCKET_NAME, Key="a.json")
+    with pytest.raises(ClientError):
+        cache.get(s3, BUCKET_NAME, "a.json", parse_json)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_size(s3):
+    for key in ("a", "b", "c"):
+        s3.put_object(Bucket=BUCKET_NAME, Key=key, Body=b"x" * 100)
+    client = CountingClient(s3)
+    cache = S3Cache(max_bytes=250, default_ttl=60)
+
+    cache.get(client, BUCKET_NAME, "a", bytes)
+    cache.get(client, BUCKET_NAME, "b", bytes)
+    cache.get(client, BUCKET_NAME, "a", bytes)  # "a" passa a ser o mais recente
+    cache.get(client, BUCKET_NAME, "c", bytes)  # excede o limite: sai "b"
+
+    assert cache.evictions == 1
+    assert cache.stats()["bytes"] == 200
+    calls = len(client.calls)
+    cache.get(client, BUCKET_NAME, "a", bytes)
+    assert len(client.calls) == calls
+    cache.get(client, BUCKET_NAME, "b", bytes)
+    assert len(client.calls) == calls + 1
+
+
+def test_object_larger_than_cache_is_not_stored(s3):
+    s3.put_object(Bucket=BUCKET_NAME, Key="big", Body=b"x" * 300)
+    cache = S3Cache(max_bytes=250, default_ttl=60)
+
+    assert cache.get(s3, BUCKET_NAME, "big", bytes) == b"x" * 300
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_new_instance(s3, tmp_path):
+    put_json(s3, "a.json", {"v": 1})
+    S3Cache(max_bytes=1024 * 1024, disk_dir=str(tmp_path)).get(s3, BUCKET_NAME, "a.json", parse_json)
+
+    client = CountingClient(s3)
+    cache = S3Cache(max_bytes=1024 * 1024, disk_dir=str(tmp_path))
+
+    assert cache.get(client, BUCKET_NAME, "a.json", parse_json) == {"v": 1}
+    assert "IfNoneMatch" in client.calls[0]
+    assert (cache.disk_hits, cache.revalidations, cache.misses) == (1, 1, 0)
+
+
+def test_invalidate_drops_memory_and_disk(s3, tmp_path):
+    put_json(s3, "a.json", {"v": 1})
+    cache = S3Cache(max_bytes=1024 * 1024, default_ttl=60, disk_dir=str(tmp_path))
+    cache.get(s3, BUCKET_NAME, "a.json", parse_json)
+
+    cache.invalidate(BUCKET_NAME, "a.json")
+
+    assert cache.stats()["entries"] == 0
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from app.services import fetcher, ingestion
+from app.services.evolution_store import read_evolution
+from app.services.symbol_locks import single_flight
+from benchmarks.synthetic import synthetic_ohlcv
+
+
+def run_concurrently(fn, n: int = 8) -> list:
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def worker(i: int) -> None:
+        start.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    return results
+
+
+def test_single_flight_shares_one_execution():
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "ok"
+
+    assert run_concurrently(lambda: single_flight("same", slow)) == ["ok"] * 8
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_exception():
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("falhou")
+
+    results = run_concurrently(lambda: single_flight("failing", failing))
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        single_flight("failing", failing)
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    """get_stock_data falso e lento, contando as buscas por símbolo."""
+    bars = synthetic_ohlcv(300)
+    calls = []
+
+    def get_stock_data(symbol, **kwargs):
+        calls.append(symbol)
+        time.sleep(0.2)
+        return {"symbol": symbol, "shortName": symbol, "data_evolution": bars.to_dict("records")}
+
+    monkeypatch.setattr(fetcher, "get_stock_data", get_stock_data)
+    return calls
+
+
+def test_concurrent_fetches_hit_yahoo_once(s3, yahoo):
+    results = run_concurrently(lambda: fetcher.fetch_and_save_s3("SFA"))
+
+    assert all(status == 200 for _, status in results)
+    assert yahoo.count("SFA") == 1
+    history = read_evolution("SFA")
+    assert len(history) == 300 and history["datetime"].is_unique
+
+
+def test_concurrent_ensure_fresh_hit_yahoo_once(s3, yahoo):
+    results = run_concurrently(lambda: ingestion.ensure_fresh("SFB", 60))
+
+    assert all(msg[1] == 200 for msg, _, _ in results)
+    assert yahoo.count("SFB") == 1
+    # Depois da atualização compartilhada, os dados estão em dia: nenhuma nova busca
+    _, updated, _ = ingestion.ensure_fresh("SFB", 60)
+    assert not updated and yahoo.count("SFB") == 1